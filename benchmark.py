@@ -0,0 +1,785 @@
+import argparse
+import asyncio
+import contextlib
+import gc
+import io
+import json
+import math
+import os
+import pickle
+import random
+import tempfile
+import time
+import tracemalloc
+from grammar import Grammar
+from grammar_simplifier import GrammarSimplifier
+from cyk_algorithm import CYKParser
+from earley_parser import EarleyParser
+from grammar_cache import GrammarCache
+from incremental_cyk import IncrementalCYKParser
+from metrics import MetricsCollector
+from lexicon import Lexicon
+from prefilter import SentenceFilter
+from parse_server import ParseServer, http_request
+from compiled_grammar import compile_grammar, CompiledGrammar
+from main import load_english_grammar, test_sentences, ENGLISH_GRAMMAR_TEXT
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+@contextlib.contextmanager
+def silenced():
+    # Oculta los prints de diagnóstico del simplificador y el parser
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+def generate_synthetic_grammar(num_nonterminals=200, num_rules=5000, vocab_size=500, seed=0, cnf=True,
+                               ambiguity=0.0, weighted=False):
+    """Genera el texto de una gramática sintética con muchas reglas (en CNF o no)"""
+    # ambiguity = probabilidad de que una regla binaria reutilice un lado derecho ya generado
+    # con otro lado izquierdo (A -> B C y A' -> B C): más derivaciones por fragmento
+    # weighted = agregar probabilidades aleatorias [p] que suman 1 por lado izquierdo
+    rng = random.Random(seed)
+    nts = [f"N{i}" for i in range(num_nonterminals)]
+    words = [f"w{i}" for i in range(vocab_size)]
+    lines = []
+    binary_rhs = []
+    
+    # S debe poder iniciar derivaciones
+    for _ in range(max(1, num_rules // 50)):
+        lines.append(f"S -> {rng.choice(nts)} {rng.choice(nts)}")
+    
+    # Cada no terminal tiene al menos una regla léxica para que todo genere cadenas
+    for nt in nts:
+        lines.append(f"{nt} -> {rng.choice(words)}")
+    
+    if not cnf:
+        # Símbolos inútiles: uno que no genera cadenas y otro inalcanzable
+        lines.append(f"DEAD -> DEAD {rng.choice(nts)}")
+        lines.append(f"{rng.choice(nts)} -> DEAD")
+        lines.append(f"UNREACHABLE -> {rng.choice(words)}")
+    
+    while len(lines) < num_rules:
+        kind = rng.random()
+        if cnf or kind < 0.6:
+            if rng.random() < 0.8:
+                lhs = rng.choice(nts)
+                if ambiguity and binary_rhs and rng.random() < ambiguity:
+                    rhs = rng.choice(binary_rhs)
+                else:
+                    rhs = f"{rng.choice(nts)} {rng.choice(nts)}"
+                    if ambiguity:
+                        binary_rhs.append(rhs)
+                lines.append(f"{lhs} -> {rhs}")
+            else:
+                lines.append(f"{rng.choice(nts)} -> {rng.choice(words)}")
+        elif kind < 0.62:
+            # Producción unitaria A -> B (pocas: cada una copia reglas a sus ancestros)
+            lines.append(f"{rng.choice(nts)} -> {rng.choice(nts)}")
+        elif kind < 0.9:
+            # Lado derecho largo A -> B C D ...
+            rhs = " ".join(rng.choice(nts) for _ in range(rng.randint(3, 5)))
+            lines.append(f"{rng.choice(nts)} -> {rhs}")
+        else:
+            # Producción mixta con terminal: A -> b C
+            lines.append(f"{rng.choice(nts)} -> {rng.choice(words)} {rng.choice(nts)}")
+    
+    if weighted:
+        raw = [rng.uniform(0.1, 1.0) for _ in lines]
+        totals = {}
+        for line, value in zip(lines, raw):
+            lhs = line.split(' ', 1)[0]
+            totals[lhs] = totals.get(lhs, 0.0) + value
+        lines = [f"{line} [{value / totals[line.split(' ', 1)[0]]:.6g}]" for line, value in zip(lines, raw)]
+    
+    return "\n".join(lines)
+
+def sample_sentence(grammar, rng, max_depth=6):
+    # Genera una oración aceptada expandiendo producciones al azar
+    def expand(symbol, depth):
+        if symbol not in grammar.productions:
+            return [symbol]
+        prods = grammar.productions[symbol]
+        if depth >= max_depth:
+            lexical = [p for p in prods if len(p) == 1 and p[0] in grammar.terminals]
+            if lexical:
+                prods = lexical
+        prod = rng.choice(prods)
+        words = []
+        for s in prod:
+            words.extend(expand(s, depth + 1))
+        return words
+    
+    return " ".join(expand(grammar.start_symbol, 0))
+
+def legacy_parse(parser, sentence):
+    # Llenado original: recorre toda la gramática por cada división (referencia)
+    words = sentence.lower().split()
+    n = len(words)
+    if n == 0:
+        return False
+    productions = parser.grammar.productions
+    table = [[set() for _ in range(n)] for _ in range(n)]
+    for j in range(n):
+        for nt, prods in productions.items():
+            for prod in prods:
+                if len(prod) == 1 and prod[0] == words[j]:
+                    table[j][j].add(nt)
+    for length in range(2, n + 1):
+        for i in range(n - length + 1):
+            j = i + length - 1
+            for k in range(i, j):
+                left_symbols = table[i][k]
+                right_symbols = table[k+1][j]
+                for nt, prods in productions.items():
+                    for prod in prods:
+                        if len(prod) == 2 and prod[0] in left_symbols and prod[1] in right_symbols:
+                            table[i][j].add(nt)
+    return parser.grammar.start_symbol in table[0][n-1]
+
+def build_parser(grammar):
+    # Simplifica la gramática y crea el parser sin imprimir diagnóstico
+    with silenced():
+        cnf_grammar = GrammarSimplifier(grammar).simplify()
+    return CYKParser(cnf_grammar)
+
+def synthetic_workload(num_rules=5000, num_sentences=20, seed=0):
+    # Gramática sintética grande y oraciones muestreadas de ella
+    grammar = Grammar()
+    grammar.load_from_text(generate_synthetic_grammar(num_rules=num_rules, seed=seed))
+    rng = random.Random(seed)
+    sentences = []
+    while len(sentences) < num_sentences:
+        sentence = sample_sentence(grammar, rng)
+        if 4 <= len(sentence.split()) <= 14:
+            sentences.append(sentence)
+    return grammar, sentences
+
+def throughput(func, sentences, repeat=1):
+    # Oraciones por segundo de una función de parsing
+    start = time.perf_counter()
+    with silenced():
+        for _ in range(repeat):
+            for sentence in sentences:
+                func(sentence)
+    elapsed = time.perf_counter() - start
+    return len(sentences) * repeat / elapsed if elapsed > 0 else float('inf')
+
+def bench_index():
+    # Compara el recorrido completo de la gramática contra los índices de reglas
+    print("BENCHMARK: índices de reglas vs recorrido completo")
+    valid, invalid = test_sentences()
+    english = (load_english_grammar(), valid + invalid, 50)
+    synthetic_grammar, synthetic_sentences = synthetic_workload()
+    synthetic = (synthetic_grammar, synthetic_sentences, 1)
+    
+    for name, (grammar, sentences, repeat) in [("inglés", english), ("sintética 5k", synthetic)]:
+        parser = build_parser(grammar)
+        rules = sum(len(p) for p in parser.grammar.productions.values())
+        old = throughput(lambda s: legacy_parse(parser, s), sentences, repeat)
+        new = throughput(parser.parse, sentences, repeat)
+        print(f"Gramática {name} ({rules} reglas, {len(sentences)} oraciones)")
+        print(f"  Original: {old:10.1f} oraciones/s")
+        print(f"  Índices:  {new:10.1f} oraciones/s  (x{new / old:.1f})")
+
+def long_english_sentence(num_tokens):
+    # Oración válida con frases preposicionales encadenadas hasta ~num_tokens palabras
+    words = "she eats a cake".split()
+    pps = ["with a fork", "in the oven", "with the knife"]
+    while len(words) + 3 <= num_tokens:
+        words.extend(pps[len(words) % 3].split())
+    return " ".join(words)
+
+def measure_parse(parser, sentence):
+    # Tiempo y pico de memoria de un único parse (la memoria se mide aparte: tracemalloc es lento)
+    with silenced():
+        start = time.perf_counter()
+        accepted = parser.parse(sentence)[0]
+        elapsed = time.perf_counter() - start
+        tracemalloc.start()
+        parser.parse(sentence)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return accepted, elapsed, peak
+
+def bench_compact():
+    # Compara la tabla de conjuntos con el búfer triangular de máscaras de bits
+    print("BENCHMARK: tabla de conjuntos vs búfer de bits")
+    cnf_grammar = build_parser(load_english_grammar()).grammar
+    parsers = {engine: CYKParser(cnf_grammar, engine=engine) for engine in CYKParser.ENGINES}
+    for num_tokens in [25, 50, 100, 150]:
+        sentence = long_english_sentence(num_tokens)
+        n = len(sentence.split())
+        for engine, parser in parsers.items():
+            accepted, elapsed, peak = measure_parse(parser, sentence)
+            print(f"  n={n:4d} {engine:7s} aceptada={accepted!s:5s} "
+                  f"tiempo={elapsed:8.4f}s memoria pico={peak / 1024:10.1f} KiB")
+
+def bench_modes():
+    # Compara retropunteros completos, solo el primero, y reconocimiento puro
+    print("BENCHMARK: modos de retropunteros y reconocimiento")
+    cnf_grammar = build_parser(load_english_grammar()).grammar
+    valid, invalid = test_sentences()
+    workloads = [
+        ("oraciones del proyecto", valid + invalid, 200),
+        ("oraciones largas (~60)", [long_english_sentence(60), "the cat " + long_english_sentence(60)], 5),
+    ]
+    variants = [(f"parse backpointers='{mode}'", CYKParser(cnf_grammar, backpointers=mode).parse)
+                for mode in CYKParser.BACKPOINTER_MODES]
+    variants.append(("recognize", CYKParser(cnf_grammar).recognize))
+    variants.append(("recognize bitset", CYKParser(cnf_grammar, engine='bitset').recognize))
+    for name, sentences, repeat in workloads:
+        print(f"Carga: {name}")
+        for label, func in variants:
+            print(f"  {label:28s} {throughput(func, sentences, repeat):10.1f} oraciones/s")
+
+def bench_parallel():
+    # Escalamiento de parse_many con el número de procesos
+    print(f"BENCHMARK: parse_many con procesos (CPUs disponibles: {os.cpu_count()})")
+    grammar, sentences = synthetic_workload(num_rules=2000, num_sentences=100)
+    parser = build_parser(grammar)
+    corpus = sentences * 10
+    for workers in sorted({1, 2, 4, os.cpu_count() or 1}):
+        for recognize_only in (False, True):
+            start = time.perf_counter()
+            with silenced():
+                for _ in parser.parse_many(corpus, workers=workers, chunksize=32,
+                                           recognize_only=recognize_only):
+                    pass
+            elapsed = time.perf_counter() - start
+            label = "recognize" if recognize_only else "parse"
+            print(f"  workers={workers:2d} {label:9s} {len(corpus) / elapsed:10.1f} oraciones/s")
+
+def bench_cache():
+    # Arranque en frío (conversión completa) vs en caliente (gramática CNF desde la caché)
+    print("BENCHMARK: caché de gramáticas CNF")
+    grammars = [
+        ("inglés", ENGLISH_GRAMMAR_TEXT),
+        ("sintética 5k", generate_synthetic_grammar(num_rules=5000)),
+        ("sintética 20k", generate_synthetic_grammar(num_nonterminals=400, num_rules=20000, vocab_size=2000)),
+    ]
+    for name, grammar_text in grammars:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = GrammarCache(cache_dir)
+            timings = []
+            for _ in range(2):
+                start = time.perf_counter()
+                with silenced():
+                    cache.get_parser(grammar_text)
+                timings.append(time.perf_counter() - start)
+        cold, warm = timings
+        print(f"  {name:14s} frío={cold:8.4f}s caliente={warm:8.4f}s (x{cold / warm:.1f})")
+
+def zipf_corpus(sentences, size, seed=0, exponent=1.2):
+    # Muestra un corpus con distribución de cola pesada (Zipf) sobre las oraciones dadas
+    rng = random.Random(seed)
+    weights = [1 / (rank ** exponent) for rank in range(1, len(sentences) + 1)]
+    return rng.choices(sentences, weights=weights, k=size)
+
+def bench_memo():
+    # Caché LRU de resultados con tráfico repetitivo
+    print("BENCHMARK: caché LRU de resultados")
+    grammar, sentences = synthetic_workload(num_rules=2000, num_sentences=300)
+    cnf_grammar = build_parser(grammar).grammar
+    corpus = zipf_corpus(sentences, 3000)
+    for cache_size in [0, 32, 128, 1024]:
+        parser = CYKParser(cnf_grammar, cache_size=cache_size)
+        rate = throughput(parser.parse, corpus)
+        stats = parser.cache_stats()
+        print(f"  cache_size={cache_size:5d} {rate:10.1f} oraciones/s "
+              f"aciertos={stats['hit_rate']:6.1%} expulsiones={stats['evictions']}")
+
+def bench_incremental():
+    # Simula escritura palabra por palabra: re-analizar cada prefijo vs agregar una columna
+    print("BENCHMARK: análisis incremental por prefijos")
+    cnf_grammar = build_parser(load_english_grammar()).grammar
+    parser = CYKParser(cnf_grammar, engine='bitset')
+    incremental = IncrementalCYKParser(cnf_grammar)
+    for num_tokens in [10, 25, 50, 100]:
+        words = long_english_sentence(num_tokens).split()
+        start = time.perf_counter()
+        for end in range(1, len(words) + 1):
+            parser.recognize(" ".join(words[:end]))
+        full = time.perf_counter() - start
+        
+        incremental.reset()
+        start = time.perf_counter()
+        for word in words:
+            incremental.push(word)
+            incremental.is_viable_prefix()
+        pushed = time.perf_counter() - start
+        print(f"  n={len(words):4d} re-análisis={full:8.4f}s incremental={pushed:8.4f}s (x{full / pushed:.1f})")
+
+def bench_trees():
+    # Construcción y serialización de árboles: dicts anidados vs ParseTree plano
+    print("BENCHMARK: árboles de dicts vs árboles compactos")
+    parser = build_parser(load_english_grammar())
+    for num_tokens in [25, 100]:
+        sentence = long_english_sentence(num_tokens)
+        parser.parse(sentence)
+        n = len(parser.sentence)
+        root = parser.grammar.start_symbol
+        repeat = 2000 // num_tokens * 10
+        variants = [
+            ("dict + json.dumps", lambda: json.dumps(parser.build_parse_tree(0, n-1, root))),
+            ("dict + corchetes", lambda: parser.bracketed_tree(parser.build_parse_tree(0, n-1, root))),
+            ("compacto + to_json", lambda: parser.build_compact_tree(0, n-1, root).to_json()),
+            ("compacto + to_bracketed", lambda: parser.build_compact_tree(0, n-1, root).to_bracketed()),
+        ]
+        print(f"  n={n}")
+        for label, func in variants:
+            start = time.perf_counter()
+            for _ in range(repeat):
+                func()
+            elapsed = time.perf_counter() - start
+            print(f"    {label:24s} {repeat / elapsed:10.1f} árboles/s")
+
+SIMPLIFY_STEPS = [
+    'eliminate_left_recursion',
+    'eliminate_useless_symbols',
+    'eliminate_epsilon_productions',
+    'eliminate_unit_productions',
+    'convert_to_cnf',
+]
+
+def bench_phases():
+    # Desglose por fase con MetricsCollector y costo de tener el colector activo o no
+    print("BENCHMARK: métricas por fase del parser")
+    cnf_grammar = build_parser(load_english_grammar()).grammar
+    sentences = [long_english_sentence(40), long_english_sentence(80)]
+    for engine in CYKParser.ENGINES:
+        plain = CYKParser(cnf_grammar, engine=engine)
+        metrics = MetricsCollector()
+        measured = CYKParser(cnf_grammar, engine=engine, metrics=metrics)
+        off = throughput(plain.parse, sentences, repeat=3)
+        on = throughput(measured.parse, sentences, repeat=3)
+        print(f"  motor {engine}: sin métricas {off:.1f} oraciones/s, con métricas {on:.1f} oraciones/s")
+        summary = metrics.summary()
+        for phase in ('lexical', 'chart_fill', 'tree_build', 'parse'):
+            print(f"    {phase:12s} {summary['timings'][phase]['mean_ms']:10.3f} ms de media")
+        counters = summary['counters']
+        print(f"    celdas llenas {counters['cells_filled']}/{counters['cells']}, "
+              f"ocupación {counters['chart_occupancy']}, sondeos de reglas {counters['rule_probes']}")
+
+def sentences_in_range(grammar, rng, low, high, count):
+    # Oraciones aceptadas con entre low y high palabras
+    sentences = []
+    while len(sentences) < count:
+        sentence = sample_sentence(grammar, rng)
+        if low <= len(sentence.split()) <= high:
+            sentences.append(sentence)
+    return sentences
+
+def bench_numpy():
+    # Motor vectorizado con numpy contra los motores de Python en gramáticas densas
+    print("BENCHMARK: motor numpy vs motores de Python puro")
+    if numpy is None:
+        print("  numpy no está instalado (pip install numpy)")
+        return
+    for num_nonterminals, num_rules in [(100, 5000), (300, 30000)]:
+        grammar = Grammar()
+        grammar.load_from_text(generate_synthetic_grammar(num_nonterminals=num_nonterminals, num_rules=num_rules,
+                                                          vocab_size=num_nonterminals * 2))
+        cnf_grammar = build_parser(grammar).grammar
+        rng = random.Random(0)
+        print(f"Gramática de {num_nonterminals} no terminales y {num_rules} reglas")
+        for low, high in [(8, 12), (18, 22)]:
+            sentences = sentences_in_range(grammar, rng, low, high, 2)
+            results = []
+            for engine in CYKParser.ENGINES:
+                # El motor 'sets' es demasiado lento en oraciones largas de gramáticas densas
+                if engine == 'sets' and (high > 12 or num_rules > 5000):
+                    continue
+                parser = CYKParser(cnf_grammar, engine=engine)
+                outcomes = [parser.parse(sentence)[0] for sentence in sentences]
+                assert all(outcomes)
+                results.append(f"{engine} {throughput(parser.parse, sentences):8.2f}")
+            print(f"  {low}-{high} palabras (oraciones/s): " + ", ".join(results))
+
+def bench_long():
+    # Llenado por bloques de matrices (al estilo de Valiant) contra el bucle por longitudes en entradas largas
+    print("BENCHMARK: entradas largas, bloques de matrices vs bucle por longitudes")
+    if numpy is None:
+        print("  numpy no está instalado (pip install numpy)")
+        return
+    cnf_grammar = build_parser(load_english_grammar()).grammar
+    matrix = CYKParser(cnf_grammar, engine='bitset', long_input_threshold=0)
+    loops = {engine: CYKParser(cnf_grammar, engine=engine, long_input_threshold=None)
+             for engine in ('bitset', 'numpy')}
+    for num_tokens in [100, 250, 500, 1000, 2500, 5000]:
+        sentence = long_english_sentence(num_tokens)
+        n = len(sentence.split())
+        start = time.perf_counter()
+        accepted = matrix.recognize(sentence)
+        results = [f"bloques {time.perf_counter() - start:8.3f}s"]
+        for engine, parser in loops.items():
+            # El bucle es cúbico en Python: más allá de 500 palabras tardaría minutos
+            if n > 500:
+                results.append(f"{engine} (omitido)")
+                continue
+            start = time.perf_counter()
+            assert parser.recognize(sentence) == accepted
+            results.append(f"{engine} {time.perf_counter() - start:8.3f}s")
+        print(f"  n={n:5d} aceptada={accepted!s:5s} " + ", ".join(results))
+
+def bench_fill_workers():
+    # Latencia de una sola oración larga al repartir cada antidiagonal entre procesos
+    print(f"BENCHMARK: llenado paralelo de una oración (CPUs disponibles: {os.cpu_count()})")
+    cnf_grammar = build_parser(load_english_grammar()).grammar
+    for num_tokens in [200, 400, 600]:
+        sentence = long_english_sentence(num_tokens)
+        n = len(sentence.split())
+        results = []
+        for workers in sorted({1, 2, 4, os.cpu_count() or 1}):
+            parser = CYKParser(cnf_grammar, engine='bitset', long_input_threshold=None, fill_workers=workers)
+            try:
+                # La primera llamada crea el pool; se mide la segunda
+                accepted = parser.recognize(sentence)
+                start = time.perf_counter()
+                assert parser.recognize(sentence) == accepted
+                results.append(f"workers={workers} {time.perf_counter() - start:7.3f}s")
+            finally:
+                parser.close()
+        print(f"  n={n:4d} " + ", ".join(results))
+
+def bench_viterbi():
+    # CYK de Viterbi exhaustivo contra poda por celda (beam y umbral) en una gramática ambigua con pesos
+    print("BENCHMARK: CYK de Viterbi con poda por celda")
+    grammar = Grammar()
+    grammar.load_from_text(generate_synthetic_grammar(num_nonterminals=100, num_rules=5000, vocab_size=200,
+                                                      ambiguity=0.3, weighted=True))
+    parser = build_parser(grammar)
+    sentences = sentences_in_range(grammar, random.Random(0), 10, 20, 20)
+    exact = [parser.parse_viterbi(sentence)[3] for sentence in sentences]
+    
+    for label, options in [("exhaustivo", {}), ("beam=30", {'beam': 30}), ("beam=10", {'beam': 10}),
+                           ("beam=3", {'beam': 3}), ("threshold=1e-3", {'threshold': 1e-3}),
+                           ("threshold=1e-2", {'threshold': 1e-2})]:
+        metrics = MetricsCollector()
+        parser.metrics = metrics
+        start = time.perf_counter()
+        results = [parser.parse_viterbi(sentence, **options) for sentence in sentences]
+        elapsed = time.perf_counter() - start
+        parser.metrics = None
+        found = sum(result[0] for result in results)
+        best = sum(1 for result, probability in zip(results, exact) if math.isclose(result[3], probability))
+        # Probabilidad del árbol encontrado relativa a la del mejor (0 si la poda rechazó la oración)
+        quality = sum(result[3] / probability for result, probability in zip(results, exact)) / len(sentences)
+        entries = metrics.counters['chart_entries'] / len(sentences)
+        print(f"  {label:16s} {elapsed / len(sentences) * 1000:8.2f} ms/oración, {entries:8.0f} entradas/oración, "
+              f"aceptadas {found}/{len(sentences)}, mejor árbol {best}/{len(sentences)}, "
+              f"probabilidad relativa {quality:.2f}")
+
+def bench_earley():
+    # Earley sobre la gramática original contra CYK sobre la CNF: preparación y oraciones por segundo
+    print("BENCHMARK: Earley (gramática original) vs CYK (CNF)")
+    english = load_english_grammar()
+    valid, invalid = test_sentences()
+    cases = [
+        ("inglés, oraciones del proyecto", english, valid + invalid, 100),
+        ("inglés, ~40 palabras", english, [long_english_sentence(40), "the cat " + long_english_sentence(40)], 3),
+    ]
+    for num_nonterminals, num_rules, cnf in [(50, 700, False), (50, 700, True), (200, 5000, True)]:
+        grammar = Grammar()
+        grammar.load_from_text(generate_synthetic_grammar(num_nonterminals=num_nonterminals, num_rules=num_rules,
+                                                          vocab_size=num_nonterminals * 4, cnf=cnf))
+        # Las oraciones se muestrean de la CNF: la gramática sin CNF tiene símbolos que no generan
+        sentences = sentences_in_range(build_parser(grammar).grammar, random.Random(0), 5, 15, 20)
+        cases.append((f"sintética {num_rules} reglas{'' if cnf else ' sin CNF'}", grammar, sentences, 1))
+    
+    for name, grammar, sentences, repeat in cases:
+        start = time.perf_counter()
+        cyk = build_parser(grammar)
+        cyk_setup = time.perf_counter() - start
+        start = time.perf_counter()
+        earley = EarleyParser(grammar)
+        earley_setup = time.perf_counter() - start
+        assert [earley.parse(s)[0] for s in sentences] == [cyk.parse(s)[0] for s in sentences]
+        original_rules = sum(len(prods) for prods in grammar.productions.values())
+        cnf_rules = sum(len(prods) for prods in cyk.grammar.productions.values())
+        print(f"{name} ({original_rules} reglas, {cnf_rules} en CNF, {len(sentences)} oraciones)")
+        print(f"  preparación: CYK (simplify + índices) {cyk_setup * 1000:.1f} ms, Earley {earley_setup * 1000:.1f} ms")
+        for label, func in [("CYK sets", cyk.parse),
+                            ("CYK bitset", CYKParser(cyk.grammar, engine='bitset').parse),
+                            ("Earley", earley.parse)]:
+            print(f"  {label:12s} {throughput(func, sentences, repeat):10.1f} oraciones/s")
+
+def bench_lexicon():
+    # Léxico abierto de 100k palabras: construcción, tokenización y rechazo de palabras desconocidas
+    print("BENCHMARK: léxico de 100k palabras")
+    vocabulary = [f"w{i}" for i in range(100000)]
+    grammar = Grammar()
+    grammar.load_from_text(ENGLISH_GRAMMAR_TEXT + "\nN -> " + " | ".join(vocabulary)
+                           + "\nN -> ice_cream | apple_pie | <unk>")
+    parser = build_parser(grammar)
+    start = time.perf_counter()
+    lexicon = Lexicon(parser.grammar)
+    print(f"Construcción del léxico: {time.perf_counter() - start:.3f}s ({len(lexicon.index)} terminales)")
+    
+    # Corpus mixto de ~40 palabras: sustantivos del vocabulario, la mitad con una palabra desconocida
+    rng = random.Random(0)
+    sentences = []
+    for k in range(200):
+        words = [rng.choice(vocabulary) if word in ('cake', 'fork', 'oven', 'knife') else word
+                 for word in long_english_sentence(40).split()]
+        if k % 2:
+            words[rng.randrange(len(words))] = f"unseen{k}"
+        elif k % 4 == 0:
+            words[3] = "ice cream"
+        sentences.append(" ".join(words))
+    
+    for label, func in [("str.split", lambda sentence: sentence.lower().split()),
+                        ("Lexicon.tokenize", lexicon.tokenize)]:
+        print(f"  {label:18s} {throughput(func, sentences, 20):10.0f} oraciones/s")
+    for label, unknown in [("sin léxico", None), ("léxico, rechazo", None), ("léxico, <unk>", '<unk>')]:
+        candidate = CYKParser(parser.grammar, engine='bitset')
+        if label != "sin léxico":
+            candidate.lexicon = Lexicon(parser.grammar, unknown=unknown)
+        accepted = sum(candidate.parse(sentence)[0] for sentence in sentences)
+        rate = throughput(candidate.parse, sentences)
+        print(f"  parse, {label:16s} {rate:8.1f} oraciones/s, {accepted}/{len(sentences)} aceptadas")
+
+def bench_prefilter():
+    # Corpus mixto: oraciones válidas y las mismas palabras desordenadas, con y sin filtros previos
+    print("BENCHMARK: filtros previos sobre un corpus mixto")
+    rng = random.Random(0)
+    english = load_english_grammar()
+    valid, invalid = test_sentences()
+    english_sentences = valid + invalid + [long_english_sentence(rng.randint(5, 30)) for _ in range(100)]
+    synthetic = Grammar()
+    synthetic.load_from_text(generate_synthetic_grammar(num_rules=700, seed=0))
+    synthetic_parser = build_parser(synthetic)
+    synthetic_sentences = sentences_in_range(synthetic_parser.grammar, rng, 5, 15, 100)
+    
+    for name, grammar, sentences in [("inglés", english, english_sentences), ("sintética 700 reglas", synthetic,
+                                                                              synthetic_sentences)]:
+        corpus = []
+        for sentence in sentences:
+            words = sentence.split()
+            corpus.append(sentence)
+            rng.shuffle(words)
+            corpus.append(" ".join(words))
+        cnf_grammar = build_parser(grammar).grammar
+        print(f"{name}: {len(corpus)} oraciones, "
+              f"{sum(CYKParser(cnf_grammar).recognize(s) for s in corpus)} aceptadas")
+        for label, prefilter in [("sin filtros", None),
+                                 ("vocabulario + FIRST/LAST", SentenceFilter(cnf_grammar)),
+                                 ("+ bigramas", SentenceFilter(cnf_grammar, bigrams=True))]:
+            parser = CYKParser(cnf_grammar, engine='bitset', prefilter=prefilter)
+            rate = throughput(parser.parse, corpus, 5)
+            avoided = ""
+            if prefilter is not None:
+                stats = prefilter.stats()
+                avoided = (f", evitados {stats['avoided'] // 5}/{len(corpus)} "
+                           + " ".join(f"{check}={count // 5}" for check, count in stats['rejected'].items()))
+            print(f"  {label:26s} {rate:10.1f} oraciones/s{avoided}")
+
+async def load_server(server, sentences, concurrency):
+    # Envía todas las oraciones con a lo sumo concurrency peticiones abiertas; devuelve los segundos
+    limit = asyncio.Semaphore(concurrency)
+    
+    async def send(sentence):
+        async with limit:
+            status, _ = await http_request(server.host, server.port, 'POST', '/parse', {'sentence': sentence})
+            assert status == 200, status
+    
+    start = time.perf_counter()
+    await asyncio.gather(*(send(sentence) for sentence in sentences))
+    return time.perf_counter() - start
+
+def bench_server():
+    # Servidor HTTP local: rendimiento y latencia con y sin lotes, con peticiones concurrentes
+    print("BENCHMARK: servidor asyncio con lotes")
+    parser = build_parser(load_english_grammar())
+    rng = random.Random(0)
+    sentences = [long_english_sentence(rng.randint(5, 25)) for _ in range(400)]
+    print(f"Parse directo en un proceso: {throughput(parser.parse, sentences):.0f} oraciones/s")
+    
+    async def run(workers, batch_size, concurrency):
+        server = ParseServer(parser.grammar, workers=workers, batch_size=batch_size)
+        await server.start()
+        try:
+            elapsed = await load_server(server, sentences, concurrency)
+            return elapsed, server.stats()
+        finally:
+            await server.close()
+    
+    for workers, batch_size, concurrency in [(1, 1, 1), (1, 1, 32), (1, 32, 32), (2, 32, 32), (1, 32, 128)]:
+        elapsed, stats = asyncio.run(run(workers, batch_size, concurrency))
+        latency = stats['latency_ms']
+        print(f"  procesos={workers} lote={batch_size:3d} concurrencia={concurrency:4d}: "
+              f"{len(sentences) / elapsed:7.0f} peticiones/s, p50 {latency['p50']:6.1f} ms, "
+              f"p99 {latency['p99']:6.1f} ms, lote medio {stats['mean_batch_size']:.1f}, "
+              f"cola máx. {stats['max_queue_depth']}")
+
+def large_cnf_grammar(num_nonterminals, num_binary, num_words, seed=0):
+    # Gramática CNF grande construida directamente (sin simplificar): reglas binarias al azar y un
+    # léxico donde cada palabra tiene de 1 a 3 preterminales
+    rng = random.Random(seed)
+    symbols = [f"N{i}" for i in range(num_nonterminals)]
+    grammar = Grammar()
+    seen = set()
+    while len(seen) < num_binary:
+        rule = (rng.choice(symbols), rng.choice(symbols), rng.choice(symbols))
+        if rule not in seen:
+            seen.add(rule)
+            grammar.add_production(rule[0], [rule[1], rule[2]])
+    for k in range(num_words):
+        for nt in rng.sample(symbols, rng.randint(1, 3)):
+            grammar.add_production(nt, [f"w{k}"])
+    grammar.set_start_symbol(symbols[0])
+    return grammar
+
+def bench_compiled():
+    # Arranque de un parser desde la gramática serializada con pickle (lo que recibe cada proceso de
+    # parse_many) frente a abrir el artefacto compilado con mmap
+    print("BENCHMARK: gramática compilada con mmap")
+    grammar = large_cnf_grammar(1000, 200000, 400000)
+    rules = grammar.size()['productions']
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'grammar.cykg')
+        start = time.perf_counter()
+        compile_grammar(grammar, path)
+        print(f"{rules} reglas: compilación {time.perf_counter() - start:.2f}s, "
+              f"artefacto {os.path.getsize(path) / 2**20:.1f} MiB, "
+              f"pickle {len(pickle.dumps(grammar, protocol=pickle.HIGHEST_PROTOCOL)) / 2**20:.1f} MiB")
+        grammar_bytes = pickle.dumps(grammar, protocol=pickle.HIGHEST_PROTOCOL)
+        
+        rng = random.Random(0)
+        sentences = [" ".join(f"w{rng.randrange(400000)}" for _ in range(10)) for _ in range(20)]
+        for label, load in [("pickle + índices", lambda: CYKParser(pickle.loads(grammar_bytes), engine='bitset')),
+                            ("mmap", lambda: CYKParser(CompiledGrammar(path), engine='bitset'))]:
+            start = time.perf_counter()
+            load()
+            startup = time.perf_counter() - start
+            # La memoria se mide en otra carga: tracemalloc hace más lenta la creación de objetos
+            tracemalloc.start()
+            parser = load()
+            _, startup_peak = tracemalloc.get_traced_memory()
+            parser.parse(sentences[0])
+            resident = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            rate = throughput(parser.parse, sentences)
+            print(f"  {label:18s} arranque {startup * 1000:8.1f} ms, pico {startup_peak / 2**20:7.1f} MiB, "
+                  f"memoria propia tras un parse {resident / 2**20:7.1f} MiB, {rate:7.1f} oraciones/s")
+            del parser
+
+def new_blocks_per_parse(parser, sentence):
+    # Bloques de memoria nuevos que siguen vivos tras un análisis (tabla, retropunteros y árbol) y
+    # pico de tracemalloc; la tabla anterior se retiene para que su liberación no descuente bloques
+    parser.parse(sentence)
+    previous = (parser.table, parser.parse_table)
+    ignore = (tracemalloc.Filter(False, tracemalloc.__file__),)
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot().filter_traces(ignore)
+    result = parser.parse(sentence)
+    _, peak = tracemalloc.get_traced_memory()
+    after = tracemalloc.take_snapshot().filter_traces(ignore)
+    tracemalloc.stop()
+    del previous, result
+    return sum(stat.count_diff for stat in after.compare_to(before, 'filename') if stat.count_diff > 0), peak
+
+def bench_arena():
+    # Tabla nueva por oración contra ChartArena (celdas vaciadas en su lugar) en el motor 'sets'
+    print("BENCHMARK: tabla reutilizable (ChartArena) vs tabla nueva por oración")
+    cnf_grammar = build_parser(load_english_grammar()).grammar
+    valid, invalid = test_sentences()
+    workloads = [
+        ("oraciones del proyecto", valid + invalid, 2000),
+        ("oraciones de ~20 palabras", [long_english_sentence(20), "the cat " + long_english_sentence(20)], 200),
+        ("oraciones de ~60 palabras", [long_english_sentence(60), "the cat " + long_english_sentence(60)], 5),
+    ]
+    for name, sentences, repeat in workloads:
+        print(f"Carga: {name}")
+        for label, arena_size in [("tabla nueva", 0), ("arena", 64)]:
+            for backpointers in ('all', 'none'):
+                parser = CYKParser(cnf_grammar, backpointers=backpointers, arena_size=arena_size)
+                with silenced():
+                    blocks, peak = new_blocks_per_parse(parser, sentences[0])
+                gc.collect()
+                collections = gc.get_stats()[0]['collections']
+                rate = throughput(parser.parse, sentences, repeat)
+                collections = gc.get_stats()[0]['collections'] - collections
+                print(f"  {label:11s} backpointers='{backpointers}' {rate:9.1f} oraciones/s, "
+                      f"{blocks:6d} bloques nuevos por análisis, pico {peak / 1024:7.1f} KiB, "
+                      f"{collections * 1000 / (len(sentences) * repeat):6.2f} recolecciones gen0 por 1000")
+
+def chain_grammar(length):
+    # Cadena N0 -> N1 x -> ... -> Nk w, listada al revés: cada barrido completo descubre un solo
+    # símbolo generador; más una cadena unitaria U0 -> U1 -> ... -> Uk (clausura cuadrática)
+    lines = ["S -> N0 U0"]
+    for i in range(length - 1, -1, -1):
+        lines.append(f"N{i} -> N{i+1} x")
+    lines.append(f"N{length} -> w")
+    for i in range(length):
+        lines.append(f"U{i} -> U{i+1}")
+        lines.append(f"U{i} -> u{i}")
+    lines.append(f"U{length} -> w")
+    return "\n".join(lines)
+
+def bench_simplify():
+    # Tiempo de cada paso de simplify() en gramáticas no CNF de tamaño creciente
+    print("BENCHMARK: pasos de GrammarSimplifier.simplify()")
+    cases = []
+    for num_rules in [1000, 5000, 20000, 50000]:
+        cases.append((f"{num_rules} reglas", generate_synthetic_grammar(
+            num_nonterminals=max(50, num_rules // 25), num_rules=num_rules,
+            vocab_size=max(100, num_rules // 10), cnf=False)))
+    for length in [500, 2000]:
+        cases.append((f"cadena de {length}", chain_grammar(length)))
+    for name, text in cases:
+        grammar = Grammar()
+        grammar.load_from_text(text)
+        with silenced():
+            start = time.perf_counter()
+            simplifier = GrammarSimplifier(grammar)
+            timings = [("copia inicial", time.perf_counter() - start)]
+            for step in SIMPLIFY_STEPS:
+                start = time.perf_counter()
+                getattr(simplifier, step)()
+                timings.append((step, time.perf_counter() - start))
+        cnf_rules = sum(len(p) for p in simplifier.simplified_grammar.productions.values())
+        total = sum(elapsed for _, elapsed in timings)
+        print(f"  {name} -> {cnf_rules} reglas CNF, total {total:.3f}s")
+        for step, elapsed in timings:
+            print(f"    {step:32s} {elapsed:8.4f}s")
+
+BENCHMARKS = {
+    'index': bench_index,
+    'compact': bench_compact,
+    'modes': bench_modes,
+    'parallel': bench_parallel,
+    'cache': bench_cache,
+    'memo': bench_memo,
+    'incremental': bench_incremental,
+    'trees': bench_trees,
+    'phases': bench_phases,
+    'numpy': bench_numpy,
+    'long': bench_long,
+    'fill_workers': bench_fill_workers,
+    'viterbi': bench_viterbi,
+    'earley': bench_earley,
+    'lexicon': bench_lexicon,
+    'prefilter': bench_prefilter,
+    'server': bench_server,
+    'compiled': bench_compiled,
+    'arena': bench_arena,
+    'simplify': bench_simplify,
+}
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Benchmarks del parser CYK")
+    arg_parser.add_argument('names', nargs='*',
+                            help=f"benchmarks a ejecutar: {', '.join(sorted(BENCHMARKS))} (por defecto todos)")
+    args = arg_parser.parse_args()
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        arg_parser.error(f"benchmark desconocido: {', '.join(unknown)}")
+    for name in args.names or sorted(BENCHMARKS):
+        BENCHMARKS[name]()
+        print()
+
+if __name__ == "__main__":
+    main()
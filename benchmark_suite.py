@@ -0,0 +1,284 @@
+import argparse
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+from grammar import Grammar
+from grammar_simplifier import GrammarSimplifier
+from cyk_algorithm import CYKParser
+from benchmark import generate_synthetic_grammar
+
+# Versión del formato JSON de resultados
+SUITE_VERSION = 1
+
+# Configuraciones de gramática: nombre -> argumentos de generate_synthetic_grammar
+QUICK_GRAMMARS = {
+    'cnf-700': dict(num_nonterminals=50, num_rules=700, vocab_size=200, cnf=True),
+    'cnf-700-ambigua': dict(num_nonterminals=50, num_rules=700, vocab_size=200, cnf=True, ambiguity=0.3),
+    'no-cnf-700': dict(num_nonterminals=50, num_rules=700, vocab_size=200, cnf=False),
+    'cnf-5k': dict(num_nonterminals=200, num_rules=5000, vocab_size=500, cnf=True),
+}
+FULL_GRAMMARS = {
+    'cnf-5k': dict(num_nonterminals=200, num_rules=5000, vocab_size=500, cnf=True),
+    'cnf-5k-ambigua': dict(num_nonterminals=200, num_rules=5000, vocab_size=500, cnf=True, ambiguity=0.3),
+    'cnf-20k': dict(num_nonterminals=400, num_rules=20000, vocab_size=2000, cnf=True),
+    'no-cnf-5k': dict(num_nonterminals=200, num_rules=5000, vocab_size=500, cnf=False),
+}
+QUICK_LENGTHS = [5, 10, 20]
+FULL_LENGTHS = [5, 10, 20, 40]
+
+def derivable_lengths(cnf_grammar, max_length):
+    # lengths[A] = máscara de bits donde el bit l indica que A deriva alguna cadena de l palabras
+    productions = cnf_grammar.productions
+    limit = (1 << (max_length + 1)) - 1
+    lengths = {nt: 0 for nt in productions}
+    binary = []
+    for nt, prods in productions.items():
+        for prod in prods:
+            if len(prod) == 1 and prod[0] not in productions:
+                lengths[nt] |= 1 << 1
+            elif len(prod) == 2:
+                binary.append((nt, prod[0], prod[1]))
+    
+    # Punto fijo: A -> B C deriva i + j palabras si B deriva i y C deriva j
+    changed = True
+    while changed:
+        changed = False
+        for a, b, c in binary:
+            left = lengths.get(b, 0)
+            right = lengths.get(c, 0)
+            if not left or not right:
+                continue
+            combined = 0
+            while left:
+                low = left & -left
+                left ^= low
+                combined |= right << (low.bit_length() - 1)
+            combined &= limit
+            if combined & ~lengths[a]:
+                lengths[a] |= combined
+                changed = True
+    return lengths
+
+def sample_of_length(cnf_grammar, lengths, length, rng):
+    # Oración aceptada de exactamente length palabras, o None si el símbolo inicial no deriva esa longitud
+    productions = cnf_grammar.productions
+    start = cnf_grammar.start_symbol
+    if not (lengths.get(start, 0) >> length) & 1:
+        return None
+    
+    words = []
+    stack = [(start, length)]
+    while stack:
+        symbol, size = stack.pop()
+        # Opciones (producción, largo del hijo izquierdo) que pueden completar size palabras
+        options = []
+        for prod in productions[symbol]:
+            if len(prod) == 1:
+                if size == 1 and prod[0] not in productions:
+                    options.append((prod, 0))
+            elif len(prod) == 2:
+                left_mask = lengths.get(prod[0], 0)
+                right_mask = lengths.get(prod[1], 0)
+                for k in range(1, size):
+                    if (left_mask >> k) & 1 and (right_mask >> (size - k)) & 1:
+                        options.append((prod, k))
+        prod, k = rng.choice(options)
+        if k == 0:
+            words.append(prod[0])
+        else:
+            stack.append((prod[1], size - k))
+            stack.append((prod[0], k))
+    return " ".join(words)
+
+def near_miss(parser, sentence, vocabulary, rng, attempts=50):
+    # Variante rechazada del mismo largo con una sola edición: cambiar una palabra o intercambiar dos vecinas
+    words = sentence.split()
+    for _ in range(attempts):
+        candidate = list(words)
+        i = rng.randrange(len(candidate))
+        if len(candidate) > 1 and rng.random() < 0.4:
+            j = i + 1 if i + 1 < len(candidate) else i - 1
+            candidate[i], candidate[j] = candidate[j], candidate[i]
+        else:
+            candidate[i] = rng.choice(vocabulary)
+        text = " ".join(candidate)
+        if not parser.recognize(text):
+            return text
+    return None
+
+def best_time(func, repeat):
+    # Mejor tiempo (segundos) de repeat ejecuciones: el mínimo es el menos afectado por ruido
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def peak_memory(func):
+    # Pico de memoria asignada (bytes) durante una ejecución; se mide aparte del tiempo
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+def load_grammar(text):
+    # Carga el texto en una gramática nueva
+    grammar = Grammar()
+    grammar.load_from_text(text)
+    return grammar
+
+def build_sentences(parser, lengths_wanted, per_length, rng):
+    # Oraciones aceptadas y casi aceptadas (rechazadas) de cada longitud pedida
+    cnf_grammar = parser.grammar
+    lengths = derivable_lengths(cnf_grammar, max(lengths_wanted))
+    vocabulary = sorted(word for word in parser.terminal_index if word not in cnf_grammar.productions)
+    sentences = {}
+    for length in lengths_wanted:
+        accepted = []
+        rejected = []
+        for _ in range(per_length):
+            sentence = sample_of_length(cnf_grammar, lengths, length, rng)
+            if sentence is None:
+                break
+            accepted.append(sentence)
+            miss = near_miss(parser, sentence, vocabulary, rng)
+            if miss is not None:
+                rejected.append(miss)
+        sentences[length] = {'accepted': accepted, 'rejected': rejected}
+    return sentences
+
+def run_grammar_case(name, config, lengths, per_length, engines, repeat, seed):
+    # Mide carga, simplificación y parsing de una configuración de gramática
+    text = generate_synthetic_grammar(seed=seed, **config)
+    num_rules = len(text.splitlines())
+    result = {'grammar': name, 'config': config, 'rules': num_rules}
+    
+    load_seconds = best_time(lambda: load_grammar(text), repeat)
+    result['load'] = {
+        'seconds': load_seconds,
+        'rules_per_s': num_rules / load_seconds,
+        'peak_kib': peak_memory(lambda: load_grammar(text)) / 1024,
+    }
+    
+    grammar = load_grammar(text)
+    simplify_seconds = best_time(lambda: GrammarSimplifier(grammar).simplify(), repeat)
+    cnf_grammar = GrammarSimplifier(grammar).simplify()
+    result['simplify'] = {
+        'seconds': simplify_seconds,
+        'rules_per_s': num_rules / simplify_seconds,
+        'peak_kib': peak_memory(lambda: GrammarSimplifier(grammar).simplify()) / 1024,
+        'cnf_rules': sum(len(prods) for prods in cnf_grammar.productions.values()),
+    }
+    
+    reference = CYKParser(cnf_grammar, engine='bitset')
+    # Proporción de lados derechos B C compartidos por varios A: ambigüedad efectiva de la CNF
+    shared = sum(1 for nts in reference.binary_index.values() if len(nts) > 1)
+    result['ambiguous_rhs_share'] = shared / len(reference.binary_index) if reference.binary_index else 0.0
+    sentences = build_sentences(reference, lengths, per_length, random.Random(seed))
+    
+    result['parse'] = []
+    for engine in engines:
+        parser = CYKParser(cnf_grammar, engine=engine)
+        for length in lengths:
+            for kind in ('accepted', 'rejected'):
+                batch = sentences[length][kind]
+                if not batch:
+                    continue
+                outcomes = [parser.parse(sentence)[0] for sentence in batch]
+                seconds = best_time(lambda: [parser.parse(sentence) for sentence in batch], repeat)
+                result['parse'].append({
+                    'engine': engine,
+                    'length': length,
+                    'kind': kind,
+                    'sentences': len(batch),
+                    'accepted': sum(outcomes),
+                    'per_s': len(batch) / seconds,
+                    'mean_ms': seconds / len(batch) * 1000,
+                    'peak_kib': peak_memory(lambda: parser.parse(batch[0])) / 1024,
+                })
+    return result
+
+def git_revision():
+    # Commit actual, para saber con qué código se obtuvieron los resultados
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_suite(quick=False, seed=0, engines=CYKParser.ENGINES, log=sys.stderr):
+    # Ejecuta la suite completa (o la rápida, < 1 minuto) y devuelve los resultados como dict
+    grammars = QUICK_GRAMMARS if quick else FULL_GRAMMARS
+    lengths = QUICK_LENGTHS if quick else FULL_LENGTHS
+    per_length = 10
+    repeat = 3
+    
+    results = []
+    for name, config in grammars.items():
+        start = time.perf_counter()
+        results.append(run_grammar_case(name, config, lengths, per_length, engines, repeat, seed))
+        print(f"{name}: {time.perf_counter() - start:.1f} s", file=log)
+    
+    return {
+        'suite_version': SUITE_VERSION,
+        'mode': 'quick' if quick else 'full',
+        'seed': seed,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'git': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results,
+    }
+
+def flatten(report):
+    # Métricas de un reporte como {(gramática, medición): valor}, para comparar reportes
+    metrics = {}
+    for result in report['results']:
+        for phase in ('load', 'simplify'):
+            metrics[(result['grammar'], f"{phase} rules_per_s")] = result[phase]['rules_per_s']
+        for entry in result['parse']:
+            key = f"parse {entry['engine']} len={entry['length']} {entry['kind']} per_s"
+            metrics[(result['grammar'], key)] = entry['per_s']
+    return metrics
+
+def compare(baseline, current, out=sys.stderr):
+    # Imprime la razón actual/base de cada métrica de rendimiento (> 1 = más rápido)
+    old = flatten(baseline)
+    new = flatten(current)
+    print(f"Comparación contra {baseline.get('git') or 'base'} ({baseline.get('mode')}):", file=out)
+    for key in sorted(set(old) & set(new)):
+        ratio = new[key] / old[key] if old[key] else float('inf')
+        print(f"  {key[0]:16s} {key[1]:40s} x{ratio:.2f}", file=out)
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Suite de benchmarks reproducible con salida JSON")
+    arg_parser.add_argument('--quick', action='store_true', help="configuración reducida (< 1 minuto)")
+    arg_parser.add_argument('--seed', type=int, default=0, help="semilla de gramáticas y oraciones")
+    arg_parser.add_argument('--engine', action='append', choices=CYKParser.ENGINES,
+                            help="motor a medir (repetible; por defecto todos)")
+    arg_parser.add_argument('--out', default='-', help="archivo JSON de resultados ('-' = stdout)")
+    arg_parser.add_argument('--compare', help="reporte JSON anterior para comparar el rendimiento")
+    args = arg_parser.parse_args(argv)
+    
+    report = run_suite(quick=args.quick, seed=args.seed, engines=tuple(args.engine or CYKParser.ENGINES))
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.out == '-':
+        print(text)
+    else:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            compare(json.load(f), report)
+
+if __name__ == "__main__":
+    main()
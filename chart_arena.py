@@ -0,0 +1,70 @@
+class ChartArena:
+    """Tabla CYK reutilizable del motor 'sets': las celdas se vacían en su lugar entre análisis"""
+    
+    def __init__(self, size=32):
+        # size: longitud de oración para la que se reservan celdas desde el inicio; una oración más
+        # larga agranda el arena al menos al doble. Solo existen las celdas [i][j] con j >= i (las
+        # de abajo de la diagonal son None)
+        if size < 1:
+            raise ValueError("El tamaño del arena debe ser positivo")
+        self.capacity = 0
+        self.table = []
+        # Diccionarios de retropunteros: se crean con el primer análisis que los pide
+        self.parse_table = None
+        # Longitud de la última oración que usó cada tabla: sus celdas pueden estar ocupadas
+        self.dirty_table = 0
+        self.dirty_parse_table = 0
+        self.acquires = 0
+        self.grows = 0
+        self.reserve(size)
+    
+    def reserve(self, n):
+        # Asegura celdas para oraciones de n palabras, creciendo geométricamente
+        if n <= self.capacity:
+            return
+        old = self.capacity
+        new = max(n, 2 * old)
+        self.grow_rows(self.table, old, new, set)
+        if self.parse_table is not None:
+            self.grow_rows(self.parse_table, old, new, dict)
+        self.capacity = new
+        if old:
+            self.grows += 1
+    
+    @staticmethod
+    def grow_rows(rows, old, new, factory):
+        # Alarga las filas existentes y agrega las nuevas, conservando las celdas ya creadas
+        for row in rows:
+            row.extend(factory() for _ in range(old, new))
+        for i in range(old, new):
+            rows.append([None] * i + [factory() for _ in range(i, new)])
+    
+    def acquire(self, n, backpointers=True):
+        # Devuelve (table, parse_table) vacías en [0, n) para una oración de n palabras; parse_table
+        # es None si backpointers=False. Solo se vacían las celdas que la oración anterior pudo llenar
+        self.acquires += 1
+        self.reserve(n)
+        self.clear(self.table, self.dirty_table)
+        self.dirty_table = n
+        if not backpointers:
+            return self.table, None
+        if self.parse_table is None:
+            self.parse_table = []
+            self.grow_rows(self.parse_table, 0, self.capacity, dict)
+        self.clear(self.parse_table, self.dirty_parse_table)
+        self.dirty_parse_table = n
+        return self.table, self.parse_table
+    
+    @staticmethod
+    def clear(rows, n):
+        # Vacía el triángulo superior de las primeras n filas y columnas
+        for i in range(n):
+            row = rows[i]
+            for j in range(i, n):
+                cell = row[j]
+                if cell:
+                    cell.clear()
+    
+    def stats(self):
+        # Capacidad actual (palabras), tablas entregadas y veces que hubo que crecer
+        return {'capacity': self.capacity, 'acquires': self.acquires, 'grows': self.grows}
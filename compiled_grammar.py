@@ -0,0 +1,403 @@
+import bisect
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import zlib
+from array import array
+from collections.abc import Mapping
+from grammar import Grammar
+
+MAGIC = b'CYKG'
+FORMAT_VERSION = 2
+
+# Secciones del archivo, en este orden, cada una alineada a 8 bytes. Los arreglos 'I' son enteros
+# sin signo de 32 bits y los 'd' flotantes de 64 bits, en el orden de bytes de la máquina que compila
+SECTIONS = (
+    ('symbol_offsets', 'I'),   # N+1: nombres de los no terminales (ordenados) dentro de symbol_names
+    ('symbol_names', 'B'),
+    ('helper_flags', 'B'),     # N: 1 si el no terminal es una variable auxiliar de la CNF
+    ('terminal_offsets', 'I'), # T+1: terminales dentro de terminal_names
+    ('terminal_names', 'B'),
+    ('terminal_hash', 'I'),    # tabla hash abierta (crc32, sondeo lineal): id del terminal + 1, o 0
+    ('lexical_start', 'I'),    # T+1: CSR por terminal -> lexical_heads (A con A -> terminal)
+    ('lexical_heads', 'I'),
+    ('lexical_weights', 'd'),
+    ('left_start', 'I'),       # N+1: pares (B, C) de cada B, ordenados por C
+    ('pair_right', 'I'),       # P: C de cada par
+    ('pair_start', 'I'),       # P+1: CSR por par (B, C) -> binary_heads (A con A -> B C)
+    ('binary_heads', 'I'),
+    ('binary_weights', 'd'),
+    ('right_union', 'B'),      # N máscaras de mask_bytes bytes: todos los C de algún par (B, C)
+    ('provenance', 'B'),       # JSON con unit_chains y left_recursion_helpers (solo para ParseTree.collapse)
+)
+# Encabezado: magia, versión, orden de bytes, id del símbolo inicial y (desplazamiento, bytes) por sección
+HEADER = struct.Struct(f"<4sIII{2 * len(SECTIONS)}Q")
+
+def terminal_slot(word_bytes, size):
+    # Primera casilla de la tabla hash para un terminal (crc32 es estable entre procesos)
+    return zlib.crc32(word_bytes) & (size - 1)
+
+def compile_grammar(cnf_grammar, path):
+    # Escribe la gramática CNF como artefacto binario de tablas planas (ver CompiledGrammar)
+    productions = cnf_grammar.productions
+    symbols = sorted(productions)
+    ids = {nt: i for i, nt in enumerate(symbols)}
+    if cnf_grammar.start_symbol not in ids:
+        raise ValueError("El símbolo inicial no tiene producciones")
+    
+    lexical = {}
+    binary = {}
+    for nt, prods in productions.items():
+        for prod in prods:
+            weight = cnf_grammar.rule_weight(nt, prod)
+            # Como en CYKParser.build_indexes, toda regla de un símbolo va a la tabla léxica
+            if len(prod) == 1:
+                lexical.setdefault(prod[0], []).append((ids[nt], weight))
+            elif len(prod) == 2 and prod[0] in ids and prod[1] in ids:
+                binary.setdefault((ids[prod[0]], ids[prod[1]]), []).append((ids[nt], weight))
+            else:
+                raise ValueError(f"La regla {nt} -> {' '.join(prod)} no está en CNF")
+    
+    data = {name: array(typecode) for name, typecode in SECTIONS}
+    names = [nt.encode('utf-8') for nt in symbols]
+    data['symbol_offsets'] = array('I', offsets_of(names))
+    data['symbol_names'] = array('B', b''.join(names))
+    data['helper_flags'] = array('B', [nt in cnf_grammar.helper_symbols for nt in symbols])
+    
+    terminals = sorted(lexical)
+    encoded = [word.encode('utf-8') for word in terminals]
+    data['terminal_offsets'] = array('I', offsets_of(encoded))
+    data['terminal_names'] = array('B', b''.join(encoded))
+    size = 1
+    while size < 2 * len(terminals):
+        size *= 2
+    table = array('I', bytes(4 * size))
+    for tid, word in enumerate(encoded):
+        slot = terminal_slot(word, size)
+        while table[slot]:
+            slot = (slot + 1) & (size - 1)
+        table[slot] = tid + 1
+    data['terminal_hash'] = table
+    
+    data['lexical_start'].append(0)
+    for word in terminals:
+        for head, weight in sorted(lexical[word]):
+            data['lexical_heads'].append(head)
+            data['lexical_weights'].append(weight)
+        data['lexical_start'].append(len(data['lexical_heads']))
+    
+    pairs = sorted(binary)
+    data['pair_start'].append(0)
+    for b, c in pairs:
+        data['pair_right'].append(c)
+        for head, weight in sorted(binary[(b, c)]):
+            data['binary_heads'].append(head)
+            data['binary_weights'].append(weight)
+        data['pair_start'].append(len(data['binary_heads']))
+    lefts = [b for b, _ in pairs]
+    unions = [0] * len(symbols)
+    for b, c in pairs:
+        unions[b] |= 1 << c
+    data['right_union'] = array('B', b''.join(union.to_bytes(mask_bytes(len(symbols)), 'little')
+                                             for union in unions))
+    data['left_start'] = array('I', [bisect.bisect_left(lefts, b) for b in range(len(symbols) + 1)])
+    provenance = {
+        'unit_chains': [[nt, list(prod), list(chain)] for (nt, prod), chain in cnf_grammar.unit_chains.items()],
+        'left_recursion_helpers': cnf_grammar.left_recursion_helpers,
+    }
+    data['provenance'] = array('B', json.dumps(provenance, ensure_ascii=False).encode('utf-8'))
+    
+    # Desplazamientos de las secciones tras el encabezado, alineados a 8 bytes
+    blobs = [data[name].tobytes() for name, _ in SECTIONS]
+    layout = []
+    position = HEADER.size
+    for blob in blobs:
+        position += -position % 8
+        layout.extend((position, len(blob)))
+        position += len(blob)
+    byte_order = 1 if sys.byteorder == 'little' else 2
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, byte_order, ids[cnf_grammar.start_symbol], *layout)
+    
+    # Escritura atómica, como GrammarCache.store
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(header)
+            for offset, blob in zip(layout[::2], blobs):
+                f.write(bytes(offset - f.tell()))
+                f.write(blob)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return path
+
+def mask_bytes(num_symbols):
+    # Bytes de una máscara de no terminales guardada en el archivo (palabras de 64 bits)
+    return (num_symbols + 63) // 64 * 8
+
+def offsets_of(blobs):
+    # Desplazamientos acumulados de una lista de cadenas de bytes (N+1 valores)
+    offsets = [0]
+    for blob in blobs:
+        offsets.append(offsets[-1] + len(blob))
+    return offsets
+
+class CompiledGrammar:
+    """Gramática CNF compilada y abierta con mmap: tablas planas compartidas entre procesos"""
+    
+    def __init__(self, path):
+        # Solo se decodifican los nombres de los no terminales; terminales y reglas se leen del mmap
+        # al consultarlos, así que todos los procesos que abren el archivo comparten las mismas páginas
+        self.path = path
+        with open(path, 'rb') as f:
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self.buffer)
+        if len(view) < HEADER.size:
+            raise ValueError(f"{path} no es una gramática compilada")
+        magic, version, byte_order, start_id, *layout = HEADER.unpack_from(view)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"{path} no es una gramática compilada (formato {FORMAT_VERSION})")
+        if byte_order != (1 if sys.byteorder == 'little' else 2):
+            raise ValueError(f"{path} se compiló en una máquina con otro orden de bytes")
+        for (name, typecode), offset, length in zip(SECTIONS, layout[::2], layout[1::2]):
+            setattr(self, name, view[offset:offset + length].cast(typecode))
+        
+        names = bytes(self.symbol_names)
+        offsets = self.symbol_offsets
+        self.symbols = [names[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(len(offsets) - 1)]
+        self.symbol_ids = {nt: i for i, nt in enumerate(self.symbols)}
+        self.start_symbol = self.symbols[start_id]
+        self.helper_symbols = {nt for nt, flag in zip(self.symbols, self.helper_flags) if flag}
+        self.non_terminals = set(self.symbols)
+        self.num_terminals = len(self.terminal_offsets) - 1
+        # productions y weights se materializan solo si algo los pide (Viterbi, conversiones)
+        self.materialized = None
+        # La procedencia de las reglas se decodifica al primer árbol colapsado
+        self.decoded_provenance = None
+    
+    def __reduce__(self):
+        # Se envía a otros procesos como la ruta: cada uno abre el mismo archivo con mmap
+        return CompiledGrammar, (self.path,)
+    
+    def terminal(self, tid):
+        # Texto del terminal con id tid
+        return bytes(self.terminal_names[self.terminal_offsets[tid]:self.terminal_offsets[tid + 1]]).decode('utf-8')
+    
+    def terminal_id(self, word):
+        # Id de un terminal por la tabla hash del archivo, o -1 si no está
+        table = self.terminal_hash
+        size = len(table)
+        if not size:
+            return -1
+        encoded = word.encode('utf-8')
+        offsets = self.terminal_offsets
+        names = self.terminal_names
+        slot = terminal_slot(encoded, size)
+        while True:
+            entry = table[slot]
+            if not entry:
+                return -1
+            tid = entry - 1
+            if names[offsets[tid]:offsets[tid + 1]] == encoded:
+                return tid
+            slot = (slot + 1) & (size - 1)
+    
+    def lexical_heads_of(self, tid):
+        # Ids de los A con A -> terminal
+        return self.lexical_heads[self.lexical_start[tid]:self.lexical_start[tid + 1]]
+    
+    def pair_index(self, b, c):
+        # Posición del par (B, C) en pair_right, o -1 si ninguna regla tiene ese lado derecho
+        low = self.left_start[b]
+        high = self.left_start[b + 1]
+        p = bisect.bisect_left(self.pair_right, c, low, high)
+        return p if p < high and self.pair_right[p] == c else -1
+    
+    def binary_row(self, b):
+        # Reglas de B en el formato de CYKParser.binary_by_left: [(bit de A, máscara de los C)]
+        rules = {}
+        heads = self.binary_heads
+        for p in range(self.left_start[b], self.left_start[b + 1]):
+            c_bit = 1 << self.pair_right[p]
+            for h in heads[self.pair_start[p]:self.pair_start[p + 1]]:
+                rules[1 << h] = rules.get(1 << h, 0) | c_bit
+        return list(rules.items())
+    
+    def parser_indexes(self):
+        # Índices de CYKParser (INDEX_ATTRIBUTES) respaldados por el archivo
+        width = mask_bytes(len(self.symbols))
+        unions = self.right_union
+        right_union = [int.from_bytes(unions[b * width:(b + 1) * width], 'little')
+                       for b in range(len(self.symbols))]
+        return {
+            'terminal_index': TerminalTable(self, masks=False),
+            'binary_index': BinaryTable(self),
+            'symbols': self.symbols,
+            'symbol_ids': self.symbol_ids,
+            'terminal_masks': TerminalTable(self, masks=True),
+            'binary_by_left': BinaryRows(self),
+            'right_union': right_union,
+        }
+    
+    def size(self):
+        # Mismo resumen que Grammar.size, a partir de los largos de las tablas
+        lexical = len(self.lexical_heads)
+        binary = len(self.binary_heads)
+        return {'non_terminals': len(self.symbols), 'productions': lexical + binary,
+                'symbols': lexical + 2 * binary}
+    
+    def to_grammar(self):
+        # Reconstruye la Grammar completa (costoso: recorre todas las reglas)
+        grammar = Grammar()
+        symbols = self.symbols
+        for tid in range(self.num_terminals):
+            word = self.terminal(tid)
+            for k in range(self.lexical_start[tid], self.lexical_start[tid + 1]):
+                weight = self.lexical_weights[k]
+                grammar.add_production(symbols[self.lexical_heads[k]], [word], weight if weight != 1 else None)
+        for b in range(len(symbols)):
+            for p in range(self.left_start[b], self.left_start[b + 1]):
+                right = [symbols[b], symbols[self.pair_right[p]]]
+                for k in range(self.pair_start[p], self.pair_start[p + 1]):
+                    weight = self.binary_weights[k]
+                    grammar.add_production(symbols[self.binary_heads[k]], list(right),
+                                           weight if weight != 1 else None)
+        grammar.terminals -= grammar.non_terminals
+        grammar.start_symbol = self.start_symbol
+        grammar.helper_symbols = set(self.helper_symbols)
+        grammar.unit_chains = dict(self.unit_chains)
+        grammar.left_recursion_helpers = dict(self.left_recursion_helpers)
+        return grammar
+    
+    def load_provenance(self):
+        # Decodifica la sección provenance: (unit_chains, left_recursion_helpers) como en Grammar
+        if self.decoded_provenance is None:
+            data = json.loads(bytes(self.provenance).decode('utf-8'))
+            chains = {(nt, tuple(prod)): tuple(chain) for nt, prod, chain in data['unit_chains']}
+            self.decoded_provenance = (chains, data['left_recursion_helpers'])
+        return self.decoded_provenance
+    
+    @property
+    def unit_chains(self):
+        return self.load_provenance()[0]
+    
+    @property
+    def left_recursion_helpers(self):
+        return self.load_provenance()[1]
+    
+    @property
+    def productions(self):
+        # Vista de Grammar para el código que recorre las reglas (se materializa una vez)
+        if self.materialized is None:
+            self.materialized = self.to_grammar()
+        return self.materialized.productions
+    
+    @property
+    def weights(self):
+        self.productions
+        return self.materialized.weights
+    
+    def rule_weight(self, left, right):
+        # Probabilidad de una producción, como Grammar.rule_weight
+        self.productions
+        return self.materialized.rule_weight(left, right)
+
+class TerminalTable(Mapping):
+    """terminal_index (conjuntos de nombres) o terminal_masks (máscaras de bits) leídos del archivo"""
+    
+    def __init__(self, compiled, masks):
+        self.compiled = compiled
+        self.masks = masks
+    
+    def lookup(self, tid):
+        # Valor de la tabla para un terminal
+        heads = self.compiled.lexical_heads_of(tid)
+        if self.masks:
+            mask = 0
+            for h in heads:
+                mask |= 1 << h
+            return mask
+        return {self.compiled.symbols[h] for h in heads}
+    
+    def get(self, word, default=None):
+        tid = self.compiled.terminal_id(word)
+        return self.lookup(tid) if tid >= 0 else default
+    
+    def __getitem__(self, word):
+        tid = self.compiled.terminal_id(word)
+        if tid < 0:
+            raise KeyError(word)
+        return self.lookup(tid)
+    
+    def __contains__(self, word):
+        return self.compiled.terminal_id(word) >= 0
+    
+    def __iter__(self):
+        for tid in range(self.compiled.num_terminals):
+            yield self.compiled.terminal(tid)
+    
+    def __len__(self):
+        return self.compiled.num_terminals
+
+class BinaryTable(Mapping):
+    """binary_index leído del archivo: (B, C) -> nombres de los A con A -> B C"""
+    
+    def __init__(self, compiled):
+        # Las consultas se memorizan: el motor 'sets' pregunta muchas veces por los mismos pares
+        self.compiled = compiled
+        self.cache = {}
+    
+    def get(self, key, default=None):
+        result = self.cache.get(key)
+        if result is None:
+            compiled = self.compiled
+            b = compiled.symbol_ids.get(key[0])
+            c = compiled.symbol_ids.get(key[1])
+            p = compiled.pair_index(b, c) if b is not None and c is not None else -1
+            if p < 0:
+                result = ()
+            else:
+                heads = compiled.binary_heads[compiled.pair_start[p]:compiled.pair_start[p + 1]]
+                result = {compiled.symbols[h] for h in heads}
+            self.cache[key] = result
+        return result if result else default
+    
+    def __getitem__(self, key):
+        result = self.get(key)
+        if result is None:
+            raise KeyError(key)
+        return result
+    
+    def __iter__(self):
+        compiled = self.compiled
+        for b, name in enumerate(compiled.symbols):
+            for p in range(compiled.left_start[b], compiled.left_start[b + 1]):
+                yield name, compiled.symbols[compiled.pair_right[p]]
+    
+    def __len__(self):
+        return len(self.compiled.pair_right)
+
+class BinaryRows:
+    """binary_by_left leído del archivo: cada fila se decodifica al primer uso en cada proceso"""
+    
+    def __init__(self, compiled):
+        self.compiled = compiled
+        self.rows = [None] * len(compiled.symbols)
+    
+    def __getitem__(self, b):
+        row = self.rows[b]
+        if row is None:
+            row = self.rows[b] = self.compiled.binary_row(b)
+        return row
+    
+    def __len__(self):
+        return len(self.rows)
+    
+    def __iter__(self):
+        for b in range(len(self.rows)):
+            yield self[b]
@@ -1,44 +1,738 @@
+import heapq
+import math
+import os
+import pickle
 import time
+from collections import OrderedDict, deque
+from multiprocessing import Pool
 from grammar import Grammar
+from metrics import MetricsCollector
+from parse_tree import ParseTree
+from parallel_chart import ParallelChartFiller
+from compiled_grammar import CompiledGrammar
+from chart_arena import ChartArena
+
+try:
+    import numpy
+except ImportError:
+    # numpy es opcional: solo lo necesita el motor 'numpy'
+    numpy = None
+
+# Parser propio de cada proceso de parse_many (se construye una sola vez por proceso)
+worker_parser = None
+worker_task = None
+
+def init_worker(grammar_bytes, engine, backpointers, cache_size, long_input_threshold, lexicon, prefilter,
+                arena_size, collect_metrics, task):
+    # Inicializa el parser del proceso a partir de la gramática CNF serializada
+    # task = (nombre del método de CYKParser, argumentos adicionales)
+    # collect_metrics: el parser del proceso mide con su propio MetricsCollector (ver parse_chunk_with_stats)
+    global worker_parser, worker_task
+    if prefilter is not None:
+        # La copia recibida trae los contadores del proceso padre: se cuentan solo los de este proceso
+        prefilter.checked = 0
+        prefilter.rejected = dict.fromkeys(prefilter.rejected, 0)
+    worker_parser = CYKParser(pickle.loads(grammar_bytes), engine=engine, backpointers=backpointers,
+                              cache_size=cache_size, long_input_threshold=long_input_threshold,
+                              metrics=MetricsCollector() if collect_metrics else None,
+                              lexicon=lexicon, prefilter=prefilter, arena_size=arena_size)
+    worker_task = task
+
+def parse_chunk(sentences):
+    # Analiza un bloque de oraciones dentro de un proceso trabajador
+    method, options = worker_task
+    func = getattr(worker_parser, method)
+    return [func(sentence, **options) for sentence in sentences]
+
+def parse_chunk_with_stats(sentences):
+    # Como parse_chunk, pero devuelve también (resultados, contadores) con lo que el parser del proceso
+    # acumuló en este bloque: aciertos de caché, revisiones del prefiltro y métricas. Los contadores
+    # del proceso se reinician para que cada bloque entregue solo su parte
+    results = parse_chunk(sentences)
+    parser = worker_parser
+    stats = {'cache': (parser.cache_hits, parser.cache_misses, parser.cache_evictions)}
+    parser.cache_hits = parser.cache_misses = parser.cache_evictions = 0
+    if parser.prefilter is not None:
+        stats['prefilter'] = (parser.prefilter.checked, dict(parser.prefilter.rejected))
+        parser.prefilter.checked = 0
+        parser.prefilter.rejected = dict.fromkeys(parser.prefilter.rejected, 0)
+    if parser.metrics is not None:
+        stats['metrics'] = (parser.metrics.timings, parser.metrics.counters)
+        parser.metrics.timings = {}
+        parser.metrics.counters = {}
+    return results, stats
+
+def chunked(iterable, size):
+    # Agrupa un iterable (posiblemente infinito) en listas de tamaño fijo sin materializarlo
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
 
 class CYKParser:
     # Implementación del algoritmo CYK para parsing
     
-    def __init__(self, cnf_grammar):
-        self.grammar = cnf_grammar
+    ENGINES = ('sets', 'bitset', 'numpy')
+    # Retropunteros guardados por el motor 'sets':
+    # 'all' = todas las derivaciones, 'first' = solo la primera por celda, 'none' = ninguna
+    BACKPOINTER_MODES = ('all', 'first', 'none')
+    
+    # Atributos precalculados por build_indexes y build_bitset_indexes
+    INDEX_ATTRIBUTES = ('terminal_index', 'binary_index', 'symbols', 'symbol_ids',
+                        'terminal_masks', 'binary_by_left', 'right_union')
+    
+    # Oraciones con más palabras que esto se llenan por bloques con productos de matrices (requiere numpy)
+    LONG_INPUT_THRESHOLD = 100
+    # Tamaño de los bloques que se llenan directamente en lugar de seguir dividiendo
+    MATRIX_LEAF_SIZE = 64
+    # Con fill_workers > 1, oraciones más cortas que esto se llenan en secuencia (el reparto no compensa)
+    PARALLEL_MIN_LENGTH = 200
+    
+    def __init__(self, cnf_grammar, engine='sets', backpointers='all', indexes=None, cache_size=0,
+                 metrics=None, long_input_threshold=LONG_INPUT_THRESHOLD, fill_workers=1, lexicon=None,
+                 prefilter=None, arena_size=0):
+        if engine not in self.ENGINES:
+            raise ValueError(f"Motor desconocido: {engine}. Opciones: {', '.join(self.ENGINES)}")
+        if backpointers not in self.BACKPOINTER_MODES:
+            raise ValueError(f"Modo de retropunteros desconocido: {backpointers}. "
+                             f"Opciones: {', '.join(self.BACKPOINTER_MODES)}")
+        if cache_size < 0:
+            raise ValueError("cache_size no puede ser negativo")
+        if fill_workers < 1:
+            raise ValueError("fill_workers debe ser positivo")
+        if arena_size < 0:
+            raise ValueError("arena_size no puede ser negativo")
+        if engine == 'numpy' and numpy is None:
+            raise ImportError("El motor 'numpy' requiere numpy (pip install numpy)")
+        self._grammar = cnf_grammar
+        self.engine = engine
+        self.backpointers = backpointers
+        # None desactiva el modo de entradas largas; sin numpy nunca se activa
+        self.long_input_threshold = long_input_threshold
+        # Procesos para llenar la tabla de una sola oración larga (el pool se crea al primer uso)
+        self.fill_workers = fill_workers
+        self.chart_filler = None
         self.table = None
         self.parse_table = None
+        self.chart = None
+        # Motor con cuyo formato se llenó la tabla actual (el modo de entradas largas usa el de 'numpy')
+        self.chart_engine = engine
         self.sentence = None
+        # Léxico opcional (lexicon.Lexicon): tokenizador con signos y terminales de varias palabras,
+        # clase de respaldo para palabras desconocidas y rechazo sin tabla cuando no hay respaldo
+        self.lexicon = lexicon
+        # Filtros previos opcionales (prefilter.SentenceFilter) que descartan oraciones sin llenar la tabla
+        self.prefilter = prefilter
+        # Tabla reutilizable del motor 'sets' (chart_arena.ChartArena) reservada para arena_size palabras;
+        # con 0 cada oración crea sus propios conjuntos y diccionarios
+        self.arena_size = arena_size
+        self.arena = ChartArena(arena_size) if arena_size else None
+        if indexes is None and isinstance(cnf_grammar, CompiledGrammar):
+            # Gramática compilada: los índices leen las tablas del archivo (ver compiled_grammar)
+            indexes = cnf_grammar.parser_indexes()
+        if indexes is not None:
+            # Índices ya calculados (por ejemplo, cargados desde la caché de gramáticas)
+            for name in self.INDEX_ATTRIBUTES:
+                setattr(self, name, indexes[name])
+        else:
+            self.build_indexes()
+            self.build_bitset_indexes()
+        # Sin el motor 'numpy', sus índices se construyen con la primera entrada larga
+        self.pair_left = None
+        if engine == 'numpy':
+            self.build_numpy_indexes()
+        # Reglas con log-probabilidades para parse_viterbi (se construyen al primer uso)
+        self.viterbi_rules = None
+        self.viterbi_table = None
+        
+        # Caché LRU de resultados por tupla de palabras (0 = desactivada)
+        self.cache_size = cache_size
+        self.result_cache = OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_evictions = 0
+        
+        # Colector opcional de métricas por fase (ver metrics.MetricsCollector); None = sin medición
+        self.metrics = metrics
+    
+    @property
+    def grammar(self):
+        return self._grammar
+    
+    @grammar.setter
+    def grammar(self, cnf_grammar):
+        # Reemplazar la gramática recalcula los índices, el léxico y los filtros previos, e invalida la
+        # caché de resultados. Léxico y filtro se construyen antes de tocar nada: si la clase de respaldo
+        # no existe en la nueva gramática, el ValueError deja el parser con la gramática anterior
+        lexicon = self.lexicon.for_grammar(cnf_grammar) if self.lexicon is not None else None
+        prefilter = self.prefilter.for_grammar(cnf_grammar) if self.prefilter is not None else None
+        self._grammar = cnf_grammar
+        self.lexicon = lexicon
+        self.prefilter = prefilter
+        if isinstance(cnf_grammar, CompiledGrammar):
+            for name, value in cnf_grammar.parser_indexes().items():
+                setattr(self, name, value)
+        else:
+            self.build_indexes()
+            self.build_bitset_indexes()
+        self.pair_left = None
+        if self.engine == 'numpy':
+            self.build_numpy_indexes()
+        self.viterbi_rules = None
+        # Los procesos del llenado paralelo tienen copiados los índices anteriores
+        self.close()
+        self.clear_cache()
+    
+    def close(self):
+        # Termina los procesos del llenado paralelo, si se crearon
+        if self.chart_filler is not None:
+            self.chart_filler.close()
+            self.chart_filler = None
+    
+    def clear_cache(self):
+        # Vacía la caché de resultados (los contadores se conservan)
+        self.result_cache.clear()
+    
+    def cache_stats(self):
+        # Estadísticas de la caché de resultados
+        lookups = self.cache_hits + self.cache_misses
+        return {
+            'hits': self.cache_hits,
+            'misses': self.cache_misses,
+            'evictions': self.cache_evictions,
+            'size': len(self.result_cache),
+            'capacity': self.cache_size,
+            'hit_rate': self.cache_hits / lookups if lookups else 0.0,
+        }
+    
+    def export_indexes(self):
+        # Devuelve los índices precalculados para guardarlos junto a la gramática
+        return {name: getattr(self, name) for name in self.INDEX_ATTRIBUTES}
+    
+    def build_indexes(self):
+        # Precalcula índices de reglas para no recorrer toda la gramática en cada celda
+        # terminal_index: palabra -> no terminales A con A -> palabra
+        # binary_index: (B, C) -> no terminales A con A -> B C
+        self.terminal_index = {}
+        self.binary_index = {}
+        for nt, productions in self.grammar.productions.items():
+            for prod in productions:
+                if len(prod) == 1:
+                    self.terminal_index.setdefault(prod[0], set()).add(nt)
+                elif len(prod) == 2:
+                    self.binary_index.setdefault((prod[0], prod[1]), set()).add(nt)
+    
+    def build_bitset_indexes(self):
+        # Interna los no terminales como enteros densos para el modo 'bitset'
+        # Cada celda es un entero cuyo bit k indica que symbols[k] deriva el fragmento
+        self.symbols = sorted(self.grammar.productions.keys())
+        self.symbol_ids = {nt: i for i, nt in enumerate(self.symbols)}
+        
+        # Máscara de no terminales por palabra (diagonal)
+        self.terminal_masks = {}
+        for word, nts in self.terminal_index.items():
+            mask = 0
+            for nt in nts:
+                mask |= 1 << self.symbol_ids[nt]
+            self.terminal_masks[word] = mask
+        
+        # Por cada B: pares (bit de A, máscara de todos los C con A -> B C)
+        by_left = [{} for _ in self.symbols]
+        for (B, C), nts in self.binary_index.items():
+            if B not in self.symbol_ids or C not in self.symbol_ids:
+                continue
+            for nt in nts:
+                a_bit = 1 << self.symbol_ids[nt]
+                rules = by_left[self.symbol_ids[B]]
+                rules[a_bit] = rules.get(a_bit, 0) | (1 << self.symbol_ids[C])
+        self.binary_by_left = [list(rules.items()) for rules in by_left]
+        
+        # Unión de los C posibles por cada B, para descartar combinaciones rápido
+        self.right_union = []
+        for rules in self.binary_by_left:
+            union = 0
+            for _, c_mask in rules:
+                union |= c_mask
+            self.right_union.append(union)
+    
+    def build_numpy_indexes(self):
+        # Tensor de reglas R[A, B, C] para el motor 'numpy', guardado solo en los pares (B, C)
+        # que aparecen en alguna regla: pair_left[p] = B, pair_right[p] = C y
+        # pair_rules[p, A] = 1 si A -> B C (contraer con R completo recorrería |N|^2 pares vacíos)
+        size = len(self.symbols)
+        pairs = sorted((self.symbol_ids[B], self.symbol_ids[C]) for B, C in self.binary_index
+                       if B in self.symbol_ids and C in self.symbol_ids)
+        self.pair_left = numpy.array([b for b, _ in pairs], dtype=numpy.intp)
+        self.pair_right = numpy.array([c for _, c in pairs], dtype=numpy.intp)
+        self.pair_rules = numpy.zeros((len(pairs), size), dtype=numpy.float32)
+        for p, (b, c) in enumerate(pairs):
+            for nt in self.binary_index[(self.symbols[b], self.symbols[c])]:
+                self.pair_rules[p, self.symbol_ids[nt]] = 1
+        
+        # Vector booleano de no terminales por palabra (diagonal)
+        self.terminal_vectors = {}
+        for word, mask in self.terminal_masks.items():
+            vector = numpy.zeros(size, dtype=bool)
+            while mask:
+                low = mask & -mask
+                mask ^= low
+                vector[low.bit_length() - 1] = True
+            self.terminal_vectors[word] = vector
+        
+        # Para los productos de bloques: por cada B, sus C (índices) y la matriz de los A con A -> B C
+        self.leaf_plans = {}
+        self.pair_groups = []
+        for b in sorted(set(self.pair_left.tolist())):
+            members = numpy.flatnonzero(self.pair_left == b)
+            self.pair_groups.append((b, self.pair_right[members], self.pair_rules[members]))
+    
+    def mask_to_symbols(self, mask):
+        # Convierte una máscara de bits en el conjunto de no terminales
+        symbols = set()
+        while mask:
+            low = mask & -mask
+            symbols.add(self.symbols[low.bit_length() - 1])
+            mask ^= low
+        return symbols
+    
+    def chart_index(self, i, j):
+        # Posición de la celda [i][j] en el búfer triangular plano, ordenado por longitud
+        length = j - i + 1
+        n = len(self.sentence)
+        return (length - 1) * n - (length - 1) * (length - 2) // 2 + i
+    
+    def cell_mask(self, i, j):
+        # Celda [i][j] de los motores 'bitset' y 'numpy' como máscara entera de no terminales
+        if self.chart_engine == 'bitset':
+            return self.chart[self.chart_index(i, j)]
+        mask = 0
+        for b in numpy.flatnonzero(self.chart[i, j]):
+            mask |= 1 << int(b)
+        return mask
+    
+    def get_cell(self, i, j):
+        # Devuelve los no terminales de la celda [i][j] en cualquier modo
+        if self.chart_engine == 'sets':
+            return self.table[i][j]
+        return self.mask_to_symbols(self.cell_mask(i, j))
+    
+    def tokenize(self, sentence):
+        # Devuelve (palabras, claves de la diagonal). Sin léxico ambas son sentence.lower().split();
+        # con léxico las desconocidas pasan a la clase de respaldo, y las claves son None si no hay
+        if self.lexicon is None:
+            words = sentence.lower().split()
+            return words, words
+        words = self.lexicon.tokenize(sentence)
+        return words, self.lexicon.lexical_words(words)
+    
+    def early_rejection(self, lexical_words):
+        # Contador del motivo por el que la oración se rechaza sin llenar la tabla, o None:
+        # una palabra fuera del léxico o alguno de los filtros previos
+        if lexical_words is None:
+            reason = 'lexicon_rejections'
+        elif self.prefilter is not None and self.prefilter.check(lexical_words) is not None:
+            reason = 'prefilter_rejections'
+        else:
+            return None
+        self.table = self.parse_table = self.chart = None
+        if self.metrics is not None:
+            self.metrics.increment('sentences')
+            self.metrics.increment(reason)
+        return reason
     
     def parse(self, sentence):
         # Ejecuta el algoritmo CYK en una oración
-        print(f"Analizando: '{sentence}'")
-        start_time = time.time()
+        is_accepted, parsing_time, tree = self.parse_compact(sentence)
+        parse_tree = tree.to_dict() if tree is not None else None
+        return is_accepted, parsing_time, parse_tree
+    
+    def parse_compact(self, sentence, collapse_helpers=False):
+        # Como parse, pero devuelve el árbol como ParseTree (arreglos planos en preorden)
+        # collapse_helpers=True devuelve el árbol en la gramática original (ver ParseTree.collapse)
+        start_time = time.perf_counter_ns()
+        metrics = self.metrics
         
-        words = sentence.lower().split()
+        words, lexical_words = self.tokenize(sentence)
         self.sentence = words
         n = len(words)
         
         if n == 0:
             return False, 0, None
+        if self.early_rejection(lexical_words):
+            return False, (time.perf_counter_ns() - start_time) / 1e9, None
+        
+        if self.cache_size:
+            key = tuple(words)
+            cached = self.result_cache.get(key)
+            if cached is not None:
+                self.result_cache.move_to_end(key)
+                self.cache_hits += 1
+                # La tabla no se recalcula: no corresponde a esta oración
+                self.table = self.parse_table = self.chart = None
+                is_accepted, tree = cached
+                if metrics is not None:
+                    # Sin tiempo de 'parse' ni conteos de tabla: no se llenó ninguna
+                    metrics.increment('sentences')
+                    metrics.increment('accepted', int(is_accepted))
+                    metrics.increment('cache_hits')
+                parsing_time = (time.perf_counter_ns() - start_time) / 1e9
+                tree = self.finish_tree(tree, collapse_helpers, lexical_words, copy=True)
+                return is_accepted, parsing_time, tree
+            self.cache_misses += 1
         
-        # Inicializar tabla CYK
-        self.table = [[set() for _ in range(n)] for _ in range(n)]
-        self.parse_table = [[{} for _ in range(n)] for _ in range(n)]
+        rows = self.fill_chart(lexical_words, self.backpointers)
+        
+        # Verificar si la oración es aceptada
+        is_accepted = self.grammar.start_symbol in self.get_cell(0, n-1)
+        
+        tree = None
+        if is_accepted:
+            if metrics is not None:
+                tree_start = time.perf_counter_ns()
+            tree = self.build_compact_tree(0, n-1, self.grammar.start_symbol)
+            if metrics is not None:
+                metrics.record_time('tree_build', time.perf_counter_ns() - tree_start)
+        
+        # El tiempo incluye la construcción del árbol
+        elapsed = time.perf_counter_ns() - start_time
+        parsing_time = elapsed / 1e9
+        if metrics is not None:
+            metrics.record_time('parse', elapsed)
+            metrics.increment('sentences')
+            metrics.increment('accepted', int(is_accepted))
+            self.record_chart_counts(rows)
+        
+        if self.cache_size:
+            # La caché guarda su propio árbol; al llamador siempre se le entrega una copia
+            self.result_cache[key] = (is_accepted, tree)
+            if len(self.result_cache) > self.cache_size:
+                self.result_cache.popitem(last=False)
+                self.cache_evictions += 1
+            tree = self.finish_tree(tree, collapse_helpers, lexical_words, copy=True)
+            return is_accepted, parsing_time, tree
+        
+        return is_accepted, parsing_time, self.finish_tree(tree, collapse_helpers, lexical_words)
+    
+    def finish_tree(self, tree, collapse_helpers, lexical_words, copy=False):
+        # Aplica el colapso a la gramática original o copia el árbol antes de entregarlo
+        if tree is None:
+            return None
+        if collapse_helpers:
+            return tree.collapse(self.grammar, lexical_words)
+        return tree.copy() if copy else tree
+    
+    def recognize(self, sentence):
+        # Solo decide si la oración es aceptada: sin retropunteros, sin árbol y con parada temprana
+        # La caché de resultados solo se lee: sin árbol no hay qué guardar para un parse posterior
+        words, lexical_words = self.tokenize(sentence)
+        self.sentence = words
+        n = len(words)
+        
+        if n == 0:
+            return False
+        if self.early_rejection(lexical_words):
+            return False
+        
+        if self.cache_size:
+            cached = self.result_cache.get(tuple(words))
+            if cached is not None:
+                self.result_cache.move_to_end(tuple(words))
+                self.cache_hits += 1
+                if self.metrics is not None:
+                    self.metrics.increment('cache_hits')
+                self.table = self.parse_table = self.chart = None
+                return cached[0]
+            self.cache_misses += 1
+        
+        rows = self.fill_chart(lexical_words, 'none', early_stop=True)
+        if self.metrics is not None:
+            self.record_chart_counts(rows)
+        
+        return self.grammar.start_symbol in self.get_cell(0, n-1)
+    
+    def build_chart(self, sentence):
+        # Llena la tabla del motor actual sin retropunteros ni caché, para recorrerla después
+        words, lexical_words = self.tokenize(sentence)
+        self.sentence = words
+        if words:
+            # Sin clase de respaldo, las palabras desconocidas quedan con la celda vacía
+            rows = self.fill_chart(lexical_words or words, 'none')
+            if self.metrics is not None:
+                self.record_chart_counts(rows)
+        return words
+    
+    def build_viterbi_indexes(self):
+        # Log-probabilidades de las reglas: palabra -> [(A, log p)] y B -> {C: [(A, log p)]}
+        lexical = {}
+        binary = {}
+        for nt, productions in self.grammar.productions.items():
+            for prod in productions:
+                score = math.log(self.grammar.rule_weight(nt, prod))
+                if len(prod) == 1:
+                    lexical.setdefault(prod[0], []).append((nt, score))
+                elif len(prod) == 2:
+                    binary.setdefault(prod[0], {}).setdefault(prod[1], []).append((nt, score))
+        self.viterbi_rules = (lexical, binary)
+        
+        # Cota del contexto de cada A: el mejor producto de reglas en un camino S -> ... -> A (los
+        # hermanos valen a lo sumo 1). La poda compara puntaje + cota, así S y los símbolos frecuentes
+        # no pierden contra símbolos que casi nunca llegan a la raíz (Dijkstra sobre -log p)
+        outside = {self.grammar.start_symbol: 0.0}
+        heap = [(0.0, self.grammar.start_symbol)]
+        while heap:
+            cost, parent = heapq.heappop(heap)
+            if -cost < outside[parent]:
+                continue
+            for prod in self.grammar.productions.get(parent, ()):
+                if len(prod) != 2:
+                    continue
+                score = outside[parent] + math.log(self.grammar.rule_weight(parent, prod))
+                for child in prod:
+                    if score > outside.get(child, -math.inf):
+                        outside[child] = score
+                        heapq.heappush(heap, (-score, child))
+        self.viterbi_outside = outside
+    
+    def parse_viterbi(self, sentence, beam=None, threshold=None, collapse_helpers=False):
+        # Análisis más probable según los pesos de las reglas (CYK de Viterbi)
+        # Cada celda guarda el mejor puntaje por no terminal; beam conserva solo los beam mejores
+        # no terminales de cada celda y threshold descarta los que valen menos que threshold veces
+        # el mejor de la celda. La poda acelera el llenado pero puede perder el mejor análisis
+        # Devuelve (aceptada, tiempo, ParseTree, probabilidad del árbol)
+        if beam is not None and beam < 1:
+            raise ValueError("beam debe ser al menos 1")
+        if threshold is not None and not 0 < threshold <= 1:
+            raise ValueError("threshold debe estar en (0, 1]")
+        start_time = time.perf_counter_ns()
+        
+        words, lexical_words = self.tokenize(sentence)
+        self.sentence = words
+        n = len(words)
+        if n == 0:
+            return False, 0, None, 0.0
+        if self.early_rejection(lexical_words):
+            return False, (time.perf_counter_ns() - start_time) / 1e9, None, 0.0
+        
+        entries = self.fill_viterbi_table(lexical_words, beam, threshold)
+        root = self.viterbi_table[0][n-1].get(self.grammar.start_symbol)
+        tree = None
+        probability = 0.0
+        if root is not None:
+            tree = self.build_viterbi_tree(n)
+            probability = math.exp(root[0])
+        
+        elapsed = time.perf_counter_ns() - start_time
+        if self.metrics is not None:
+            self.metrics.record_time('viterbi', elapsed)
+            self.metrics.increment('sentences')
+            self.metrics.increment('accepted', int(root is not None))
+            self.metrics.increment('chart_entries', entries)
+        tree = self.finish_tree(tree, collapse_helpers, lexical_words)
+        return root is not None, elapsed / 1e9, tree, probability
+    
+    def fill_viterbi_table(self, words, beam=None, threshold=None):
+        # viterbi_table[i][j] = {A: (log-probabilidad, retropuntero)}; el retropuntero es (k, B, C)
+        # o None en la diagonal. Devuelve cuántas entradas (celda, no terminal) quedaron tras la poda
+        if self.viterbi_rules is None:
+            self.build_viterbi_indexes()
+        lexical, binary = self.viterbi_rules
+        outside = self.viterbi_outside
+        cutoff = math.log(threshold) if threshold is not None else None
+        n = len(words)
+        table = [[None] * n for _ in range(n)]
+        self.viterbi_table = table
+        self.table = self.parse_table = self.chart = None
+        
+        entries = 0
+        for j in range(n):
+            cell = {nt: (score, None) for nt, score in lexical.get(words[j], ())}
+            table[j][j] = self.prune_cell(cell, beam, cutoff, outside)
+            entries += len(table[j][j])
+        
+        for length in range(2, n + 1):
+            for i in range(n - length + 1):
+                j = i + length - 1
+                cell = {}
+                for k in range(i, j):
+                    left = table[i][k]
+                    right = table[k+1][j]
+                    if not left or not right:
+                        continue
+                    for B, (left_score, _) in left.items():
+                        rules = binary.get(B)
+                        if rules is None:
+                            continue
+                        for C, (right_score, _) in right.items():
+                            heads = rules.get(C)
+                            if heads is None:
+                                continue
+                            base = left_score + right_score
+                            for nt, rule_score in heads:
+                                score = base + rule_score
+                                best = cell.get(nt)
+                                if best is None or score > best[0]:
+                                    cell[nt] = (score, (k, B, C))
+                table[i][j] = self.prune_cell(cell, beam, cutoff, outside)
+                entries += len(table[i][j])
+        return entries
+    
+    @staticmethod
+    def prune_cell(cell, beam, cutoff, outside):
+        # Poda de una celda por mérito = log-probabilidad + cota del contexto: primero el umbral
+        # relativo al mejor mérito y luego los beam mejores. Sin contexto posible, A no llega a la raíz
+        if beam is None and cutoff is None:
+            return cell
+        merit = {nt: entry[0] + outside.get(nt, -math.inf) for nt, entry in cell.items()}
+        if cutoff is not None and len(cell) > 1:
+            limit = max(merit.values()) + cutoff
+            cell = {nt: entry for nt, entry in cell.items() if merit[nt] >= limit}
+        if beam is not None and len(cell) > beam:
+            cell = {nt: cell[nt] for nt in heapq.nlargest(beam, cell, key=merit.__getitem__)}
+        return cell
+    
+    def build_viterbi_tree(self, n):
+        # Sigue los retropunteros de la mejor derivación desde la raíz, en preorden
+        tree = ParseTree(self.sentence)
+        stack = [(0, n-1, self.grammar.start_symbol)]
+        while stack:
+            i, j, symbol = stack.pop()
+            tree.add_node(symbol, i, j)
+            back = self.viterbi_table[i][j][symbol][1]
+            if back is not None:
+                k, B, C = back
+                stack.append((k+1, j, C))
+                stack.append((i, k, B))
+        return tree
+    
+    def parse_many(self, sentences, workers=None, chunksize=64, recognize_only=False,
+                   compact=False, collapse_helpers=False):
+        # Analiza muchas oraciones en paralelo y entrega los resultados en orden de entrada
+        # Cada resultado es (aceptada, tiempo, árbol), o un bool si recognize_only=True
+        # Con compact=True el árbol es un ParseTree (como parse_compact)
+        # Con workers > 1 cada proceso tiene su propia caché; sus aciertos, fallos y desalojos, lo revisado
+        # por el prefiltro y las métricas se suman a este parser a medida que llegan los bloques
+        # (cache_stats()['size'] sigue contando solo la caché de este proceso)
+        if workers is None:
+            workers = os.cpu_count() or 1
+        if workers < 1 or chunksize < 1:
+            raise ValueError("workers y chunksize deben ser positivos")
+        
+        if recognize_only:
+            task = ('recognize', {})
+        elif compact:
+            task = ('parse_compact', {'collapse_helpers': collapse_helpers})
+        else:
+            task = ('parse', {})
+        
+        if workers == 1:
+            method, options = task
+            func = getattr(self, method)
+            for sentence in sentences:
+                yield func(sentence, **options)
+            return
+        
+        grammar_bytes = pickle.dumps(self.grammar, protocol=pickle.HIGHEST_PROTOCOL)
+        initargs = (grammar_bytes, self.engine, self.backpointers, self.cache_size,
+                    self.long_input_threshold, self.lexicon, self.prefilter, self.arena_size,
+                    self.metrics is not None, task)
+        # Limitar los bloques en vuelo mantiene la memoria constante con corpus enormes
+        max_pending = workers * 4
+        with Pool(workers, initializer=init_worker, initargs=initargs) as pool:
+            pending = deque()
+            for chunk in chunked(sentences, chunksize):
+                pending.append(pool.apply_async(parse_chunk_with_stats, (chunk,)))
+                if len(pending) >= max_pending:
+                    yield from self.merge_chunk_stats(*pending.popleft().get())
+            while pending:
+                yield from self.merge_chunk_stats(*pending.popleft().get())
+    
+    def merge_chunk_stats(self, results, stats):
+        # Suma a este parser los contadores de un bloque analizado en un proceso trabajador
+        hits, misses, evictions = stats['cache']
+        self.cache_hits += hits
+        self.cache_misses += misses
+        self.cache_evictions += evictions
+        if 'prefilter' in stats and self.prefilter is not None:
+            self.prefilter.merge_stats(*stats['prefilter'])
+        if 'metrics' in stats and self.metrics is not None:
+            self.metrics.merge(*stats['metrics'])
+        return results
+    
+    @staticmethod
+    def can_stop_early(length, last_nonempty):
+        # Todo nodo de longitud l > 1 tiene un hijo de longitud en [l/2, l-1], así que
+        # si las filas last_nonempty+1 .. 2*last_nonempty+1 están vacías, la raíz no se deriva
+        return length > 2 * last_nonempty
+    
+    def fill_chart(self, words, backpointers='all', early_stop=False):
+        # Llena la tabla con el motor configurado; backpointers solo aplica al motor 'sets'
+        # Con fill_workers > 1 las oraciones largas se llenan en paralelo con el formato 'bitset';
+        # si no, por encima de long_input_threshold palabras se usa el llenado por bloques de matrices
+        if self.fill_workers > 1 and len(words) >= self.PARALLEL_MIN_LENGTH:
+            return self.fill_bitset_chart(words, early_stop, parallel=True)
+        if (self.long_input_threshold is not None and numpy is not None
+                and len(words) > self.long_input_threshold):
+            return self.fill_matrix_chart(words)
+        if self.engine == 'bitset':
+            return self.fill_bitset_chart(words, early_stop)
+        if self.engine == 'numpy':
+            return self.fill_numpy_chart(words, early_stop)
+        return self.fill_table(words, backpointers, early_stop)
+    
+    def fill_table(self, words, backpointers='all', early_stop=False):
+        # Llena la tabla CYK de conjuntos, con retropunteros según el modo indicado
+        # Devuelve cuántas filas (longitudes de fragmento) se calcularon
+        n = len(words)
+        if self.arena is not None:
+            # Las celdas son las de la oración anterior, vaciadas en su lugar
+            self.table, self.parse_table = self.arena.acquire(n, backpointers != 'none')
+        else:
+            self.table = [[set() for _ in range(n)] for _ in range(n)]
+            self.parse_table = None if backpointers == 'none' else [[{} for _ in range(n)] for _ in range(n)]
+        self.chart = None
+        self.chart_engine = 'sets'
+        metrics = self.metrics
+        if metrics is not None:
+            start = time.perf_counter_ns()
         
         # Llenar diagonal principal (palabras individuales)
+        lexical_complete = True
         for j in range(n):
             word = words[j]
-            for nt, productions in self.grammar.productions.items():
-                for prod in productions:
-                    if len(prod) == 1 and prod[0] == word:
-                        self.table[j][j].add(nt)
-                        if nt not in self.parse_table[j][j]:
-                            self.parse_table[j][j][nt] = []
-                        self.parse_table[j][j][nt].append((word,))
-        
-        # Llenar resto de la tabla
+            for nt in self.terminal_index.get(word, ()):
+                self.table[j][j].add(nt)
+                if backpointers == 'none':
+                    continue
+                if nt not in self.parse_table[j][j]:
+                    self.parse_table[j][j][nt] = []
+                self.parse_table[j][j][nt].append((word,))
+            # Una palabra sin preterminal hace imposible cualquier derivación
+            if not self.table[j][j]:
+                lexical_complete = False
+                if early_stop:
+                    break
+        
+        if metrics is not None:
+            lexical_end = time.perf_counter_ns()
+            metrics.record_time('lexical', lexical_end - start)
+        
+        rows = 1
+        if lexical_complete or not early_stop:
+            rows = self.fill_table_spans(n, backpointers, early_stop)
+        
+        if metrics is not None:
+            metrics.record_time('chart_fill', time.perf_counter_ns() - lexical_end)
+        return rows
+    
+    def fill_table_spans(self, n, backpointers, early_stop):
+        # Llena las celdas de longitud >= 2 de la tabla de conjuntos; devuelve la última longitud calculada
+        last_nonempty = 1
         for length in range(2, n + 1):  # longitud de subcadena
+            row_nonempty = False
             for i in range(n - length + 1):  # inicio de subcadena
                 j = i + length - 1  # fin de subcadena
                 
@@ -47,62 +741,432 @@ class CYKParser:
                     left_symbols = self.table[i][k]
                     right_symbols = self.table[k+1][j]
                     
-                    for nt, productions in self.grammar.productions.items():
-                        for prod in productions:
-                            if len(prod) == 2:
-                                B, C = prod[0], prod[1]
-                                if B in left_symbols and C in right_symbols:
-                                    self.table[i][j].add(nt)
-                                    if nt not in self.parse_table[i][j]:
-                                        self.parse_table[i][j][nt] = []
-                                    self.parse_table[i][j][nt].append((B, C, k))
-        
-        end_time = time.time()
-        parsing_time = end_time - start_time
+                    # El costo depende del tamaño de las celdas hijas, no de la gramática
+                    for B in left_symbols:
+                        for C in right_symbols:
+                            for nt in self.binary_index.get((B, C), ()):
+                                self.table[i][j].add(nt)
+                                if backpointers == 'none':
+                                    continue
+                                if nt not in self.parse_table[i][j]:
+                                    self.parse_table[i][j][nt] = []
+                                elif backpointers == 'first':
+                                    continue
+                                self.parse_table[i][j][nt].append((B, C, k))
+                
+                if self.table[i][j]:
+                    row_nonempty = True
+            
+            if row_nonempty:
+                last_nonempty = length
+            elif early_stop and self.can_stop_early(length, last_nonempty):
+                return length
+        return n
+    
+    def fill_bitset_chart(self, words, early_stop=False, parallel=False):
+        # Llena el triángulo CYK en un solo búfer plano de máscaras enteras, sin retropunteros
+        # parallel=True reparte cada antidiagonal entre fill_workers procesos
+        # Devuelve cuántas filas (longitudes de fragmento) se calcularon
+        n = len(words)
+        chart = [0] * (n * (n + 1) // 2)
+        self.chart = chart
+        self.chart_engine = 'bitset'
+        self.table = None
+        self.parse_table = None
+        metrics = self.metrics
+        if metrics is not None:
+            start = time.perf_counter_ns()
         
-        # Verificar si la oración es aceptada
-        is_accepted = self.grammar.start_symbol in self.table[0][n-1]
+        # Diagonal principal: offset 0 del búfer
+        lexical_complete = True
+        for j in range(n):
+            chart[j] = self.terminal_masks.get(words[j], 0)
+            if not chart[j]:
+                lexical_complete = False
+                if early_stop:
+                    break
         
-        parse_tree = None
-        if is_accepted:
-            parse_tree = self.build_parse_tree(0, n-1, self.grammar.start_symbol)
+        if metrics is not None:
+            lexical_end = time.perf_counter_ns()
+            metrics.record_time('lexical', lexical_end - start)
         
-        return is_accepted, parsing_time, parse_tree
+        rows = 1
+        if parallel and (lexical_complete or not early_stop):
+            rows = self.parallel_filler().fill(chart, n, early_stop, self.can_stop_early)
+        elif lexical_complete or not early_stop:
+            rows = self.fill_bitset_spans(n, early_stop)
+        
+        if metrics is not None:
+            metrics.record_time('chart_fill', time.perf_counter_ns() - lexical_end)
+        return rows
     
-    def build_parse_tree(self, i, j, symbol):
-        # Construye el árbol de análisis sintáctico
-        if i == j:
-            # Hoja del árbol (terminal)
-            return {
-                'symbol': symbol,
-                'word': self.sentence[i],
-                'children': []
-            }
-        
-        # Buscar la derivación en la tabla de análisis
-        if symbol in self.parse_table[i][j]:
-            derivations = self.parse_table[i][j][symbol]
-            if derivations:
-                # Tomar la primera derivación encontrada
-                first_derivation = derivations[0]
-                if len(first_derivation) == 3:  # Producción A -> BC
-                    B, C, k = first_derivation
-                    left_child = self.build_parse_tree(i, k, B)
-                    right_child = self.build_parse_tree(k+1, j, C)
-                    return {
-                        'symbol': symbol,
-                        'children': [left_child, right_child]
-                    }
+    def parallel_filler(self):
+        # Pool de procesos del llenado paralelo, creado con los índices de bits actuales
+        if self.chart_filler is None:
+            self.chart_filler = ParallelChartFiller(self.binary_by_left, self.right_union, len(self.symbols),
+                                                    self.fill_workers)
+        return self.chart_filler
+    
+    def fill_bitset_spans(self, n, early_stop):
+        # Llena las celdas de longitud >= 2 del búfer de máscaras; devuelve la última longitud calculada
+        chart = self.chart
+        by_left = self.binary_by_left
+        right_union = self.right_union
+        offsets = [0] * (n + 1)  # offsets[length] = inicio de las celdas de esa longitud
+        for length in range(2, n + 1):
+            offsets[length] = offsets[length - 1] + n - length + 2
+        
+        last_nonempty = 1
+        for length in range(2, n + 1):
+            base = offsets[length]
+            row_nonempty = False
+            for i in range(n - length + 1):
+                cell = 0
+                for left_len in range(1, length):
+                    left = chart[offsets[left_len] + i]
+                    if not left:
+                        continue
+                    right = chart[offsets[length - left_len] + i + left_len]
+                    if not right:
+                        continue
+                    # Paso binario: por cada B presente, intersectar sus C con la celda derecha
+                    while left:
+                        low = left & -left
+                        left ^= low
+                        b = low.bit_length() - 1
+                        if right & right_union[b]:
+                            for a_bit, c_mask in by_left[b]:
+                                if right & c_mask:
+                                    cell |= a_bit
+                chart[base + i] = cell
+                if cell:
+                    row_nonempty = True
+            
+            if row_nonempty:
+                last_nonempty = length
+            elif early_stop and self.can_stop_early(length, last_nonempty):
+                return length
+        return n
+    
+    def fill_numpy_chart(self, words, early_stop=False):
+        # Llena la tabla como arreglo booleano (n, n, |N|): chart[i, j, A] indica que A deriva words[i..j]
+        # Devuelve cuántas filas (longitudes de fragmento) se calcularon
+        n = len(words)
+        size = len(self.symbols)
+        chart = numpy.zeros((n, n, size), dtype=bool)
+        self.chart = chart
+        self.chart_engine = 'numpy'
+        self.table = None
+        self.parse_table = None
+        metrics = self.metrics
+        if metrics is not None:
+            start = time.perf_counter_ns()
+        
+        # Diagonal principal
+        lexical_complete = True
+        for j in range(n):
+            vector = self.terminal_vectors.get(words[j])
+            if vector is not None:
+                chart[j, j] = vector
+            else:
+                lexical_complete = False
+                if early_stop:
+                    break
+        
+        if metrics is not None:
+            lexical_end = time.perf_counter_ns()
+            metrics.record_time('lexical', lexical_end - start)
+        
+        rows = 1
+        if lexical_complete or not early_stop:
+            rows = self.fill_numpy_spans(n, early_stop)
+        
+        if metrics is not None:
+            metrics.record_time('chart_fill', time.perf_counter_ns() - lexical_end)
+        return rows
+    
+    def fill_numpy_spans(self, n, early_stop):
+        # Calcula todas las celdas de una longitud y todos sus puntos de división en operaciones por lotes:
+        # par[i, p] = OR sobre k de (izquierda[i, k, B_p] AND derecha[i, k, C_p]) y luego
+        # celda[i, A] = OR sobre p de (par[i, p] AND R[p, A]), como producto de matrices
+        chart = self.chart
+        if not len(self.pair_left):
+            return n
+        last_nonempty = 1
+        for length in range(2, n + 1):
+            count = n - length + 1
+            starts = numpy.arange(count)[:, None]
+            splits = numpy.arange(length - 1)[None, :]
+            # left[i, k] = celda [i][i+k], right[i, k] = celda [i+k+1][i+length-1]
+            left = chart[starts, starts + splits][:, :, self.pair_left]
+            right = chart[starts + splits + 1, starts + length - 1][:, :, self.pair_right]
+            pairs = (left & right).any(axis=1)
+            cells = pairs.astype(numpy.float32) @ self.pair_rules > 0
+            chart[numpy.arange(count), numpy.arange(count) + length - 1] = cells
+            
+            if cells.any():
+                last_nonempty = length
+            elif early_stop and self.can_stop_early(length, last_nonempty):
+                return length
+        return n
+    
+    def fill_matrix_chart(self, words):
+        # Modo de entradas largas: divide y vencerás sobre la tabla por posiciones (al estilo de Valiant,
+        # en la formulación de Okhotin). matrix[i, j, A] indica que A deriva words[i..j-1]; los
+        # subtriángulos se combinan con productos booleanos de matrices sobre bloques de posiciones
+        if self.pair_left is None:
+            self.build_numpy_indexes()
+        n = len(words)
+        size = len(self.symbols)
+        matrix = numpy.zeros((n + 1, n + 1, size), dtype=bool)
+        self.table = None
+        self.parse_table = None
+        metrics = self.metrics
+        if metrics is not None:
+            start = time.perf_counter_ns()
+        
+        for j in range(n):
+            vector = self.terminal_vectors.get(words[j])
+            if vector is not None:
+                matrix[j, j + 1] = vector
+        
+        if metrics is not None:
+            lexical_end = time.perf_counter_ns()
+            metrics.record_time('lexical', lexical_end - start)
+        
+        if len(self.pair_left):
+            self.compute_triangle(matrix, 0, n + 1)
+        # Vista sin copia con el formato del motor 'numpy': chart[i, j] = matrix[i, j+1]
+        self.chart = matrix[:-1, 1:]
+        self.chart_engine = 'numpy'
+        
+        if metrics is not None:
+            metrics.record_time('chart_fill', time.perf_counter_ns() - lexical_end)
+        return n
+    
+    def compute_triangle(self, matrix, low, high):
+        # Calcula todas las celdas [i, j] con low <= i < j < high (posiciones)
+        if high - low <= self.MATRIX_LEAF_SIZE:
+            self.fill_triangle_leaf(matrix, low, high)
+            return
+        middle = (low + high) // 2
+        self.compute_triangle(matrix, low, middle)
+        self.compute_triangle(matrix, middle, high)
+        self.complete_block(matrix, low, middle, middle, high)
+    
+    def complete_block(self, matrix, row_low, row_high, col_low, col_high):
+        # Calcula las celdas [i, j] con i en [row_low, row_high) y j en [col_low, col_high), sabiendo que
+        # los triángulos de filas y de columnas ya están completos y que cada celda ya incluye
+        # las divisiones k en [row_high, col_low)
+        rows = row_high - row_low
+        cols = col_high - col_low
+        if rows + cols <= self.MATRIX_LEAF_SIZE:
+            self.fill_block_leaf(matrix, row_low, row_high, col_low, col_high)
+            return
+        
+        if rows > 1 and cols > 1:
+            row_mid = (row_low + row_high) // 2
+            col_mid = (col_low + col_high) // 2
+            # Bloque inferior izquierdo (el más cercano a la diagonal), luego los que dependen de él
+            self.complete_block(matrix, row_mid, row_high, col_low, col_mid)
+            self.add_product(matrix, row_low, row_mid, row_mid, row_high, col_low, col_mid)
+            self.complete_block(matrix, row_low, row_mid, col_low, col_mid)
+            self.add_product(matrix, row_mid, row_high, col_low, col_mid, col_mid, col_high)
+            self.complete_block(matrix, row_mid, row_high, col_mid, col_high)
+            self.add_product(matrix, row_low, row_mid, row_mid, row_high, col_mid, col_high)
+            self.add_product(matrix, row_low, row_mid, col_low, col_mid, col_mid, col_high)
+            self.complete_block(matrix, row_low, row_mid, col_mid, col_high)
+        elif rows > 1:
+            row_mid = (row_low + row_high) // 2
+            self.complete_block(matrix, row_mid, row_high, col_low, col_high)
+            self.add_product(matrix, row_low, row_mid, row_mid, row_high, col_low, col_high)
+            self.complete_block(matrix, row_low, row_mid, col_low, col_high)
+        else:
+            col_mid = (col_low + col_high) // 2
+            self.complete_block(matrix, row_low, row_high, col_low, col_mid)
+            self.add_product(matrix, row_low, row_high, col_low, col_mid, col_mid, col_high)
+            self.complete_block(matrix, row_low, row_high, col_mid, col_high)
+    
+    def add_product(self, matrix, row_low, row_high, mid_low, mid_high, col_low, col_high):
+        # matrix[filas, columnas] |= A tales que A -> B C, B en matrix[i, k] y C en matrix[k, j] para
+        # algún k en [mid_low, mid_high): un producto booleano de matrices por cada B (en float32)
+        left = matrix[row_low:row_high, mid_low:mid_high]
+        right = matrix[mid_low:mid_high, col_low:col_high]
+        rows, inner, cols = left.shape[0], left.shape[1], right.shape[1]
+        target = matrix[row_low:row_high, col_low:col_high]
+        for b, c_ids, heads in self.pair_groups:
+            x = left[:, :, b]
+            if not x.any():
+                continue
+            y = right[:, :, c_ids]
+            if not y.any():
+                continue
+            hits = x.astype(numpy.float32) @ y.reshape(inner, cols * len(c_ids)).astype(numpy.float32)
+            hits = hits.reshape(rows, cols, len(c_ids)) > 0
+            target |= hits.astype(numpy.float32) @ heads > 0
+    
+    def fill_triangle_leaf(self, matrix, low, high):
+        # Triángulo pequeño: por longitud de fragmento, con todas las posiciones y divisiones en lote
+        for length in range(2, high - low):
+            count = high - low - length
+            starts = numpy.arange(low, low + count)[:, None]
+            splits = numpy.arange(1, length)[None, :]
+            left = matrix[starts, starts + splits][:, :, self.pair_left]
+            right = matrix[starts + splits, starts + length][:, :, self.pair_right]
+            pairs = (left & right).any(axis=1)
+            ends = numpy.arange(low, low + count)
+            matrix[ends, ends + length] |= pairs.astype(numpy.float32) @ self.pair_rules > 0
+    
+    def fill_block_leaf(self, matrix, row_low, row_high, col_low, col_high):
+        # Bloque pequeño: por antidiagonales d = (row_high-1-i) + (j-col_low); cada celda de la
+        # antidiagonal d tiene exactamente d divisiones pendientes dentro de los triángulos
+        gap = col_low - row_high
+        pair_left = self.pair_left
+        pair_right = self.pair_right
+        for rows, cols, splits, right_side in self.leaf_plan(row_high - row_low, col_high - col_low):
+            i = row_low + rows
+            j = col_low + cols
+            # Las divisiones del lado de las columnas saltan el hueco [row_high, col_low) ya sumado
+            k = row_low + splits + right_side * gap
+            left = matrix[i[:, None], k][:, :, pair_left]
+            right = matrix[k, j[:, None]][:, :, pair_right]
+            pairs = (left & right).any(axis=1)
+            matrix[i, j] |= pairs.astype(numpy.float32) @ self.pair_rules > 0
+    
+    def leaf_plan(self, num_rows, num_cols):
+        # Índices relativos de cada antidiagonal de un bloque hoja; se calculan una vez por forma
+        key = (num_rows, num_cols)
+        plan = self.leaf_plans.get(key)
+        if plan is not None:
+            return plan
+        plan = []
+        for d in range(1, num_rows + num_cols - 1):
+            offset = numpy.arange(max(0, d - (num_cols - 1)), min(d, num_rows - 1) + 1)
+            t = numpy.arange(d)[None, :]
+            right_side = t >= offset[:, None]
+            # k relativo a row_low: i+1+t en el lado de las filas, num_rows+t-offset en el de las columnas
+            splits = num_rows + t - offset[:, None]
+            plan.append((num_rows - 1 - offset, d - offset, splits, right_side.astype(numpy.intp)))
+        self.leaf_plans[key] = plan
+        return plan
+    
+    def chart_statistics(self, rows=None):
+        # Cuenta el trabajo de la última tabla sobre sus primeras rows longitudes: celdas calculadas,
+        # celdas no vacías, no terminales en total (ocupación) y sondeos de reglas, que son
+        # los pares (B, C) consultados en 'sets', los pares (A, máscara de C) probados en 'bitset'
+        # y los pares (B, C) de las reglas evaluados por cada división en 'numpy'
+        n = len(self.sentence)
+        if rows is None:
+            rows = n
+        bitset = self.chart_engine == 'bitset'
+        # Tamaños de celda en el orden del búfer triangular (por longitud y luego por inicio)
+        if bitset:
+            sizes = [bin(mask).count('1') for mask in self.chart]
+        elif self.chart_engine == 'numpy':
+            counts = self.chart.sum(axis=2)
+            sizes = [int(counts[i, i + length - 1]) for length in range(1, n + 1) for i in range(n - length + 1)]
+        else:
+            sizes = [len(self.table[i][i + length - 1]) for length in range(1, n + 1) for i in range(n - length + 1)]
+        offsets = [0] * (n + 1)
+        for length in range(2, n + 1):
+            offsets[length] = offsets[length - 1] + n - length + 2
         
+        cells = filled = occupancy = probes = 0
+        for length in range(1, rows + 1):
+            for i in range(n - length + 1):
+                size = sizes[offsets[length] + i]
+                cells += 1
+                occupancy += size
+                if size:
+                    filled += 1
+                for left_len in range(1, length):
+                    left_pos = offsets[left_len] + i
+                    right_pos = offsets[length - left_len] + i + left_len
+                    if self.chart_engine == 'numpy':
+                        probes += len(self.pair_left)
+                        continue
+                    if not bitset:
+                        probes += sizes[left_pos] * sizes[right_pos]
+                        continue
+                    left = self.chart[left_pos]
+                    right = self.chart[right_pos]
+                    if not right:
+                        continue
+                    while left:
+                        low = left & -left
+                        left ^= low
+                        b = low.bit_length() - 1
+                        if right & self.right_union[b]:
+                            probes += len(self.binary_by_left[b])
+        return {'cells': cells, 'cells_filled': filled, 'chart_occupancy': occupancy, 'rule_probes': probes}
+    
+    def record_chart_counts(self, rows):
+        # Suma al colector los contadores de la tabla recién llenada (fuera de los tiempos medidos)
+        self.metrics.increment('charts')
+        for name, value in self.chart_statistics(rows).items():
+            self.metrics.increment(name, value)
+    
+    def find_split(self, i, j, symbol):
+        # Devuelve una derivación (B, C, k) de symbol sobre [i..j] según el motor, o None
+        if self.chart_engine != 'sets':
+            a_bit = 1 << self.symbol_ids[symbol]
+            for k in range(i, j):
+                left = self.cell_mask(i, k)
+                right = self.cell_mask(k+1, j)
+                while left:
+                    low = left & -left
+                    left ^= low
+                    b = low.bit_length() - 1
+                    for rule_bit, c_mask in self.binary_by_left[b]:
+                        matches = right & c_mask
+                        if rule_bit == a_bit and matches:
+                            C = self.symbols[(matches & -matches).bit_length() - 1]
+                            return self.symbols[b], C, k
+            return None
+        
+        if self.parse_table is not None:
+            # Tomar la primera derivación encontrada
+            derivations = self.parse_table[i][j].get(symbol)
+            return derivations[0] if derivations else None
+        
+        # Sin retropunteros: buscar una división válida en la tabla de conjuntos
+        for k in range(i, j):
+            for B in self.table[i][k]:
+                for C in self.table[k+1][j]:
+                    if symbol in self.binary_index.get((B, C), ()):
+                        return B, C, k
         return None
     
+    def build_compact_tree(self, i, j, symbol):
+        # Construye el árbol en preorden con una pila explícita (sin límite de recursión)
+        tree = ParseTree(self.sentence)
+        stack = [(i, j, symbol)]
+        while stack:
+            i, j, symbol = stack.pop()
+            tree.add_node(symbol, i, j)
+            if i < j:
+                split = self.find_split(i, j, symbol)
+                if split is None:
+                    return None
+                B, C, k = split
+                # El hijo derecho se apila primero para visitar el izquierdo antes
+                stack.append((k+1, j, C))
+                stack.append((i, k, B))
+        return tree
+    
+    def build_parse_tree(self, i, j, symbol):
+        # Construye el árbol de análisis sintáctico como dicts anidados
+        tree = self.build_compact_tree(i, j, symbol)
+        return tree.to_dict() if tree is not None else None
+    
     def print_table(self):
-        # Imprime la tabla CYK para debug
-        if not self.table:
+        # Imprime la tabla CYK para debug; las celdas se leen con get_cell en cualquier motor
+        # (con 'numpy' y en entradas largas la tabla es un arreglo, sin valor de verdad)
+        if self.table is None and self.chart is None:
             print("No hay tabla para mostrar")
             return
         
-        n = len(self.table)
+        n = len(self.sentence)
         print("\nTABLA CYK")
         print("Palabras:", " ".join(self.sentence))
         print()
@@ -111,22 +1175,58 @@ class CYKParser:
             row = []
             for j in range(n):
                 if j >= i:
-                    cell_content = "{" + ", ".join(sorted(self.table[i][j])) + "}"
+                    cell_content = "{" + ", ".join(sorted(self.get_cell(i, j))) + "}"
                     row.append(cell_content[:20].ljust(20))
                 else:
                     row.append("".ljust(20))
             print(f"Fila {i}: " + " ".join(row))
         print()
     
+    def bracketed_tree(self, tree):
+        # Representa el árbol con corchetes: (S (NP she) (VP ...))
+        if isinstance(tree, ParseTree):
+            return tree.to_bracketed()
+        if not tree:
+            return ""
+        
+        parts = []
+        stack = [tree]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, str):
+                parts.append(node)
+            elif 'word' in node:
+                parts.append(f"({node['symbol']} {node['word']})" if node['symbol'] else node['word'])
+            else:
+                parts.append(f"({node['symbol']}")
+                stack.append(")")
+                for child in reversed(node.get('children', [])):
+                    stack.append(child)
+                    stack.append(" ")
+        return "".join(parts)
+    
     def print_parse_tree(self, tree, depth=0):
         # Imprime el árbol de análisis sintáctico
         if not tree:
             return
         
-        indent = "  " * depth
-        if 'word' in tree:
-            print(f"{indent}{tree['symbol']} -> '{tree['word']}'")
-        else:
-            print(f"{indent}{tree['symbol']}")
-            for child in tree.get('children', []):
-                self.print_parse_tree(child, depth + 1)
\ No newline at end of file
+        if isinstance(tree, ParseTree):
+            for node_depth, symbol, start, end, leaf in tree.nodes():
+                indent = "  " * (depth + node_depth)
+                if leaf:
+                    print(f"{indent}{symbol} -> '{tree.words[start]}'")
+                else:
+                    print(f"{indent}{symbol}")
+            return
+        
+        # Recorrido con pila para no depender del límite de recursión
+        stack = [(tree, depth)]
+        while stack:
+            node, node_depth = stack.pop()
+            indent = "  " * node_depth
+            if 'word' in node:
+                print(f"{indent}{node['symbol']} -> '{node['word']}'")
+            else:
+                print(f"{indent}{node['symbol']}")
+                for child in reversed(node.get('children', [])):
+                    stack.append((child, node_depth + 1))
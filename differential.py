@@ -0,0 +1,493 @@
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from grammar import Grammar
+from grammar_simplifier import GrammarSimplifier
+from grammar_cache import GrammarCache
+from cyk_algorithm import CYKParser
+from compiled_grammar import compile_grammar, CompiledGrammar
+from earley_parser import EarleyParser
+from incremental_cyk import IncrementalCYKParser
+from lexicon import Lexicon
+from parse_forest import ParseForest
+from prefilter import SentenceFilter
+
+try:
+    import numpy
+except ImportError:
+    # numpy es opcional: sin él no se comparan los motores 'numpy' y 'matrix'
+    numpy = None
+
+# Símbolos de las gramáticas aleatorias; VP ejercita el paso de recursión izquierda del simplificador
+NON_TERMINALS = ['S', 'VP', 'NP', 'A', 'B', 'C']
+TERMINALS = ['a', 'b', 'c', 'd']
+# Palabra que no pertenece a ninguna gramática aleatoria
+UNKNOWN_WORD = 'zz'
+
+def grammar_from_rules(rules, start):
+    # Grammar con las reglas [(lado izquierdo, tupla del lado derecho)] y el símbolo inicial dados
+    grammar = Grammar()
+    for left, right in rules:
+        grammar.add_production(left, list(right))
+    grammar.terminals -= grammar.non_terminals
+    grammar.set_start_symbol(start)
+    return grammar
+
+def grammar_text(rules, start):
+    # Texto para load_from_text: las reglas del símbolo inicial van primero (el primero es el inicial)
+    ordered = sorted(rules, key=lambda rule: rule[0] != start)
+    return "\n".join(f"{left} -> {' '.join(right)}" for left, right in ordered)
+
+def rule_set(grammar):
+    # Reglas de la gramática como pares (lado izquierdo, tupla del lado derecho)
+    return {(nt, tuple(prod)) for nt, prods in grammar.productions.items() for prod in prods}
+
+def language(grammar, max_length):
+    # Fuerza bruta: cadenas de hasta max_length palabras derivables desde el símbolo inicial
+    # Punto fijo sobre la gramática original; sin reglas vacías cada símbolo aporta al menos una palabra
+    productions = grammar.productions
+    strings = {nt: set() for nt in productions}
+    changed = True
+    while changed:
+        changed = False
+        for nt, prods in productions.items():
+            for prod in prods:
+                partial = {()}
+                for position, symbol in enumerate(prod):
+                    if symbol in productions:
+                        options = strings[symbol]
+                    elif symbol in grammar.terminals:
+                        options = ((symbol,),)
+                    else:
+                        options = ()
+                    # Espacio que queda para este símbolo dejando una palabra a cada uno de los siguientes
+                    room = max_length - (len(prod) - position - 1)
+                    partial = {left + right for left in partial for right in options if len(left) + len(right) <= room}
+                    if not partial:
+                        break
+                added = partial - strings[nt]
+                if added:
+                    strings[nt] |= added
+                    changed = True
+    return strings.get(grammar.start_symbol, set())
+
+def tree_error(tree, rules, start, words):
+    # Motivo por el que tree no es una derivación de words desde start con esas reglas, o None
+    # Acepta los dicts de CYKParser.parse y de EarleyParser.parse (terminales sueltos con símbolo None)
+    if tree is None:
+        return "oración aceptada sin árbol"
+    if tree['symbol'] != start:
+        return f"la raíz es {tree['symbol']}, no {start}"
+    leaves = []
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        children = node['children']
+        if not children:
+            if node['symbol'] is not None and (node['symbol'], (node['word'],)) not in rules:
+                return f"no existe la regla {node['symbol']} -> {node['word']}"
+            leaves.append(node['word'])
+            continue
+        right = tuple(child['word'] if child['symbol'] is None else child['symbol'] for child in children)
+        if (node['symbol'], right) not in rules:
+            return f"no existe la regla {node['symbol']} -> {' '.join(right)}"
+        stack.extend(reversed(children))
+    if leaves != list(words):
+        return f"las hojas forman '{' '.join(leaves)}'"
+    return None
+
+class DifferentialHarness:
+    """Pruebas diferenciales: gramáticas y oraciones aleatorias contra un oráculo de referencia"""
+    
+    # Motores y caminos del simplificador que se comparan con la referencia ('sets')
+    ENGINES = ('sets', 'backpointers_first', 'backpointers_none', 'bitset', 'numpy', 'matrix', 'arena',
+               'recognize', 'recognize_bitset', 'viterbi', 'forest', 'incremental', 'lexicon', 'prefilter',
+               'earley', 'collapsed', 'cache', 'compiled', 'resimplified')
+    # Opciones de CYKParser de los motores que solo cambian la configuración del parser
+    PARSER_OPTIONS = {
+        'sets': {},
+        'backpointers_first': {'backpointers': 'first'},
+        'backpointers_none': {'backpointers': 'none'},
+        'bitset': {'engine': 'bitset'},
+        'numpy': {'engine': 'numpy'},
+        'matrix': {'long_input_threshold': 0},
+        'arena': {'arena_size': 2},
+    }
+    
+    def __init__(self, seed=0, max_length=10, brute_force_length=5, sentences_per_grammar=30, engines=None,
+                 extra_engines=None):
+        # La referencia es GrammarSimplifier + CYKParser('sets'); cada motor debe aceptar lo mismo que
+        # ella y devolver árboles válidos. En cadenas de hasta brute_force_length palabras la referencia
+        # se compara además con la fuerza bruta sobre la gramática original (preservación del lenguaje)
+        # extra_engines: {nombre: función(caso) -> función(oración) -> (aceptada, árboles)}
+        self.rng = random.Random(seed)
+        self.seed = seed
+        self.max_length = max_length
+        self.brute_force_length = brute_force_length
+        self.sentences_per_grammar = sentences_per_grammar
+        self.extra_engines = dict(extra_engines or {})
+        if engines is None:
+            engines = [name for name in self.ENGINES if numpy is not None or name not in ('numpy', 'matrix')]
+        unknown = [name for name in engines if name not in self.ENGINES]
+        if unknown:
+            raise ValueError(f"Motores desconocidos: {', '.join(unknown)}. Opciones: {', '.join(self.ENGINES)}")
+        self.engines = [name for name in engines if name != 'sets'] + list(self.extra_engines)
+        self.directory = None
+        self.files = 0
+        # Por motor: [oraciones analizadas, segundos]
+        self.timings = {name: [0, 0.0] for name in ['sets'] + self.engines}
+        self.grammars = 0
+        self.sentences = 0
+        self.failures = []
+    
+    def random_rules(self):
+        # Reglas aleatorias con lenguaje no vacío en cadenas cortas: unitarias, largas, mixtas,
+        # recursivas (también por la izquierda en VP) y con símbolos inútiles
+        rng = self.rng
+        while True:
+            non_terminals = ['S'] + rng.sample(NON_TERMINALS[1:], rng.randint(1, len(NON_TERMINALS) - 1))
+            terminals = rng.sample(TERMINALS, rng.randint(1, len(TERMINALS)))
+            rules = []
+            for _ in range(rng.randint(3, 12)):
+                left = rng.choice(non_terminals)
+                size = rng.choice([1, 1, 2, 2, 2, 3, 4])
+                right = tuple(rng.choice(non_terminals) if rng.random() < 0.6 else rng.choice(terminals)
+                              for _ in range(size))
+                if (left, right) not in rules:
+                    rules.append((left, right))
+            if any(left == 'S' for left, _ in rules):
+                short_language = language(grammar_from_rules(rules, 'S'), self.brute_force_length)
+                if short_language:
+                    return rules, 'S', short_language
+    
+    def sample_sentence(self, grammar, max_length):
+        # Oración derivable de hasta max_length palabras, expandiendo reglas que caben en el largo
+        # restante; None si la expansión se alarga demasiado (ciclos de reglas unitarias)
+        productions = grammar.productions
+        shortest = {}
+        changed = True
+        while changed:
+            changed = False
+            for nt, prods in productions.items():
+                for prod in prods:
+                    sizes = [shortest.get(s) if s in productions else 1 if s in grammar.terminals else None
+                             for s in prod]
+                    if None not in sizes and sum(sizes) < shortest.get(nt, max_length + 1):
+                        shortest[nt] = sum(sizes)
+                        changed = True
+        if grammar.start_symbol not in shortest:
+            return None
+        
+        words = []
+        # Pila de (símbolo, posición en la que a más tardar debe terminar lo que deriva)
+        stack = [(grammar.start_symbol, max_length)]
+        steps = 0
+        while stack:
+            symbol, budget = stack.pop()
+            if symbol not in productions:
+                words.append(symbol)
+                continue
+            steps += 1
+            if steps > 20 * max_length:
+                return None
+            used = len(words)
+            options = [prod for prod in productions[symbol]
+                       if all(s in shortest or s in grammar.terminals for s in prod)
+                       and sum(shortest.get(s, 1) for s in prod) <= budget - used]
+            prod = self.rng.choice(options)
+            # Cada hijo debe dejar espacio para el largo mínimo de los que van después
+            minimum = sum(shortest.get(s, 1) for s in prod)
+            pending = []
+            for s in prod:
+                minimum -= shortest.get(s, 1)
+                pending.append((s, budget - minimum))
+            stack.extend(reversed(pending))
+        return " ".join(words)
+    
+    def make_sentences(self, grammar, short_language):
+        # Todas las cadenas cortas sobre los terminales (o una muestra, más todas las del lenguaje),
+        # oraciones derivables más largas, mutaciones de ellas y oraciones con una palabra desconocida
+        rng = self.rng
+        terminals = sorted(grammar.terminals)
+        short = []
+        for length in range(1, self.brute_force_length + 1):
+            short.extend(itertools.product(terminals, repeat=length))
+        if len(short) > 400:
+            short = rng.sample(short, 200) + sorted(short_language)[:200]
+        sentences = [" ".join(words) for words in short]
+        
+        positives = [self.sample_sentence(grammar, rng.randint(1, self.max_length))
+                     for _ in range(self.sentences_per_grammar)]
+        positives = [sentence for sentence in positives if sentence]
+        sentences.extend(positives)
+        for sentence in positives:
+            words = sentence.split()
+            position = rng.randrange(len(words))
+            change = rng.random()
+            if change < 0.3 and len(words) > 1:
+                del words[position]
+            elif change < 0.6:
+                words.insert(position, rng.choice(terminals))
+            elif change < 0.9:
+                words[position] = rng.choice(terminals)
+            else:
+                words[position] = UNKNOWN_WORD
+            sentences.append(" ".join(words))
+        return sentences
+    
+    def build_case(self, rules, start):
+        # Gramática original y su CNF de referencia
+        grammar = grammar_from_rules(rules, start)
+        return {'rules': rules, 'start': start, 'grammar': grammar,
+                'cnf': GrammarSimplifier(grammar).simplify()}
+    
+    def new_path(self, name):
+        # Ruta nueva dentro del directorio temporal de la ejecución
+        self.files += 1
+        return os.path.join(self.directory, f"{self.files}-{name}")
+    
+    def make_engine(self, name, case):
+        # Devuelve (función oración -> (aceptada, árboles), reglas con las que se validan los árboles)
+        cnf_grammar = case['cnf']
+        tree_grammar = cnf_grammar
+        if name in self.extra_engines:
+            run = self.extra_engines[name](case)
+        elif name in self.PARSER_OPTIONS:
+            run = self.parse_runner(CYKParser(cnf_grammar, **self.PARSER_OPTIONS[name]))
+        elif name in ('recognize', 'recognize_bitset'):
+            parser = CYKParser(cnf_grammar, engine='bitset' if name == 'recognize_bitset' else 'sets')
+            run = lambda sentence: (parser.recognize(sentence), [])
+        elif name == 'viterbi':
+            run = self.viterbi_runner(CYKParser(cnf_grammar))
+        elif name == 'forest':
+            parser = CYKParser(cnf_grammar, backpointers='none')
+            
+            def run(sentence):
+                forest = ParseForest(parser, sentence)
+                return forest.count() > 0, list(forest.trees(limit=3))
+        elif name == 'incremental':
+            run = self.incremental_runner(IncrementalCYKParser(cnf_grammar))
+        elif name == 'lexicon':
+            run = self.parse_runner(CYKParser(cnf_grammar, lexicon=Lexicon(cnf_grammar)))
+        elif name == 'prefilter':
+            prefilter = SentenceFilter(cnf_grammar, bigrams=True)
+            run = self.parse_runner(CYKParser(cnf_grammar, engine='bitset', prefilter=prefilter))
+        elif name == 'earley':
+            tree_grammar = case['grammar']
+            run = self.parse_runner(EarleyParser(tree_grammar))
+        elif name == 'collapsed':
+            # Los árboles colapsados deben ser derivaciones de la gramática original
+            tree_grammar = case['grammar']
+            parser = CYKParser(cnf_grammar)
+            
+            def run(sentence):
+                accepted, _, tree = parser.parse_compact(sentence, collapse_helpers=True)
+                return accepted, [tree.to_dict()] if accepted else []
+        elif name == 'cache':
+            # La segunda carga sale del archivo de la caché (gramática e índices serializados)
+            cache = GrammarCache(self.new_path('cache'))
+            text = grammar_text(case['rules'], case['start'])
+            with contextlib.redirect_stdout(io.StringIO()):
+                cache.get_parser(text)
+                parser = cache.get_parser(text)
+            tree_grammar = parser.grammar
+            run = self.parse_runner(parser)
+        elif name == 'compiled':
+            path = compile_grammar(cnf_grammar, self.new_path('grammar.cykg'))
+            run = self.parse_runner(CYKParser(CompiledGrammar(path)))
+        else:
+            # Simplificar de nuevo la CNF debe dejar el mismo lenguaje
+            tree_grammar = GrammarSimplifier(cnf_grammar).simplify()
+            run = self.parse_runner(CYKParser(tree_grammar))
+        return run, rule_set(tree_grammar)
+    
+    @staticmethod
+    def parse_runner(parser):
+        # Adaptador de parse (CYKParser o EarleyParser): (aceptada, [árbol])
+        def run(sentence):
+            accepted, _, tree = parser.parse(sentence)
+            return accepted, [tree] if accepted else []
+        return run
+    
+    @staticmethod
+    def viterbi_runner(parser):
+        # Adaptador de parse_viterbi sin poda: (aceptada, [árbol más probable])
+        def run(sentence):
+            accepted, _, tree, _ = parser.parse_viterbi(sentence)
+            return accepted, [tree.to_dict() if tree is not None else None] if accepted else []
+        return run
+    
+    @staticmethod
+    def incremental_runner(parser):
+        # Agrega las palabras una a una; todo prefijo de una oración aceptada debe ser viable
+        def run(sentence):
+            parser.reset()
+            accepted = False
+            viable = True
+            for word in sentence.split():
+                accepted = parser.push(word)
+                viable = viable and parser.is_viable_prefix()
+            if accepted and not viable:
+                raise AssertionError("un prefijo de la oración aceptada no es viable")
+            return accepted, []
+        return run
+    
+    def check_sentence(self, case, engines, sentence, truth, timed=False):
+        # Fallas de una oración: [(comprobación, motor, mensaje)]. truth es la respuesta de la fuerza
+        # bruta (None si la oración es demasiado larga para ella)
+        failures = []
+        words = sentence.split()
+        results = {}
+        for name, (run, rules) in engines.items():
+            start = time.perf_counter()
+            try:
+                accepted, trees = run(sentence)
+            except Exception as error:
+                failures.append(('error', name, f"{type(error).__name__}: {error}"))
+                continue
+            if timed:
+                timing = self.timings[name]
+                timing[0] += 1
+                timing[1] += time.perf_counter() - start
+            results[name] = accepted
+            for tree in trees:
+                problem = tree_error(tree, rules, case['start'], words)
+                if problem is not None:
+                    failures.append(('tree', name, problem))
+                    break
+        
+        reference = results.get('sets')
+        if truth is not None and reference is not None and reference != truth:
+            failures.append(('language', 'sets', f"la referencia {'acepta' if reference else 'rechaza'} y "
+                                                  f"la fuerza bruta {'acepta' if truth else 'rechaza'}"))
+        for name, accepted in results.items():
+            if name != 'sets' and reference is not None and accepted != reference:
+                failures.append(('accept', name, f"{'acepta' if accepted else 'rechaza'} y la referencia no"))
+        return failures
+    
+    def case_failures(self, rules, start, sentence, engine):
+        # Fallas de una sola oración con la referencia y un motor (para reducir casos)
+        try:
+            case = self.build_case(rules, start)
+            engines = {'sets': self.make_engine('sets', case)}
+            if engine != 'sets':
+                engines[engine] = self.make_engine(engine, case)
+        except Exception as error:
+            return [('error', 'build', f"{type(error).__name__}: {error}")]
+        words = sentence.split()
+        truth = None
+        if len(words) <= self.brute_force_length:
+            truth = tuple(words) in language(case['grammar'], len(words))
+        return self.check_sentence(case, engines, sentence, truth)
+    
+    def shrink(self, rules, start, sentence, check, engine):
+        # Reduce el caso mientras la misma comprobación siga fallando con el mismo motor: quita reglas,
+        # palabras de la oración y símbolos de los lados derechos, hasta que ningún cambio falle
+        # (un mínimo local: cada reducción de un paso ya no falla)
+        def fails(candidate_rules, candidate_words):
+            if not candidate_words or not any(left == start for left, _ in candidate_rules):
+                return False
+            found = self.case_failures(candidate_rules, start, " ".join(candidate_words), engine)
+            return any(failure[:2] == (check, engine) for failure in found)
+        
+        words = sentence.split()
+        changed = True
+        while changed:
+            changed = False
+            candidates = [(rules[:i] + rules[i + 1:], words) for i in range(len(rules))]
+            # Pares de palabras vecinas además de palabras sueltas: quitar una sola suele romper la aceptación
+            candidates += [(rules, words[:i] + words[i + size:])
+                           for size in (2, 1) for i in range(len(words) - size + 1)]
+            for i, (left, right) in enumerate(rules):
+                for k in range(len(right) if len(right) > 1 else 0):
+                    shorter = (left, right[:k] + right[k + 1:])
+                    if shorter not in rules:
+                        candidates.append((rules[:i] + [shorter] + rules[i + 1:], words))
+            for candidate_rules, candidate_words in candidates:
+                if fails(candidate_rules, candidate_words):
+                    rules, words = candidate_rules, candidate_words
+                    changed = True
+                    break
+        return rules, " ".join(words)
+    
+    def check_grammar(self, rules, start, short_language):
+        # Compara todos los motores en las oraciones de una gramática; la primera falla se reduce y
+        # se registra (las siguientes de la misma gramática suelen ser la misma)
+        case = self.build_case(rules, start)
+        engines = {name: self.make_engine(name, case) for name in ['sets'] + self.engines}
+        self.grammars += 1
+        for sentence in self.make_sentences(case['grammar'], short_language):
+            words = tuple(sentence.split())
+            truth = words in short_language if len(words) <= self.brute_force_length else None
+            self.sentences += 1
+            failures = self.check_sentence(case, engines, sentence, truth, timed=True)
+            if failures:
+                check, engine, message = failures[0]
+                small_rules, small_sentence = self.shrink(rules, start, sentence, check, engine)
+                self.failures.append({
+                    'check': check, 'engine': engine, 'message': message,
+                    'grammar': grammar_text(small_rules, start), 'sentence': small_sentence,
+                    'original_grammar': grammar_text(rules, start), 'original_sentence': sentence,
+                })
+                return False
+        return True
+    
+    def run(self, num_grammars):
+        # Genera num_grammars gramáticas y devuelve el reporte (ver report)
+        with tempfile.TemporaryDirectory() as directory:
+            self.directory = directory
+            for _ in range(num_grammars):
+                rules, start, short_language = self.random_rules()
+                self.check_grammar(rules, start, short_language)
+            self.directory = None
+        return self.report()
+    
+    def report(self):
+        # Gramáticas y oraciones revisadas, fallas reducidas y oraciones/s de cada motor
+        throughput = {name: count / seconds if seconds > 0 else 0.0
+                      for name, (count, seconds) in self.timings.items() if count}
+        return {'seed': self.seed, 'grammars': self.grammars, 'sentences': self.sentences,
+                'failures': list(self.failures), 'throughput': throughput}
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Pruebas diferenciales de los motores del parser CYK")
+    arg_parser.add_argument('--grammars', type=int, default=100, help="gramáticas aleatorias a generar")
+    arg_parser.add_argument('--seed', type=int, default=0, help="semilla (misma semilla, mismos casos)")
+    arg_parser.add_argument('--max-length', type=int, default=10, help="palabras máximas de las oraciones derivadas")
+    arg_parser.add_argument('--brute-force-length', type=int, default=5,
+                            help="largo máximo de las cadenas comparadas con la fuerza bruta")
+    arg_parser.add_argument('--engines', nargs='*', choices=DifferentialHarness.ENGINES,
+                            help="motores a comparar (por defecto todos los disponibles)")
+    arg_parser.add_argument('--out', help="archivo JSON con el reporte completo")
+    args = arg_parser.parse_args(argv)
+    
+    harness = DifferentialHarness(seed=args.seed, max_length=args.max_length,
+                                  brute_force_length=args.brute_force_length, engines=args.engines)
+    start = time.perf_counter()
+    report = harness.run(args.grammars)
+    elapsed = time.perf_counter() - start
+    print(f"PRUEBAS DIFERENCIALES: {report['grammars']} gramáticas, {report['sentences']} oraciones "
+          f"en {elapsed:.1f} s (semilla {args.seed})")
+    print("Oraciones/s por motor:")
+    for name, rate in sorted(report['throughput'].items(), key=lambda item: -item[1]):
+        print(f"  {name:20s} {rate:10.1f}")
+    print(f"Fallas: {len(report['failures'])}")
+    for failure in report['failures']:
+        print(f"  [{failure['check']}] {failure['engine']}: {failure['message']}")
+        print(f"    oración: {failure['sentence']}")
+        for line in failure['grammar'].split("\n"):
+            print(f"    {line}")
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return 1 if report['failures'] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
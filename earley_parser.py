@@ -0,0 +1,181 @@
+import time
+
+class EarleyParser:
+    """Parser de Earley sobre la gramática original (sin convertir a CNF)"""
+    
+    def __init__(self, grammar):
+        # Trabaja con la gramática tal como la produce load_from_text: reglas largas, mixtas,
+        # unitarias y recursivas por la izquierda. Las alternativas vacías no existen en el formato
+        self.grammar = grammar
+        self.start_symbol = grammar.start_symbol
+        self.sentence = None
+        self.build_indexes()
+    
+    def build_indexes(self):
+        # Reglas numeradas y conjuntos de predicción precalculados
+        productions = self.grammar.productions
+        self.rule_lhs = []
+        self.rule_rhs = []
+        rules_of = {}
+        for nt, prods in productions.items():
+            for prod in prods:
+                rules_of.setdefault(nt, []).append(len(self.rule_rhs))
+                self.rule_lhs.append(nt)
+                self.rule_rhs.append(tuple(prod))
+        
+        # first_words[A] = palabras con las que puede empezar una cadena derivada de A (punto fijo)
+        first_words = {nt: set() for nt in productions}
+        changed = True
+        while changed:
+            changed = False
+            for nt, prods in productions.items():
+                words = first_words[nt]
+                before = len(words)
+                for prod in prods:
+                    first = prod[0]
+                    if first in productions:
+                        words |= first_words[first]
+                    else:
+                        words.add(first)
+                if len(words) != before:
+                    changed = True
+        self.first_words = first_words
+        
+        # predictions[A] = reglas de todos los B con A =>* B ... por la esquina izquierda (A incluido):
+        # predecir A agrega de una vez todo lo que el cierre de predicción agregaría
+        self.predictions = {}
+        for nt in productions:
+            reached = {nt}
+            pending = [nt]
+            rule_ids = []
+            while pending:
+                symbol = pending.pop()
+                for rule_id in rules_of[symbol]:
+                    rule_ids.append(rule_id)
+                    first = self.rule_rhs[rule_id][0]
+                    if first in productions and first not in reached:
+                        reached.add(first)
+                        pending.append(first)
+            self.predictions[nt] = rule_ids
+    
+    def can_start(self, rule_id, word):
+        # La regla puede derivar una cadena que empieza con word
+        first = self.rule_rhs[rule_id][0]
+        if first in self.first_words:
+            return word in self.first_words[first]
+        return first == word
+    
+    def fill_chart(self, words):
+        # Conjuntos de Earley: items[i] = lista de (regla, punto, origen) sin repetidos
+        # back[(i, regla, punto, origen)] = (posición anterior, hijo) del primer modo en que se creó el
+        # item; hijo es None para un terminal o (regla, origen) del item completo que avanzó el punto
+        n = len(words)
+        productions = self.grammar.productions
+        rule_lhs = self.rule_lhs
+        rule_rhs = self.rule_rhs
+        items = [[] for _ in range(n + 1)]
+        seen = [set() for _ in range(n + 1)]
+        # waiting[i][A] = items de items[i] con el punto antes de A
+        waiting = [{} for _ in range(n + 1)]
+        predicted = [set() for _ in range(n + 1)]
+        back = {}
+        
+        def add(position, item, previous, child):
+            if item not in seen[position]:
+                seen[position].add(item)
+                items[position].append(item)
+                back[(position,) + item] = (previous, child)
+        
+        def predict(position, symbol):
+            # Agrega (una vez por posición) las reglas del cierre de symbol que pueden empezar ahí
+            if symbol in predicted[position] or position == n:
+                return
+            predicted[position].add(symbol)
+            word = words[position]
+            for rule_id in self.predictions[symbol]:
+                if self.can_start(rule_id, word):
+                    add(position, (rule_id, 0, position), None, None)
+        
+        predict(0, self.start_symbol)
+        for i in range(n + 1):
+            current = items[i]
+            index = 0
+            while index < len(current):
+                rule_id, dot, origin = current[index]
+                index += 1
+                rhs = rule_rhs[rule_id]
+                if dot == len(rhs):
+                    # Completar: avanzar los items de origin que esperaban este no terminal
+                    for waiting_rule, waiting_dot, waiting_origin in waiting[origin].get(rule_lhs[rule_id], ()):
+                        add(i, (waiting_rule, waiting_dot + 1, waiting_origin), origin, (rule_id, origin))
+                    continue
+                symbol = rhs[dot]
+                if symbol in productions:
+                    waiting[i].setdefault(symbol, []).append((rule_id, dot, origin))
+                    predict(i, symbol)
+                elif i < n and symbol == words[i]:
+                    # Escanear
+                    add(i + 1, (rule_id, dot + 1, origin), i, None)
+        
+        self.items = items
+        self.back = back
+        return items
+    
+    def accepted_rule(self, n):
+        # Regla del símbolo inicial completa sobre toda la oración, o None
+        for rule_id, dot, origin in self.items[n]:
+            if origin == 0 and dot == len(self.rule_rhs[rule_id]) and self.rule_lhs[rule_id] == self.start_symbol:
+                return rule_id
+        return None
+    
+    def parse(self, sentence):
+        # Misma interfaz que CYKParser.parse: (aceptada, tiempo, árbol como dicts anidados)
+        start_time = time.perf_counter()
+        words = sentence.lower().split()
+        self.sentence = words
+        n = len(words)
+        if n == 0:
+            return False, 0, None
+        
+        self.fill_chart(words)
+        rule_id = self.accepted_rule(n)
+        tree = self.build_tree(rule_id, 0, n) if rule_id is not None else None
+        return rule_id is not None, time.perf_counter() - start_time, tree
+    
+    def recognize(self, sentence):
+        # Solo decide si la oración es aceptada
+        words = sentence.lower().split()
+        self.sentence = words
+        if not words:
+            return False
+        self.fill_chart(words)
+        return self.accepted_rule(len(words)) is not None
+    
+    def build_tree(self, rule_id, origin, end):
+        # Sigue los retropunteros con una pila explícita; los terminales dentro de reglas largas son
+        # hojas con símbolo None (como los terminales sueltos de ParseTree.to_dict)
+        words = self.sentence
+        root = {'symbol': self.rule_lhs[rule_id], 'children': []}
+        stack = [(root, rule_id, origin, end)]
+        while stack:
+            node, rule_id, origin, end = stack.pop()
+            rhs = self.rule_rhs[rule_id]
+            if len(rhs) == 1 and rhs[0] not in self.grammar.productions:
+                # A -> palabra: hoja como en los árboles de CYKParser
+                node['word'] = words[origin]
+                continue
+            children = []
+            position = end
+            for dot in range(len(rhs), 0, -1):
+                previous, child = self.back[(position, rule_id, dot, origin)]
+                if child is None:
+                    children.append({'symbol': None, 'word': words[previous], 'children': []})
+                else:
+                    child_rule, child_origin = child
+                    child_node = {'symbol': self.rule_lhs[child_rule], 'children': []}
+                    children.append(child_node)
+                    stack.append((child_node, child_rule, child_origin, position))
+                position = previous
+            children.reverse()
+            node['children'] = children
+        return root
@@ -6,9 +6,24 @@ class Grammar:
         self.terminals = set()
         self.non_terminals = set()
         self.start_symbol = None
-        
-    def add_production(self, left, right):
-        # Agrega una producción a la gramática
+        # Variables auxiliares creadas por la conversión a CNF (X0, X1, ...)
+        self.helper_symbols = set()
+        # Procedencia de las reglas de la CNF, para reconstruir los árboles en la gramática original
+        # (ver ParseTree.collapse): (A, tupla del lado derecho) -> cadena unitaria (B1, ..., Bk) de la
+        # derivación A -> B1 -> ... -> Bk -> lado derecho que reemplazó la eliminación de unitarias
+        self.unit_chains = {}
+        # Variable auxiliar de la recursión izquierda -> no terminal original (X0 -> 'VP')
+        self.left_recursion_helpers = {}
+        # Probabilidades de las reglas: (lado izquierdo, tupla del lado derecho) -> peso en (0, 1]
+        # Las producciones sin peso valen 1
+        self.weights = {}
+    
+    def add_production(self, left, right, weight=None):
+        # Agrega una producción a la gramática, opcionalmente con su probabilidad
+        if weight is not None:
+            if not 0 < weight <= 1:
+                raise ValueError(f"El peso de {left} -> {' '.join(right)} debe estar en (0, 1]: {weight}")
+            self.weights[(left, tuple(right))] = weight
         if left not in self.productions:
             self.productions[left] = []
         self.productions[left].append(right)
@@ -19,6 +34,31 @@ class Grammar:
             if symbol.islower() or symbol in ['(', ')', '+', '*']:
                 self.terminals.add(symbol)
     
+    def copy(self):
+        # Copia independiente de la gramática, más barata que copy.deepcopy
+        grammar = Grammar()
+        grammar.productions = {nt: [list(prod) for prod in prods] for nt, prods in self.productions.items()}
+        grammar.terminals = set(self.terminals)
+        grammar.non_terminals = set(self.non_terminals)
+        grammar.start_symbol = self.start_symbol
+        grammar.helper_symbols = set(self.helper_symbols)
+        grammar.unit_chains = dict(self.unit_chains)
+        grammar.left_recursion_helpers = dict(self.left_recursion_helpers)
+        grammar.weights = dict(self.weights)
+        return grammar
+    
+    def rule_weight(self, left, right):
+        # Probabilidad de una producción (1 si no se le asignó peso)
+        return self.weights.get((left, tuple(right)), 1.0)
+    
+    def size(self):
+        # Tamaño de la gramática: no terminales, producciones y símbolos en los lados derechos
+        return {
+            'non_terminals': len(self.productions),
+            'productions': sum(len(prods) for prods in self.productions.values()),
+            'symbols': sum(len(prod) for prods in self.productions.values() for prod in prods),
+        }
+    
     def set_start_symbol(self, symbol):
         # Establece el símbolo inicial
         self.start_symbol = symbol
@@ -32,11 +72,19 @@ class Grammar:
                 left = left.strip()
                 
                 # Manejar múltiples producciones separadas por |
+                # Cada alternativa puede terminar con su probabilidad: VP -> V NP [0.7]
                 alternatives = right_side.split('|')
                 for alt in alternatives:
                     right = alt.strip().split()
+                    weight = None
+                    if right and right[-1].startswith('[') and right[-1].endswith(']'):
+                        try:
+                            weight = float(right[-1][1:-1])
+                        except ValueError:
+                            raise ValueError(f"Peso inválido en la regla: {line.strip()}") from None
+                        right = right[:-1]
                     if right:  # Solo agregar si no está vacío
-                        self.add_production(left, right)
+                        self.add_production(left, right, weight)
         
         # El primer símbolo es el inicial por defecto
         if self.productions and not self.start_symbol:
@@ -52,6 +100,8 @@ class Grammar:
         print("Producciones:")
         for nt in sorted(self.productions.keys()):
             for prod in self.productions[nt]:
-                print(f"  {nt} -> {' '.join(prod)}")
+                weight = self.weights.get((nt, tuple(prod)))
+                suffix = f" [{weight:g}]" if weight is not None else ""
+                print(f"  {nt} -> {' '.join(prod)}{suffix}")
         print(f"Terminales: {sorted(self.terminals)}")
         print(f"No terminales: {sorted(self.non_terminals)}")
\ No newline at end of file
@@ -0,0 +1,75 @@
+import hashlib
+import os
+import pickle
+import tempfile
+from grammar import Grammar
+from grammar_simplifier import GrammarSimplifier
+from cyk_algorithm import CYKParser
+
+DEFAULT_CACHE_DIR = os.environ.get('CYK_GRAMMAR_CACHE', '.grammar_cache')
+CACHE_FORMAT = 1
+
+class GrammarCache:
+    """Caché en disco de gramáticas convertidas a CNF y de los índices del parser"""
+    
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+    
+    def key(self, grammar_text):
+        # Hash del texto fuente más las versiones del simplificador y del formato
+        digest = hashlib.sha256()
+        digest.update(f"simplifier={GrammarSimplifier.VERSION};format={CACHE_FORMAT}\n".encode('utf-8'))
+        digest.update(grammar_text.encode('utf-8'))
+        return digest.hexdigest()
+    
+    def path(self, key):
+        # Archivo de la caché para una clave
+        return os.path.join(self.cache_dir, f"{key}.pickle")
+    
+    def load(self, grammar_text):
+        # Devuelve (gramática CNF, índices) si hay una entrada válida, o None
+        key = self.key(grammar_text)
+        try:
+            with open(self.path(key), 'rb') as f:
+                entry = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            return None
+        if not isinstance(entry, dict) or entry.get('key') != key:
+            return None
+        return entry['grammar'], entry['indexes']
+    
+    def store(self, grammar_text, parser):
+        # Guarda la gramática CNF y los índices del parser de forma atómica
+        key = self.key(grammar_text)
+        entry = {'key': key, 'grammar': parser.grammar, 'indexes': parser.export_indexes()}
+        os.makedirs(self.cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.path(key))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    
+    def get_parser(self, grammar_text, **parser_options):
+        # Crea un CYKParser desde la caché, o convierte la gramática y la guarda
+        cached = self.load(grammar_text)
+        if cached is not None:
+            self.hits += 1
+            cnf_grammar, indexes = cached
+            return CYKParser(cnf_grammar, indexes=indexes, **parser_options)
+        
+        self.misses += 1
+        grammar = Grammar()
+        grammar.load_from_text(grammar_text)
+        cnf_grammar = GrammarSimplifier(grammar, metrics=parser_options.get('metrics')).simplify()
+        parser = CYKParser(cnf_grammar, **parser_options)
+        try:
+            self.store(grammar_text, parser)
+        except OSError:
+            # Una caché no escribible no debe impedir el análisis
+            pass
+        return parser
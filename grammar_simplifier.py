@@ -1,13 +1,22 @@
+import logging
+import time
+from collections import deque
 from grammar import Grammar
-import copy
+
+logger = logging.getLogger(__name__)
 
 class GrammarSimplifier:
     # Implementa algoritmos para simplificar gramáticas
     
-    def __init__(self, grammar):
+    # Versión del algoritmo de simplificación: cambiarla invalida las gramáticas en caché
+    VERSION = 5
+    
+    def __init__(self, grammar, metrics=None):
+        # metrics: colector opcional (ver metrics.MetricsCollector); None = sin medición
         self.original_grammar = grammar
-        self.simplified_grammar = copy.deepcopy(grammar)
+        self.simplified_grammar = grammar.copy()
         self.new_variable_counter = 0
+        self.metrics = metrics
     
     def generate_new_variable(self):
         # Genera nuevas variables para la conversión a CNF
@@ -15,11 +24,12 @@ class GrammarSimplifier:
             var = f"X{self.new_variable_counter}"
             self.new_variable_counter += 1
             if var not in self.simplified_grammar.non_terminals:
+                self.simplified_grammar.helper_symbols.add(var)
                 return var
     
     def eliminate_left_recursion(self):
         # Elimina recursión izquierda antes de la conversión a CNF
-        print("Paso especial: Eliminando recursión izquierda...")
+        logger.info("Paso especial: Eliminando recursión izquierda...")
         
         # Manejar VP -> VP PP específicamente
         if 'VP' in self.simplified_grammar.productions:
@@ -38,60 +48,98 @@ class GrammarSimplifier:
                 # Crear nueva variable para manejar recursión
                 new_var = self.generate_new_variable()
                 self.simplified_grammar.non_terminals.add(new_var)
+                self.simplified_grammar.left_recursion_helpers[new_var] = 'VP'
+                weights = self.simplified_grammar.weights
                 
                 # VP -> α VP' donde α son las producciones no recursivas
+                # Ambas versiones conservan el peso p(α): una derivación α β1 ... βk vale
+                # p(α) · p(β1) · ... · p(βk), igual que con VP -> VP β
                 vp_new_prods = []
                 for prod in new_prods:
                     vp_new_prods.append(prod + [new_var])
                     vp_new_prods.append(prod)  # También la versión sin recursión
+                    if ('VP', tuple(prod)) in weights:
+                        weights[('VP', tuple(prod + [new_var]))] = weights[('VP', tuple(prod))]
                 
                 # VP' -> β VP' | β donde β son las partes recursivas
                 vp_prime_prods = []
                 for prod in recursive_prods:
                     vp_prime_prods.append(prod + [new_var])
                     vp_prime_prods.append(prod)
+                    weight = weights.get(('VP', ('VP',) + tuple(prod)))
+                    if weight is not None:
+                        weights[(new_var, tuple(prod + [new_var]))] = weight
+                        weights[(new_var, tuple(prod))] = weight
                 
                 self.simplified_grammar.productions['VP'] = vp_new_prods
                 self.simplified_grammar.productions[new_var] = vp_prime_prods
         
-        print("Recursión izquierda eliminada.")
+        logger.info("Recursión izquierda eliminada.")
     
     def eliminate_useless_symbols(self):
         # Elimina símbolos inútiles (que no generan cadenas o no son alcanzables)
-        print("Paso 1: Eliminando símbolos inútiles...")
-        
-        # Encontrar símbolos que generan cadenas terminales
-        generating = set(self.simplified_grammar.terminals)
-        changed = True
-        
-        while changed:
-            changed = False
-            for nt, prods in self.simplified_grammar.productions.items():
-                if nt not in generating:
-                    for prod in prods:
-                        if all(symbol in generating for symbol in prod):
-                            generating.add(nt)
-                            changed = True
-                            break
-        
-        # Encontrar símbolos alcanzables desde el símbolo inicial
+        logger.info("Paso 1: Eliminando símbolos inútiles...")
+        
+        productions = self.simplified_grammar.productions
+        terminals = self.simplified_grammar.terminals
+        
+        # Encontrar símbolos que generan cadenas terminales (lista de trabajo)
+        # Primero los no terminales con alguna producción solo de terminales
+        generating = set(terminals)
+        for nt, prods in productions.items():
+            for prod in prods:
+                if all(symbol in terminals for symbol in prod):
+                    generating.add(nt)
+                    break
+        
+        # missing[p] = apariciones en la producción p de símbolos que aún no generan cadenas
+        # uses[X] = producciones donde aparece X, para avisarles cuando X pase a generar
+        lhs_of = []
+        missing = []
+        uses = {}
+        queue = deque()
+        for nt, prods in productions.items():
+            if nt in generating:
+                continue
+            for prod in prods:
+                prod_id = len(lhs_of)
+                lhs_of.append(nt)
+                count = 0
+                for symbol in prod:
+                    if symbol not in generating:
+                        count += 1
+                        uses.setdefault(symbol, []).append(prod_id)
+                missing.append(count)
+                if count == 0 and nt not in generating:
+                    generating.add(nt)
+                    queue.append(nt)
+        
+        while queue:
+            symbol = queue.popleft()
+            for prod_id in uses.get(symbol, ()):
+                missing[prod_id] -= 1
+                nt = lhs_of[prod_id]
+                if missing[prod_id] == 0 and nt not in generating:
+                    generating.add(nt)
+                    queue.append(nt)
+        
+        # Encontrar símbolos alcanzables desde el símbolo inicial (recorrido en anchura)
         reachable = {self.simplified_grammar.start_symbol}
-        changed = True
-        
-        while changed:
-            changed = False
-            for nt in list(reachable):
-                if nt in self.simplified_grammar.productions:
-                    for prod in self.simplified_grammar.productions[nt]:
-                        for symbol in prod:
-                            if symbol not in reachable:
-                                reachable.add(symbol)
-                                changed = True
+        queue = deque(reachable)
+        while queue:
+            nt = queue.popleft()
+            for prod in productions.get(nt, ()):
+                for symbol in prod:
+                    if symbol not in reachable:
+                        reachable.add(symbol)
+                        queue.append(symbol)
         
         # Mantener solo símbolos útiles
         useful = generating & reachable
         
-        # Filtrar producciones
+        # Filtrar producciones (y sus pesos)
+        weights = self.simplified_grammar.weights
+        new_weights = {}
         new_productions = {}
         for nt, prods in self.simplified_grammar.productions.items():
             if nt in useful:
@@ -99,74 +147,149 @@ class GrammarSimplifier:
                 for prod in prods:
                     if all(symbol in useful or symbol in self.simplified_grammar.terminals for symbol in prod):
                         new_prods.append(prod)
+                        if weights and (nt, tuple(prod)) in weights:
+                            new_weights[(nt, tuple(prod))] = weights[(nt, tuple(prod))]
                 if new_prods:
                     new_productions[nt] = new_prods
         
         self.simplified_grammar.productions = new_productions
+        self.simplified_grammar.weights = new_weights
         self.simplified_grammar.non_terminals = useful & self.simplified_grammar.non_terminals
         
-        print(f"Símbolos útiles conservados: {len(useful)} símbolos")
+        logger.info("Símbolos útiles conservados: %d símbolos", len(useful))
     
     def eliminate_epsilon_productions(self):
         # Elimina producciones epsilon (ε)
-        print("Paso 2: Eliminando producciones epsilon...")
-        print(f"Variables nullable eliminadas: 0 variables")
+        logger.info("Paso 2: Eliminando producciones epsilon...")
+        logger.info("Variables nullable eliminadas: 0 variables")
     
     def eliminate_unit_productions(self):
         # Elimina producciones unitarias (A -> B) - CORREGIDO
-        print("Paso 3: Eliminando producciones unitarias...")
+        logger.info("Paso 3: Eliminando producciones unitarias...")
         
         # NO eliminar las producciones unitarias, solo expandirlas
         # Esto es crucial para que NP -> N funcione correctamente
         
-        # Encontrar todas las producciones unitarias
-        unit_pairs = set()
-        for nt, prods in self.simplified_grammar.productions.items():
+        productions = self.simplified_grammar.productions
+        non_terminals = self.simplified_grammar.non_terminals
+        
+        # Grafo de producciones unitarias: A -> B
+        unit_targets = {}
+        for nt, prods in productions.items():
             for prod in prods:
-                if len(prod) == 1 and prod[0] in self.simplified_grammar.non_terminals:
-                    unit_pairs.add((nt, prod[0]))
-        
-        # Clausura transitiva de pares unitarios
-        changed = True
-        while changed:
-            changed = False
-            new_pairs = set(unit_pairs)
-            for (a, b) in unit_pairs:
-                for (c, d) in unit_pairs:
-                    if b == c and (a, d) not in unit_pairs:
-                        new_pairs.add((a, d))
-                        changed = True
-            unit_pairs = new_pairs
+                if len(prod) == 1 and prod[0] in non_terminals:
+                    targets = unit_targets.setdefault(nt, [])
+                    if prod[0] not in targets:
+                        targets.append(prod[0])
         
         # MANTENER las producciones originales y agregar las expandidas
-        new_productions = copy.deepcopy(self.simplified_grammar.productions)
+        new_productions = {nt: list(prods) for nt, prods in productions.items()}
         
-        # Agregar producciones derivadas de eliminación unitaria
-        for (a, b) in unit_pairs:
-            if b in self.simplified_grammar.productions:
-                for prod in self.simplified_grammar.productions[b]:
+        # Clausura transitiva por recorrido en anchura desde cada A: cada par (A, B) se visita una vez
+        # Las producciones ya presentes en A se deduplican con un conjunto de tuplas
+        grammar = self.simplified_grammar
+        weights = grammar.weights
+        chains = grammar.unit_chains
+        pair_count = 0
+        for a in unit_targets:
+            # via[B] = símbolo desde el que se llegó a B (None para los destinos directos de A)
+            via = dict.fromkeys(unit_targets[a])
+            queue = deque(unit_targets[a])
+            order = []
+            while queue:
+                b = queue.popleft()
+                order.append(b)
+                for c in unit_targets.get(b, ()):
+                    if c not in via:
+                        via[c] = b
+                        queue.append(c)
+            pair_count += len(order)
+            if weights:
+                path_weights, via = self.unit_path_weights(a, unit_targets)
+            
+            # Agregar producciones derivadas de eliminación unitaria
+            seen = {tuple(prod) for prod in new_productions[a]}
+            for b in order:
+                for prod in productions.get(b, ()):
                     # Solo agregar producciones no unitarias
-                    if not (len(prod) == 1 and prod[0] in self.simplified_grammar.non_terminals):
-                        if prod not in new_productions[a]:
-                            new_productions[a].append(prod)
+                    if len(prod) == 1 and prod[0] in non_terminals:
+                        continue
+                    key = tuple(prod)
+                    # A -> γ vale lo mismo que la mejor derivación A =>* B -> γ (criterio de Viterbi)
+                    weight = path_weights[b] * grammar.rule_weight(b, prod) if weights else None
+                    # La cadena registrada es la del camino que dio el peso
+                    if key not in seen:
+                        seen.add(key)
+                        new_productions[a].append(prod)
+                        chains[(a, key)] = self.unit_chain(b, via)
+                        if weights:
+                            weights[(a, key)] = weight
+                    elif weights and weight > grammar.rule_weight(a, prod):
+                        weights[(a, key)] = weight
+                        chains[(a, key)] = self.unit_chain(b, via)
         
         self.simplified_grammar.productions = new_productions
-        print(f"Producciones unitarias procesadas: {len(unit_pairs)} pares")
+        logger.info("Producciones unitarias procesadas: %d pares", pair_count)
+    
+    def unit_path_weights(self, a, unit_targets):
+        # Mayor producto de pesos de una cadena unitaria A -> B1 -> ... -> B, para cada B alcanzable,
+        # y el símbolo anterior a B en ese camino (None si A -> B es directa)
+        # Con pesos en (0, 1] un ciclo no mejora ningún camino, así que la lista de trabajo termina
+        grammar = self.simplified_grammar
+        best = {}
+        via = {}
+        queue = deque()
+        for b in unit_targets[a]:
+            weight = grammar.rule_weight(a, [b])
+            if weight > best.get(b, 0.0):
+                best[b] = weight
+                via[b] = None
+                queue.append(b)
+        while queue:
+            b = queue.popleft()
+            for c in unit_targets.get(b, ()):
+                weight = best[b] * grammar.rule_weight(b, [c])
+                if weight > best.get(c, 0.0):
+                    best[c] = weight
+                    via[c] = b
+                    queue.append(c)
+        return best, via
+    
+    @staticmethod
+    def unit_chain(b, via):
+        # Cadena (B1, ..., B) de A hasta B siguiendo via hacia atrás
+        chain = [b]
+        while via[chain[-1]] is not None:
+            chain.append(via[chain[-1]])
+        chain.reverse()
+        return tuple(chain)
     
     def convert_to_cnf(self):
         # Convierte a Forma Normal de Chomsky
-        print("Paso 4: Convirtiendo a Forma Normal de Chomsky...")
+        logger.info("Paso 4: Convirtiendo a Forma Normal de Chomsky...")
         
         new_productions = {}
         terminal_vars = {}  # Mapeo de terminales a variables
+        # Pesos de las reglas reescritas; las reglas nuevas X -> a valen 1
+        weights = self.simplified_grammar.weights
+        new_weights = {}
+        # Las cadenas unitarias siguen a su regla como los pesos (en una regla larga, a la primera parte)
+        chains = self.simplified_grammar.unit_chains
+        new_chains = {}
         
         # Paso 1: Reemplazar terminales en producciones mixtas
         for nt, prods in self.simplified_grammar.productions.items():
             new_productions[nt] = []
             for prod in prods:
+                weight = weights.get((nt, tuple(prod))) if weights else None
+                chain = chains.get((nt, tuple(prod)))
                 if len(prod) == 1:
                     # Producciones A -> a (ya están en CNF)
                     new_productions[nt].append(prod)
+                    if weight is not None:
+                        new_weights[(nt, tuple(prod))] = weight
+                    if chain is not None:
+                        new_chains[(nt, tuple(prod))] = chain
                 else:
                     # Producciones con múltiples símbolos
                     new_prod = []
@@ -181,14 +304,28 @@ class GrammarSimplifier:
                         else:
                             new_prod.append(symbol)
                     new_productions[nt].append(new_prod)
+                    if weight is not None:
+                        new_weights[(nt, tuple(new_prod))] = weight
+                    if chain is not None:
+                        new_chains[(nt, tuple(new_prod))] = chain
         
         # Paso 2: Eliminar producciones con más de 2 no terminales
+        # A -> s1 s2 ... sk [p] pasa a A -> s1 X1 [p], X1 -> s2 X2 [1], ...: cada auxiliar tiene una
+        # sola producción, así que la probabilidad de la regla original queda entera en la primera
         final_productions = {}
+        final_weights = {}
+        final_chains = {}
         for nt, prods in new_productions.items():
             final_productions[nt] = []
             for prod in prods:
+                weight = new_weights.get((nt, tuple(prod))) if new_weights else None
+                chain = new_chains.get((nt, tuple(prod)))
                 if len(prod) <= 2:
                     final_productions[nt].append(prod)
+                    if weight is not None:
+                        final_weights[(nt, tuple(prod))] = weight
+                    if chain is not None:
+                        final_chains[(nt, tuple(prod))] = chain
                 else:
                     # Dividir producción larga
                     current_var = nt
@@ -197,6 +334,10 @@ class GrammarSimplifier:
                         if current_var not in final_productions:
                             final_productions[current_var] = []
                         final_productions[current_var].append([prod[i], new_var])
+                        if i == 0 and weight is not None:
+                            final_weights[(nt, (prod[0], new_var))] = weight
+                        if i == 0 and chain is not None:
+                            final_chains[(nt, (prod[0], new_var))] = chain
                         self.simplified_grammar.non_terminals.add(new_var)
                         current_var = new_var
                     
@@ -206,16 +347,31 @@ class GrammarSimplifier:
                     final_productions[current_var].append(prod[-2:])
         
         self.simplified_grammar.productions = final_productions
-        print("Conversión a CNF completada.")
+        self.simplified_grammar.weights = final_weights
+        self.simplified_grammar.unit_chains = final_chains
+        logger.info("Conversión a CNF completada.")
+    
+    def run_step(self, step):
+        # Ejecuta un paso; con métricas activas mide su duración y el tamaño de la gramática
+        if self.metrics is None:
+            step()
+            return
+        before = self.simplified_grammar.size()
+        start = time.perf_counter_ns()
+        step()
+        elapsed = time.perf_counter_ns() - start
+        self.metrics.record_time(step.__name__, elapsed)
+        self.metrics.record('grammar_size', step=step.__name__, before=before,
+                            after=self.simplified_grammar.size())
     
     def simplify(self):
         # Ejecuta todo el proceso de simplificación
-        print("INICIANDO SIMPLIFICACIÓN DE GRAMÁTICA")
-        self.eliminate_left_recursion()
-        self.eliminate_useless_symbols()
-        self.eliminate_epsilon_productions()
-        self.eliminate_unit_productions()
-        self.convert_to_cnf()
-        print("SIMPLIFICACIÓN COMPLETADA\n")
+        logger.info("INICIANDO SIMPLIFICACIÓN DE GRAMÁTICA")
+        self.run_step(self.eliminate_left_recursion)
+        self.run_step(self.eliminate_useless_symbols)
+        self.run_step(self.eliminate_epsilon_productions)
+        self.run_step(self.eliminate_unit_productions)
+        self.run_step(self.convert_to_cnf)
+        logger.info("SIMPLIFICACIÓN COMPLETADA\n")
         
         return self.simplified_grammar
\ No newline at end of file
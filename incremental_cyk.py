@@ -0,0 +1,145 @@
+from cyk_algorithm import CYKParser
+
+class IncrementalCYKParser:
+    """Parser CYK incremental: agrega o quita palabras al final sin recalcular la tabla"""
+    
+    def __init__(self, cnf_grammar, indexes=None):
+        # Reutiliza los índices de bits de CYKParser (no terminales internados como enteros)
+        self.parser = CYKParser(cnf_grammar, engine='bitset', indexes=indexes)
+        self.grammar = cnf_grammar
+        self.words = []
+        # columns[j][i] = máscara de no terminales que derivan words[i..j]
+        self.columns = []
+        # Historial de máscaras de prefijo viable, una lista por longitud del prefijo
+        self.viable_history = []
+        
+        symbol_ids = self.parser.symbol_ids
+        self.start_bit = 1 << symbol_ids[cnf_grammar.start_symbol] if cnf_grammar.start_symbol in symbol_ids else 0
+        self.build_left_corner_closure()
+    
+    def build_left_corner_closure(self):
+        # Calcula qué no terminales generan alguna cadena usando solo reglas A -> a y A -> B C
+        parser = self.parser
+        productive = 0
+        for mask in parser.terminal_masks.values():
+            productive |= mask
+        changed = True
+        while changed:
+            changed = False
+            for b, rules in enumerate(parser.binary_by_left):
+                if not (productive >> b) & 1:
+                    continue
+                for a_bit, c_mask in rules:
+                    if not productive & a_bit and productive & c_mask:
+                        productive |= a_bit
+                        changed = True
+        self.productive = productive
+        
+        # up[B] = no terminales A con A =>* B γ por esquina izquierda (reflexivo)
+        # Solo cuentan reglas A -> B C con C productivo: C debe poder completar la oración
+        parents = []
+        for rules in parser.binary_by_left:
+            mask = 0
+            for a_bit, c_mask in rules:
+                if c_mask & productive:
+                    mask |= a_bit
+            parents.append(mask)
+        
+        self.up = []
+        for b in range(len(parents)):
+            closure = 1 << b
+            frontier = closure
+            while frontier:
+                low = frontier & -frontier
+                frontier ^= low
+                new = parents[low.bit_length() - 1] & ~closure
+                closure |= new
+                frontier |= new
+            self.up.append(closure)
+    
+    def combine(self, left, right):
+        # Máscara de A tales que A -> B C con B en left y C en right
+        by_left = self.parser.binary_by_left
+        right_union = self.parser.right_union
+        cell = 0
+        while left:
+            low = left & -left
+            left ^= low
+            b = low.bit_length() - 1
+            if right & right_union[b]:
+                for a_bit, c_mask in by_left[b]:
+                    if right & c_mask:
+                        cell |= a_bit
+        return cell
+    
+    def close_left_corner(self, mask):
+        # Agrega a la máscara todos los ancestros por esquina izquierda
+        closed = 0
+        while mask:
+            low = mask & -mask
+            mask ^= low
+            closed |= self.up[low.bit_length() - 1]
+        return closed
+    
+    def push(self, token):
+        # Agrega una palabra: solo se calcula la nueva columna de celdas que terminan en ella
+        word = token.lower()
+        j = len(self.words)
+        self.words.append(word)
+        column = [0] * (j + 1)
+        column[j] = self.parser.terminal_masks.get(word, 0)
+        columns = self.columns
+        for i in range(j - 1, -1, -1):
+            cell = 0
+            for k in range(i, j):
+                left = columns[k][i]
+                if left:
+                    right = column[k + 1]
+                    if right:
+                        cell |= self.combine(left, right)
+            column[i] = cell
+        columns.append(column)
+        self.viable_history.append(self.compute_viable())
+        return self.is_accepted()
+    
+    def pop(self):
+        # Quita la última palabra y restaura el estado anterior
+        if not self.words:
+            raise IndexError("No hay palabras para quitar")
+        self.columns.pop()
+        self.viable_history.pop()
+        return self.words.pop()
+    
+    def compute_viable(self):
+        # viable[i] = no terminales A tales que words[i:] es prefijo de alguna cadena de A
+        n = len(self.words)
+        columns = self.columns
+        viable = [0] * n
+        for i in range(n - 1, -1, -1):
+            # A deriva words[i:] completo, o A -> B C con B = words[i..k] y C viable desde k+1
+            mask = columns[n - 1][i]
+            for k in range(i, n - 1):
+                left = columns[k][i]
+                if left and viable[k + 1]:
+                    mask |= self.combine(left, viable[k + 1])
+            # A -> B C con words[i:] dentro de B: ancestros por esquina izquierda
+            viable[i] = self.close_left_corner(mask)
+        return viable
+    
+    def is_accepted(self):
+        # La oración actual completa es derivable desde el símbolo inicial
+        if not self.words:
+            return False
+        return bool(self.columns[-1][0] & self.start_bit)
+    
+    def is_viable_prefix(self):
+        # Alguna continuación de la oración actual puede ser aceptada
+        if not self.words:
+            return bool(self.start_bit & self.productive)
+        return bool(self.viable_history[-1][0] & self.start_bit)
+    
+    def reset(self):
+        # Vuelve al estado inicial sin reconstruir los índices
+        self.words = []
+        self.columns = []
+        self.viable_history = []
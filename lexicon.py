@@ -0,0 +1,106 @@
+import re
+
+class Lexicon:
+    """Léxico de una gramática: preterminales por palabra y tokenizador con terminales de varias palabras"""
+    
+    # Un terminal con este separador representa varias palabras: N -> ice_cream reconoce "ice cream"
+    JOINER = '_'
+    
+    def __init__(self, grammar, unknown=None):
+        # unknown: terminal de la gramática que representa a las palabras desconocidas (por ejemplo
+        # '<unk>' con N -> <unk>); sin él, una palabra desconocida rechaza la oración sin llenar la tabla
+        self.grammar = grammar
+        self.build_index()
+        if unknown is not None and unknown not in self.index:
+            raise ValueError(f"La clase de respaldo {unknown} no es un terminal de la gramática")
+        self.unknown = unknown
+        self.build_tokenizer()
+    
+    def for_grammar(self, grammar):
+        # Léxico con la misma clase de respaldo para otra gramática (ver CYKParser.grammar)
+        return Lexicon(grammar, unknown=self.unknown)
+    
+    def build_index(self):
+        # index: terminal -> no terminales A con A -> terminal (vacío si solo aparece en reglas largas)
+        productions = self.grammar.productions
+        index = {}
+        for nt, prods in productions.items():
+            for prod in prods:
+                for symbol in prod:
+                    if symbol not in productions:
+                        index.setdefault(symbol, set())
+                if len(prod) == 1 and prod[0] not in productions:
+                    index[prod[0]].add(nt)
+        self.index = {word: frozenset(nts) for word, nts in index.items()}
+    
+    def build_tokenizer(self):
+        # Signos: terminales sin letras ni dígitos, que separan palabras aunque vayan pegados a ellas
+        # Terminales de varias palabras: trie por palabras, {palabra: {palabra: ..., None: terminal}}
+        punctuation = []
+        self.phrases = {}
+        for word in self.index:
+            if not any(char.isalnum() for char in word):
+                punctuation.append(word)
+            elif self.JOINER in word.strip(self.JOINER):
+                node = self.phrases
+                for part in word.split(self.JOINER):
+                    node = node.setdefault(part, {})
+                node[None] = word
+        if punctuation:
+            # Los signos más largos primero; una palabra se corta antes de cualquier carácter que
+            # empiece un signo, y ese carácter suelto queda como palabra si no forma un signo completo
+            signs = '|'.join(re.escape(sign) for sign in sorted(punctuation, key=len, reverse=True))
+            starts = re.escape(''.join(sorted({sign[0] for sign in punctuation})))
+            self.pattern = re.compile(f"{signs}|[^\\s{starts}]+|\\S")
+        else:
+            self.pattern = None
+    
+    def tokenize(self, sentence):
+        # Minúsculas, separación de signos y unión de la expresión de varias palabras más larga
+        text = sentence.lower()
+        pieces = self.pattern.findall(text) if self.pattern is not None else text.split()
+        phrases = self.phrases
+        if not phrases:
+            return pieces
+        words = []
+        i = 0
+        n = len(pieces)
+        while i < n:
+            node = phrases.get(pieces[i])
+            match = None
+            end = i + 1
+            k = i + 1
+            while node is not None:
+                if None in node:
+                    match = node[None]
+                    end = k
+                if k == n:
+                    break
+                node = node.get(pieces[k])
+                k += 1
+            if match is not None and end - i > 1:
+                words.append(match)
+                i = end
+            else:
+                words.append(pieces[i])
+                i += 1
+        return words
+    
+    def preterminals(self, word):
+        # No terminales A con A -> word, o los de la clase de respaldo si word es desconocida
+        nts = self.index.get(word)
+        if nts is None:
+            return self.index[self.unknown] if self.unknown is not None else frozenset()
+        return nts
+    
+    def lexical_words(self, words):
+        # Claves para llenar la diagonal: las palabras desconocidas se reemplazan por la clase de
+        # respaldo. None si alguna es desconocida y no hay respaldo (la oración no puede aceptarse)
+        index = self.index
+        if self.unknown is None:
+            for word in words:
+                if word not in index:
+                    return None
+            return words
+        unknown = self.unknown
+        return [word if word in index else unknown for word in words]
@@ -1,10 +1,20 @@
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import time
 from grammar import Grammar
 from grammar_simplifier import GrammarSimplifier
 from cyk_algorithm import CYKParser
+from grammar_cache import GrammarCache, DEFAULT_CACHE_DIR
+from compiled_grammar import compile_grammar, CompiledGrammar
+from metrics import MetricsCollector
+from parse_server import ParseServer
 
-def load_english_grammar():
-    """Carga la gramática del inglés del proyecto"""
-    grammar_text = """
+OUTPUT_BUFFER_SIZE = 1 << 20
+
+ENGLISH_GRAMMAR_TEXT = """
     S -> NP VP
     VP -> VP PP
     VP -> V NP
@@ -37,10 +47,13 @@ def load_english_grammar():
     N -> spoon
     Det -> a
     Det -> the
-    """
+"""
+
+def load_english_grammar():
+    """Carga la gramática del inglés del proyecto"""
     
     grammar = Grammar()
-    grammar.load_from_text(grammar_text)
+    grammar.load_from_text(ENGLISH_GRAMMAR_TEXT)
     return grammar
 
 def test_sentences():
@@ -61,7 +74,143 @@ def test_sentences():
     
     return valid_sentences, invalid_sentences
 
+def read_grammar_text(path):
+    # Lee el texto de una gramática con reglas 'A -> B C | a'
+    with open(path, encoding='utf-8') as f:
+        return f.read()
+
+def load_grammar_file(path):
+    # Carga una gramática desde un archivo de texto
+    grammar = Grammar()
+    grammar.load_from_text(read_grammar_text(path))
+    return grammar
+
+def iter_sentences(lines):
+    # Recorre las líneas de forma perezosa y devuelve (número de línea, oración) no vacías
+    for line_number, line in enumerate(lines, 1):
+        sentence = line.strip()
+        if sentence:
+            yield line_number, sentence
+
+def parse_corpus(parser, lines, out, with_tree=False, recognize_only=False, workers=1, chunksize=64,
+                 collapse_helpers=False):
+    # Analiza un corpus en streaming y escribe una línea JSON por oración
+    # La memoria no depende del tamaño del corpus: solo se retienen las oraciones en vuelo
+    in_flight = []
+    
+    def sentences():
+        for item in iter_sentences(lines):
+            in_flight.append(item)
+            yield item[1]
+    
+    total = accepted = 0
+    position = 0
+    results = parser.parse_many(sentences(), workers=workers, chunksize=chunksize,
+                                recognize_only=recognize_only, compact=True,
+                                collapse_helpers=collapse_helpers)
+    for result in results:
+        line_number, sentence = in_flight[position]
+        position += 1
+        # Compactar la lista de oraciones pendientes de vez en cuando
+        if position >= 4096:
+            del in_flight[:position]
+            position = 0
+        
+        record = {'line': line_number, 'sentence': sentence}
+        if recognize_only:
+            record['accepted'] = result
+        else:
+            is_valid, parse_time, parse_tree = result
+            record['accepted'] = is_valid
+            record['time'] = parse_time
+            if with_tree:
+                record['tree'] = parse_tree.to_bracketed() if parse_tree else None
+        out.write(json.dumps(record, ensure_ascii=False))
+        out.write('\n')
+        
+        total += 1
+        accepted += record['accepted']
+    
+    return total, accepted
+
+def load_parser(args, metrics=None, result_cache=0, fill_workers=1, arena_size=0):
+    # Convierte la gramática de --grammar (o la del inglés) a CNF, con o sin la caché en disco;
+    # con --compiled abre el artefacto de `python main.py compile` sin convertir nada
+    if args.compiled:
+        return CYKParser(CompiledGrammar(args.compiled), engine=args.engine, cache_size=result_cache,
+                         metrics=metrics, fill_workers=fill_workers, arena_size=arena_size)
+    grammar_text = read_grammar_text(args.grammar) if args.grammar else ENGLISH_GRAMMAR_TEXT
+    if args.no_cache:
+        grammar = Grammar()
+        grammar.load_from_text(grammar_text)
+        return CYKParser(GrammarSimplifier(grammar, metrics=metrics).simplify(), engine=args.engine,
+                         cache_size=result_cache, metrics=metrics, fill_workers=fill_workers,
+                         arena_size=arena_size)
+    return GrammarCache(args.cache_dir).get_parser(grammar_text, engine=args.engine, cache_size=result_cache,
+                                                   metrics=metrics, fill_workers=fill_workers,
+                                                   arena_size=arena_size)
+
+def run_parse_command(args):
+    # Modo no interactivo: carga y convierte la gramática una vez y analiza el corpus
+    # Los diagnósticos van al log (stderr) para no mezclarse con la salida JSONL
+    logging.basicConfig(level=args.log_level, format="%(levelname)s %(name)s: %(message)s", stream=sys.stderr)
+    start = time.perf_counter()
+    metrics = MetricsCollector() if args.metrics else None
+    parser = load_parser(args, metrics, args.result_cache, args.fill_workers, args.arena_size)
+    
+    if args.input == '-':
+        lines = sys.stdin
+    else:
+        lines = open(args.input, encoding='utf-8', buffering=OUTPUT_BUFFER_SIZE)
+    if args.out == '-':
+        out = sys.stdout
+    else:
+        out = open(args.out, 'w', encoding='utf-8', buffering=OUTPUT_BUFFER_SIZE)
+    
+    try:
+        total, accepted = parse_corpus(parser, lines, out, with_tree=args.tree,
+                                       recognize_only=args.recognize_only,
+                                       workers=args.workers, chunksize=args.chunksize,
+                                       collapse_helpers=args.collapse_helpers)
+    finally:
+        parser.close()
+        if lines is not sys.stdin:
+            lines.close()
+        if out is not sys.stdout:
+            out.close()
+        else:
+            out.flush()
+    
+    elapsed = time.perf_counter() - start
+    print(f"{total} oraciones analizadas, {accepted} aceptadas en {elapsed:.3f} s", file=sys.stderr)
+    if metrics is not None:
+        # Con --workers > 1 incluye lo medido en los procesos trabajadores
+        print(json.dumps(metrics.summary(), ensure_ascii=False, indent=2), file=sys.stderr)
+
+def run_compile_command(args):
+    # Convierte la gramática a CNF y la escribe como artefacto binario para --compiled
+    start = time.perf_counter()
+    compiled = CompiledGrammar(compile_grammar(load_parser(args).grammar, args.out))
+    elapsed = time.perf_counter() - start
+    print(f"{args.out}: {compiled.size()['productions']} reglas, {len(compiled.symbols)} no terminales, "
+          f"{compiled.num_terminals} terminales en {elapsed:.3f} s", file=sys.stderr)
+
+def run_serve_command(args):
+    # Servidor HTTP local: la gramática se convierte una sola vez y cada proceso del pool la recibe
+    # (una gramática compilada viaja como su ruta y cada proceso la abre con mmap)
+    logging.basicConfig(level=args.log_level, format="%(levelname)s %(name)s: %(message)s", stream=sys.stderr)
+    server = ParseServer(load_parser(args).grammar, host=args.host, port=args.port, workers=args.workers,
+                         engine=args.engine, batch_size=args.batch_size, batch_delay=args.batch_delay,
+                         timeout=args.timeout, max_length=args.max_length, arena_size=args.arena_size)
+    print(f"Escuchando en http://{args.host}:{args.port} (POST /parse, GET /stats)", file=sys.stderr)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+
 def main():
+    # La demo muestra en consola los pasos que el simplificador registra en el log
+    logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stdout)
     print("PROYECTO 2: ALGORITMO CYK")
     print("Teoría de la Computación 2024\n")
     
@@ -132,5 +281,71 @@ def main():
             if show_table == 's':
                 parser.print_table()
 
+def cli(argv=None):
+    # Punto de entrada: sin subcomando ejecuta la demo interactiva
+    arg_parser = argparse.ArgumentParser(description="Algoritmo CYK para gramáticas libres de contexto")
+    subcommands = arg_parser.add_subparsers(dest='command')
+    
+    parse_cmd = subcommands.add_parser('parse', help="analiza un corpus y escribe resultados JSONL")
+    parse_cmd.add_argument('--grammar', help="archivo de gramática (por defecto la gramática del inglés)")
+    parse_cmd.add_argument('--input', default='-', help="archivo con una oración por línea ('-' = stdin)")
+    parse_cmd.add_argument('--out', default='-', help="archivo JSONL de salida ('-' = stdout)")
+    parse_cmd.add_argument('--tree', action='store_true', help="incluir el árbol con corchetes")
+    parse_cmd.add_argument('--collapse-helpers', action='store_true',
+                           help="escribir el árbol en la gramática original (sin las variables de la CNF)")
+    parse_cmd.add_argument('--recognize-only', action='store_true', help="solo aceptar/rechazar, sin árbol ni tiempo")
+    parse_cmd.add_argument('--engine', choices=CYKParser.ENGINES, default='sets', help="motor del parser")
+    parse_cmd.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help="directorio de la caché de gramáticas CNF")
+    parse_cmd.add_argument('--no-cache', action='store_true', help="convertir la gramática sin usar la caché")
+    parse_cmd.add_argument('--compiled', help="gramática compilada con `compile` (reemplaza a --grammar)")
+    parse_cmd.add_argument('--result-cache', type=int, default=0,
+                           help="tamaño de la caché LRU de resultados por oración (0 = desactivada)")
+    parse_cmd.add_argument('--workers', type=int, default=1, help="procesos en paralelo")
+    parse_cmd.add_argument('--fill-workers', type=int, default=1,
+                           help="procesos para llenar la tabla de cada oración larga (con --workers 1)")
+    parse_cmd.add_argument('--arena-size', type=int, default=0,
+                           help="palabras para las que se reserva una tabla reutilizable del motor sets (0 = tabla nueva)")
+    parse_cmd.add_argument('--chunksize', type=int, default=64, help="oraciones por bloque enviado a cada proceso")
+    parse_cmd.add_argument('--metrics', action='store_true',
+                           help="medir tiempos por fase y contadores, y mostrarlos en stderr al terminar")
+    parse_cmd.add_argument('--log-level', default='WARNING', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
+                           help="nivel de log de los diagnósticos (INFO muestra los pasos del simplificador)")
+    
+    serve_cmd = subcommands.add_parser('serve', help="servidor HTTP local de análisis con lotes y pool de procesos")
+    serve_cmd.add_argument('--grammar', help="archivo de gramática (por defecto la gramática del inglés)")
+    serve_cmd.add_argument('--host', default='127.0.0.1', help="dirección en la que escuchar")
+    serve_cmd.add_argument('--port', type=int, default=8080, help="puerto en el que escuchar")
+    serve_cmd.add_argument('--workers', type=int, default=1, help="procesos de análisis")
+    serve_cmd.add_argument('--engine', choices=CYKParser.ENGINES, default='sets', help="motor del parser")
+    serve_cmd.add_argument('--batch-size', type=int, default=32, help="oraciones máximas por lote")
+    serve_cmd.add_argument('--batch-delay', type=float, default=0.002,
+                           help="segundos que se espera a completar un lote antes de despacharlo")
+    serve_cmd.add_argument('--timeout', type=float, default=5.0, help="segundos máximos por petición")
+    serve_cmd.add_argument('--max-length', type=int, default=100, help="palabras máximas por oración")
+    serve_cmd.add_argument('--arena-size', type=int, default=0,
+                           help="palabras para las que se reserva una tabla reutilizable del motor sets (0 = tabla nueva)")
+    serve_cmd.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help="directorio de la caché de gramáticas CNF")
+    serve_cmd.add_argument('--no-cache', action='store_true', help="convertir la gramática sin usar la caché")
+    serve_cmd.add_argument('--compiled', help="gramática compilada con `compile` (reemplaza a --grammar)")
+    serve_cmd.add_argument('--log-level', default='WARNING', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
+                           help="nivel de log de los diagnósticos")
+    
+    compile_cmd = subcommands.add_parser('compile', help="compila la gramática CNF a un archivo que se abre con mmap")
+    compile_cmd.add_argument('--grammar', help="archivo de gramática (por defecto la gramática del inglés)")
+    compile_cmd.add_argument('--out', required=True, help="archivo de salida (por ejemplo gramatica.cykg)")
+    compile_cmd.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help="directorio de la caché de gramáticas CNF")
+    compile_cmd.add_argument('--no-cache', action='store_true', help="convertir la gramática sin usar la caché")
+    compile_cmd.set_defaults(compiled=None, engine='sets')
+    
+    args = arg_parser.parse_args(argv)
+    if args.command == 'parse':
+        run_parse_command(args)
+    elif args.command == 'serve':
+        run_serve_command(args)
+    elif args.command == 'compile':
+        run_compile_command(args)
+    else:
+        main()
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    cli()
\ No newline at end of file
@@ -0,0 +1,81 @@
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+class MetricsCollector:
+    """Colector de métricas: tiempos por fase (ns), contadores y eventos de tamaño de gramática"""
+    
+    def __init__(self, callback=None):
+        # callback(tipo, nombre, valor) recibe cada medición a medida que se registra,
+        # por ejemplo para enviarla a un sistema de monitoreo externo
+        self.callback = callback
+        self.timings = {}   # fase -> [llamadas, ns totales, ns máximo]
+        self.counters = {}  # nombre -> total acumulado
+        self.events = []    # (nombre, dict de valores) en orden de registro
+    
+    def record_time(self, phase, elapsed_ns):
+        # Acumula la duración de una fase medida con time.perf_counter_ns
+        entry = self.timings.get(phase)
+        if entry is None:
+            self.timings[phase] = [1, elapsed_ns, elapsed_ns]
+        else:
+            entry[0] += 1
+            entry[1] += elapsed_ns
+            if elapsed_ns > entry[2]:
+                entry[2] = elapsed_ns
+        if self.callback is not None:
+            self.callback('time', phase, elapsed_ns)
+    
+    def increment(self, name, amount=1):
+        # Suma a un contador (celdas llenadas, sondeos de reglas, ...)
+        self.counters[name] = self.counters.get(name, 0) + amount
+        if self.callback is not None:
+            self.callback('counter', name, amount)
+    
+    def record(self, name, **values):
+        # Guarda un evento puntual, por ejemplo el tamaño de la gramática tras un paso
+        self.events.append((name, values))
+        if self.callback is not None:
+            self.callback('event', name, values)
+    
+    def merge(self, timings, counters):
+        # Suma tiempos ({fase: [llamadas, ns totales, ns máximo]}) y contadores medidos en otro
+        # colector, por ejemplo el de un proceso trabajador; no se reenvían al callback
+        for phase, (calls, total_ns, max_ns) in timings.items():
+            entry = self.timings.get(phase)
+            if entry is None:
+                self.timings[phase] = [calls, total_ns, max_ns]
+            else:
+                entry[0] += calls
+                entry[1] += total_ns
+                if max_ns > entry[2]:
+                    entry[2] = max_ns
+        for name, amount in counters.items():
+            self.counters[name] = self.counters.get(name, 0) + amount
+    
+    def reset(self):
+        # Descarta todo lo medido
+        self.timings.clear()
+        self.counters.clear()
+        self.events.clear()
+    
+    def summary(self):
+        # Resumen serializable a JSON: tiempos en milisegundos, contadores y eventos
+        timings = {}
+        for phase, (calls, total_ns, max_ns) in self.timings.items():
+            timings[phase] = {
+                'calls': calls,
+                'total_ms': total_ns / 1e6,
+                'mean_ms': total_ns / calls / 1e6,
+                'max_ms': max_ns / 1e6,
+            }
+        return {
+            'timings': timings,
+            'counters': dict(self.counters),
+            'events': [{'name': name, **values} for name, values in self.events],
+        }
+    
+    def log_summary(self, level=logging.INFO):
+        # Escribe el resumen en el log como una sola línea JSON
+        logger.log(level, "métricas: %s", json.dumps(self.summary(), ensure_ascii=False))
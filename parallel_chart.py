@@ -0,0 +1,146 @@
+from multiprocessing import Pool, resource_tracker, shared_memory
+
+# Índices de bits de la gramática en cada proceso trabajador (se copian una sola vez por proceso)
+worker_by_left = None
+worker_right_union = None
+# Oración actual del proceso: nombre de la memoria compartida, copia local de la tabla como lista de
+# enteros y longitud hasta la que esa copia está al día. El bloque compartido solo queda mapeado
+# mientras dura cada tarea, así que el unlink del proceso principal libera la memoria enseguida
+worker_state = None
+
+def init_fill_worker(by_left, right_union):
+    # Inicializa el proceso con binary_by_left y right_union del parser
+    global worker_by_left, worker_right_union
+    worker_by_left = by_left
+    worker_right_union = right_union
+
+def local_chart(name, size):
+    # Copia local de la tabla de la oración del bloque name; una oración nueva descarta la anterior
+    global worker_state
+    if worker_state is None or worker_state[0] != name:
+        worker_state = [name, [0] * size, 0]
+    return worker_state
+
+def diagonal_offsets(n, length):
+    # offsets[l] = posición de la primera celda de longitud l en el búfer triangular (orden de chart_index)
+    offsets = [0] * (length + 1)
+    for size in range(2, length + 1):
+        offsets[size] = offsets[size - 1] + n - size + 2
+    return offsets
+
+def read_cells(view, chart, cell_bytes, first, last):
+    # Copia las celdas [first, last) del búfer compartido a la lista de enteros
+    for index in range(first, last):
+        pos = index * cell_bytes
+        chart[index] = int.from_bytes(view[pos:pos + cell_bytes], 'little')
+
+def write_cells(view, cells, cell_bytes, first):
+    # Escribe máscaras consecutivas en el búfer compartido desde la celda first
+    for index, cell in enumerate(cells, first):
+        if cell:
+            pos = index * cell_bytes
+            view[pos:pos + cell_bytes] = cell.to_bytes(cell_bytes, 'little')
+
+def fill_cells(task):
+    # Calcula un rango de celdas de una antidiagonal dentro de un proceso trabajador
+    name, n, cell_bytes, length, start, stop = task
+    state = local_chart(name, n * (n + 1) // 2)
+    _, chart, synced = state
+    offsets = diagonal_offsets(n, length)
+    shared = shared_memory.SharedMemory(name=name)
+    try:
+        # Las antidiagonales anteriores ya están completas (barrera): traer las que falten a la copia local
+        if synced < length - 1:
+            read_cells(shared.buf, chart, cell_bytes, offsets[synced + 1] if synced else 0, offsets[length])
+            state[2] = length - 1
+        cells = fill_range(chart, offsets, length, start, stop, worker_by_left, worker_right_union)
+        write_cells(shared.buf, cells, cell_bytes, offsets[length] + start)
+    finally:
+        shared.close()
+    return any(cells)
+
+def fill_range(chart, offsets, length, start, stop, by_left, right_union):
+    # Máscaras de las celdas [i][i+length-1] con i en [start, stop), leyendo las longitudes menores de chart
+    cells = []
+    for i in range(start, stop):
+        cell = 0
+        for left_len in range(1, length):
+            left = chart[offsets[left_len] + i]
+            if not left:
+                continue
+            right = chart[offsets[length - left_len] + i + left_len]
+            if not right:
+                continue
+            # Paso binario: por cada B presente, intersectar sus C con la celda derecha
+            while left:
+                low = left & -left
+                left ^= low
+                b = low.bit_length() - 1
+                if right & right_union[b]:
+                    for a_bit, c_mask in by_left[b]:
+                        if right & c_mask:
+                            cell |= a_bit
+        cells.append(cell)
+    return cells
+
+class ParallelChartFiller:
+    """Llena la tabla de bits de una oración repartiendo cada antidiagonal entre procesos"""
+    
+    # Antidiagonales con menos divisiones que esto (celdas x divisiones) se calculan en el proceso
+    # principal: repartirlas cuesta más que calcularlas
+    MIN_PARALLEL_WORK = 2000
+    
+    def __init__(self, by_left, right_union, num_symbols, workers):
+        # El pool vive mientras el filler exista; cada oración usa su propio bloque de memoria compartida
+        self.by_left = by_left
+        self.right_union = right_union
+        # Celdas de ancho fijo, en palabras de 64 bits
+        self.cell_bytes = max(1, (num_symbols + 63) // 64) * 8
+        self.workers = workers
+        # Los trabajadores heredan el resource_tracker del proceso principal, que es quien borra cada bloque
+        resource_tracker.ensure_running()
+        self.pool = Pool(workers, initializer=init_fill_worker, initargs=(by_left, right_union))
+    
+    def fill(self, chart, n, early_stop=False, can_stop_early=None):
+        # chart: búfer triangular de CYKParser con la diagonal principal ya calculada; se completa en el lugar
+        # Devuelve la última longitud calculada, como fill_bitset_spans
+        cell_bytes = self.cell_bytes
+        shared = shared_memory.SharedMemory(create=True, size=len(chart) * cell_bytes)
+        try:
+            view = shared.buf
+            write_cells(view, chart[:n], cell_bytes, 0)
+            
+            offsets = diagonal_offsets(n, n)
+            rows = n
+            last_nonempty = 1
+            for length in range(2, n + 1):
+                count = n - length + 1
+                base = offsets[length]
+                if count * (length - 1) < self.MIN_PARALLEL_WORK:
+                    cells = fill_range(chart, offsets, length, 0, count, self.by_left, self.right_union)
+                    chart[base:base + count] = cells
+                    write_cells(view, cells, cell_bytes, base)
+                    row_nonempty = any(cells)
+                else:
+                    # pool.map espera a todos los rangos: es la barrera entre antidiagonales
+                    parts = min(self.workers, count)
+                    bounds = [count * k // parts for k in range(parts + 1)]
+                    tasks = [(shared.name, n, cell_bytes, length, bounds[k], bounds[k + 1])
+                             for k in range(parts)]
+                    row_nonempty = any(self.pool.map(fill_cells, tasks))
+                    read_cells(view, chart, cell_bytes, base, base + count)
+                
+                if row_nonempty:
+                    last_nonempty = length
+                elif early_stop and can_stop_early(length, last_nonempty):
+                    rows = length
+                    break
+        finally:
+            shared.close()
+            shared.unlink()
+        return rows
+    
+    def close(self):
+        # Termina los procesos trabajadores (ninguno conserva bloques mapeados: fill_cells cierra el suyo)
+        self.pool.terminate()
+        self.pool.join()
@@ -0,0 +1,117 @@
+class ParseForest:
+    """Bosque de análisis compartido y empaquetado construido desde la tabla CYK"""
+    
+    def __init__(self, parser, sentence):
+        # Llena la tabla una vez; cada nodo (i, j, A) se guarda una sola vez aunque
+        # aparezca en muchos árboles, así que la memoria es polinomial
+        self.parser = parser
+        self.words = parser.build_chart(sentence)
+        self.start_symbol = parser.grammar.start_symbol
+        # nodes[(i, j, A)] = lista de alternativas empaquetadas (B, C, k) para A -> B C
+        self.nodes = {}
+        self.counts = {}
+        
+        n = len(self.words)
+        if n and self.start_symbol in parser.get_cell(0, n-1):
+            self.root = (0, n-1, self.start_symbol)
+            self.build_nodes()
+            self.count_derivations()
+        else:
+            self.root = None
+    
+    def build_nodes(self):
+        # Recorre desde la raíz y conserva solo los nodos que participan en algún árbol
+        parser = self.parser
+        cells = {}
+        
+        def cell(i, j):
+            if (i, j) not in cells:
+                cells[(i, j)] = sorted(parser.get_cell(i, j))
+            return cells[(i, j)]
+        
+        pending = [self.root]
+        self.nodes[self.root] = None
+        while pending:
+            i, j, symbol = pending.pop()
+            alternatives = []
+            if i < j:
+                for k in range(i, j):
+                    for B in cell(i, k):
+                        for C in cell(k+1, j):
+                            if symbol in parser.binary_index.get((B, C), ()):
+                                alternatives.append((B, C, k))
+                                for child in ((i, k, B), (k+1, j, C)):
+                                    if child not in self.nodes:
+                                        self.nodes[child] = None
+                                        pending.append(child)
+            self.nodes[(i, j, symbol)] = alternatives
+    
+    def count_derivations(self):
+        # Programación dinámica por longitud de fragmento: número exacto de derivaciones por nodo
+        counts = self.counts
+        for node in sorted(self.nodes, key=lambda node: node[1] - node[0]):
+            i, j, symbol = node
+            if i == j:
+                counts[node] = 1
+                continue
+            total = 0
+            for B, C, k in self.nodes[node]:
+                total += counts[(i, k, B)] * counts[(k+1, j, C)]
+            counts[node] = total
+    
+    def count(self, i=None, j=None, symbol=None):
+        # Número de derivaciones de symbol sobre words[i..j] (por defecto, de toda la oración)
+        if i is None:
+            return self.counts.get(self.root, 0) if self.root else 0
+        return self.counts.get((i, j, symbol), 0)
+    
+    def tree_at(self, index):
+        # Devuelve el árbol número index (0 <= index < count()) sin enumerar los anteriores
+        if self.root is None or not 0 <= index < self.count():
+            raise IndexError("Índice de árbol fuera de rango")
+        return self.unrank(self.root, index)
+    
+    def unrank(self, node, index):
+        # Elige la alternativa y los índices de los hijos usando los conteos de derivaciones
+        # Pila explícita de (nodo, índice, lista de hijos del padre): sin límite de recursión
+        root = {'children': []}
+        stack = [(node, index, root['children'])]
+        while stack:
+            node, index, siblings = stack.pop()
+            i, j, symbol = node
+            if i == j:
+                siblings.append({
+                    'symbol': symbol,
+                    'word': self.words[i],
+                    'children': []
+                })
+                continue
+            
+            for B, C, k in self.nodes[node]:
+                left, right = (i, k, B), (k+1, j, C)
+                right_count = self.counts[right]
+                subtotal = self.counts[left] * right_count
+                if index < subtotal:
+                    break
+                index -= subtotal
+            else:
+                raise IndexError("Índice de árbol fuera de rango")
+            left_index, right_index = divmod(index, right_count)
+            tree = {'symbol': symbol, 'children': []}
+            siblings.append(tree)
+            # El hijo derecho se apila primero para agregar el izquierdo antes
+            stack.append((right, right_index, tree['children']))
+            stack.append((left, left_index, tree['children']))
+        return root['children'][0]
+    
+    def trees(self, limit=None):
+        # Genera los árboles de forma perezosa, uno a la vez (los primeros limit si se indica)
+        total = self.count()
+        if limit is not None:
+            total = min(total, limit)
+        for index in range(total):
+            yield self.tree_at(index)
+    
+    def size(self):
+        # Tamaño del bosque: (nodos, alternativas empaquetadas)
+        return len(self.nodes), sum(len(alternatives) for alternatives in self.nodes.values())
@@ -0,0 +1,251 @@
+import asyncio
+import json
+import pickle
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from cyk_algorithm import CYKParser, init_worker, parse_chunk
+
+# Cuerpo máximo de una petición HTTP (bytes)
+MAX_BODY_SIZE = 1 << 20
+
+STATUS_TEXT = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+               413: 'Payload Too Large', 503: 'Service Unavailable', 504: 'Gateway Timeout'}
+
+def percentile(sorted_values, fraction):
+    # Percentil por rango más cercano de una lista ya ordenada (0 si está vacía)
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+async def http_request(host, port, method, path, payload=None):
+    # Cliente HTTP mínimo para probar el servidor en localhost: devuelve (estado, JSON de la respuesta)
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        body = json.dumps(payload).encode('utf-8') if payload is not None else b''
+        writer.write(f"{method} {path} HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n"
+                     f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n".encode('latin-1') + body)
+        await writer.drain()
+        response = await reader.read()
+    finally:
+        writer.close()
+    head, _, body = response.partition(b'\r\n\r\n')
+    status = int(head.split(b' ', 2)[1])
+    return status, json.loads(body) if body else None
+
+class ParseServer:
+    """Servidor asyncio de análisis por HTTP: agrupa las peticiones en lotes para un pool de procesos"""
+    
+    def __init__(self, cnf_grammar, host='127.0.0.1', port=0, workers=1, engine='sets', batch_size=32,
+                 batch_delay=0.002, timeout=5.0, max_length=100, max_queue=1024, lexicon=None, prefilter=None,
+                 arena_size=0):
+        # port=0 elige un puerto libre (ver self.port tras start). Un lote sale cuando junta batch_size
+        # oraciones o cuando pasan batch_delay segundos desde la primera; hay a lo sumo un lote en
+        # vuelo por proceso, así que con carga los lotes crecen solos
+        if workers < 1 or batch_size < 1 or max_queue < 1:
+            raise ValueError("workers, batch_size y max_queue deben ser positivos")
+        if timeout <= 0 or max_length < 1:
+            raise ValueError("timeout y max_length deben ser positivos")
+        self.grammar = cnf_grammar
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.engine = engine
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self.timeout = timeout
+        self.max_length = max_length
+        self.max_queue = max_queue
+        self.lexicon = lexicon
+        self.prefilter = prefilter
+        self.arena_size = arena_size
+        self.server = None
+        self.executor = None
+        self.queue = None
+        self.batcher = None
+        self.batch_slots = None
+        self.running_batches = set()
+        
+        # Estadísticas: latencias de las últimas peticiones completadas (segundos) y contadores
+        self.latencies = deque(maxlen=10000)
+        self.counters = {'requests': 0, 'completed': 0, 'timeouts': 0, 'too_long': 0, 'busy': 0,
+                         'errors': 0, 'batches': 0, 'batched_sentences': 0}
+        self.max_queue_depth = 0
+        self.in_flight = 0
+    
+    async def start(self):
+        # Crea el pool (cada proceso construye su CYKParser una sola vez) y empieza a escuchar
+        grammar_bytes = pickle.dumps(self.grammar, protocol=pickle.HIGHEST_PROTOCOL)
+        initargs = (grammar_bytes, self.engine, 'all', 0, CYKParser.LONG_INPUT_THRESHOLD, self.lexicon,
+                    self.prefilter, self.arena_size, False, ('parse', {}))
+        self.executor = ProcessPoolExecutor(self.workers, initializer=init_worker, initargs=initargs)
+        # Los procesos se crean ahora, antes de aceptar conexiones: si se crearan con fork al primer lote
+        # heredarían los sockets abiertos y el cliente no vería el cierre de su conexión
+        await asyncio.get_running_loop().run_in_executor(self.executor, parse_chunk, [])
+        self.queue = asyncio.Queue(self.max_queue)
+        self.batch_slots = asyncio.Semaphore(self.workers)
+        self.batcher = asyncio.ensure_future(self.batch_loop())
+        self.server = await asyncio.start_server(self.handle_connection, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+    
+    async def close(self):
+        # Deja de aceptar conexiones y termina el pool
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+        if self.batcher is not None:
+            self.batcher.cancel()
+            self.batcher = None
+        for task in list(self.running_batches):
+            task.cancel()
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            self.executor = None
+    
+    async def serve_forever(self):
+        # Punto de entrada de `python main.py serve`
+        await self.start()
+        try:
+            await self.server.serve_forever()
+        finally:
+            await self.close()
+    
+    async def batch_loop(self):
+        # Junta peticiones de la cola en lotes y los despacha cuando hay un proceso libre
+        queue = self.queue
+        while True:
+            await self.batch_slots.acquire()
+            first = await queue.get()
+            if queue.qsize() + 1 < self.batch_size and self.batch_delay:
+                await asyncio.sleep(self.batch_delay)
+            batch = [first]
+            while len(batch) < self.batch_size and not queue.empty():
+                batch.append(queue.get_nowait())
+            # Las peticiones que vencieron en la cola ya respondieron 504: no se analizan
+            batch = [item for item in batch if not item[1].done()]
+            if not batch:
+                self.batch_slots.release()
+                continue
+            task = asyncio.ensure_future(self.run_batch(batch))
+            self.running_batches.add(task)
+            task.add_done_callback(self.running_batches.discard)
+    
+    async def run_batch(self, batch):
+        # Analiza un lote en el pool sin bloquear el bucle de eventos y entrega cada resultado
+        self.in_flight += len(batch)
+        self.counters['batches'] += 1
+        self.counters['batched_sentences'] += len(batch)
+        try:
+            loop = asyncio.get_running_loop()
+            results = await loop.run_in_executor(self.executor, parse_chunk, [item[0] for item in batch])
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+        except Exception as error:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(error)
+        finally:
+            self.in_flight -= len(batch)
+            self.batch_slots.release()
+    
+    async def parse(self, sentence):
+        # Encola una oración y espera su resultado: (estado HTTP, respuesta JSON)
+        self.counters['requests'] += 1
+        if len(sentence.split()) > self.max_length:
+            self.counters['too_long'] += 1
+            return 413, {'error': f"La oración supera el máximo de {self.max_length} palabras"}
+        start = time.perf_counter()
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((sentence, future))
+        except asyncio.QueueFull:
+            self.counters['busy'] += 1
+            return 503, {'error': "Cola llena, reintentar más tarde"}
+        self.max_queue_depth = max(self.max_queue_depth, self.queue.qsize())
+        try:
+            # El proceso no se interrumpe: al vencer, el resultado simplemente se descarta
+            accepted, parse_time, tree = await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            self.counters['timeouts'] += 1
+            return 504, {'error': f"Tiempo de espera agotado ({self.timeout} s)"}
+        except Exception as error:
+            self.counters['errors'] += 1
+            return 503, {'error': f"Error del proceso de análisis: {error}"}
+        self.latencies.append(time.perf_counter() - start)
+        self.counters['completed'] += 1
+        return 200, {'accepted': accepted, 'time': parse_time, 'tree': tree}
+    
+    def stats(self):
+        # Contadores, profundidad de la cola y percentiles de latencia (ms) de las últimas peticiones
+        latencies = sorted(self.latencies)
+        batches = self.counters['batches']
+        return {
+            **self.counters,
+            'queue_depth': self.queue.qsize() if self.queue is not None else 0,
+            'max_queue_depth': self.max_queue_depth,
+            'in_flight': self.in_flight,
+            'mean_batch_size': self.counters['batched_sentences'] / batches if batches else 0.0,
+            'latency_ms': {name: percentile(latencies, fraction) * 1000
+                           for name, fraction in [('p50', 0.5), ('p90', 0.9), ('p99', 0.99), ('max', 1.0)]},
+        }
+    
+    async def route(self, method, path, body):
+        # POST /parse {"sentence": "..."} -> resultado; GET /stats -> estadísticas
+        if path == '/stats':
+            if method != 'GET':
+                return 405, {'error': "Usar GET"}
+            return 200, self.stats()
+        if path != '/parse':
+            return 404, {'error': f"Ruta desconocida: {path}"}
+        if method != 'POST':
+            return 405, {'error': "Usar POST"}
+        try:
+            sentence = json.loads(body)['sentence']
+        except (ValueError, KeyError, TypeError):
+            return 400, {'error': "Se esperaba un JSON {\"sentence\": \"...\"}"}
+        if not isinstance(sentence, str):
+            return 400, {'error': "sentence debe ser un texto"}
+        return await self.parse(sentence)
+    
+    async def handle_connection(self, reader, writer):
+        # HTTP/1.1 mínimo con conexiones persistentes: una petición tras otra en la misma conexión
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                parts = request_line.decode('latin-1').split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                try:
+                    length = int(headers.get('content-length', 0))
+                except ValueError:
+                    length = -1
+                if len(parts) != 3 or not 0 <= length <= MAX_BODY_SIZE:
+                    await self.respond(writer, 400, {'error': "Petición HTTP inválida"}, False)
+                    break
+                body = await reader.readexactly(length) if length else b''
+                status, payload = await self.route(parts[0], parts[1], body)
+                keep_alive = headers.get('connection', '').lower() != 'close' and parts[2] == 'HTTP/1.1'
+                await self.respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+    
+    async def respond(self, writer, status, payload, keep_alive):
+        # Escribe una respuesta JSON
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        head = (f"HTTP/1.1 {status} {STATUS_TEXT[status]}\r\nContent-Type: application/json; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode('latin-1') + body)
+        await writer.drain()
@@ -0,0 +1,235 @@
+import json
+from array import array
+
+class ParseTree:
+    """Árbol de análisis compacto: arreglos planos en preorden de (símbolo, inicio, fin)"""
+    
+    __slots__ = ('words', 'symbols', 'starts', 'ends')
+    
+    def __init__(self, words, symbols=None, starts=None, ends=None):
+        # Un nodo es hoja (sobre words[inicio], con inicio == fin) si el siguiente en preorden no empieza
+        # dentro de su fragmento; así una cadena unitaria sobre una palabra, (NP (N fork)), repite el
+        # fragmento [k, k] en sus nodos internos. Símbolo None = terminal suelto
+        self.words = words
+        self.symbols = symbols if symbols is not None else []
+        self.starts = starts if starts is not None else array('i')
+        self.ends = ends if ends is not None else array('i')
+    
+    def add_node(self, symbol, start, end):
+        # Agrega un nodo en preorden
+        self.symbols.append(symbol)
+        self.starts.append(start)
+        self.ends.append(end)
+    
+    def __len__(self):
+        return len(self.symbols)
+    
+    def __eq__(self, other):
+        if not isinstance(other, ParseTree):
+            return NotImplemented
+        return (self.words == other.words and self.symbols == other.symbols
+                and self.starts == other.starts and self.ends == other.ends)
+    
+    def __getstate__(self):
+        return (self.words, self.symbols, self.starts, self.ends)
+    
+    def __setstate__(self, state):
+        self.words, self.symbols, self.starts, self.ends = state
+    
+    def copy(self):
+        # Copia independiente de los arreglos
+        return ParseTree(self.words, list(self.symbols), array('i', self.starts), array('i', self.ends))
+    
+    def is_leaf(self, index):
+        # El nodo index es hoja si el siguiente en preorden no es su primer hijo
+        return index + 1 == len(self.starts) or self.starts[index + 1] > self.ends[index]
+    
+    def children(self):
+        # Índices de los hijos de cada nodo
+        children = [[] for _ in self.symbols]
+        open_nodes = []
+        for index, start in enumerate(self.starts):
+            while open_nodes and self.ends[open_nodes[-1]] < start:
+                open_nodes.pop()
+            if open_nodes:
+                children[open_nodes[-1]].append(index)
+            if not self.is_leaf(index):
+                open_nodes.append(index)
+        return children
+    
+    def collapse(self, grammar, lexical_words=None):
+        # Reconstruye el árbol en la gramática original a partir de la procedencia que registró
+        # GrammarSimplifier: quita las auxiliares de la CNF (X1 -> s X2 se aplana en el padre y X -> a
+        # queda como terminal suelto), repone las cadenas unitarias A -> B -> ... eliminadas y vuelve a
+        # anidar la recursión izquierda: VP -> α X0, X0 -> β1 X0, X0 -> β2 da (VP (VP (VP α) β1) β2)
+        # lexical_words: claves de la diagonal si no son las palabras (clase de respaldo del léxico)
+        symbols = self.symbols
+        starts = self.starts
+        ends = self.ends
+        helpers = grammar.helper_symbols
+        chains = grammar.unit_chains
+        recursion_helpers = grammar.left_recursion_helpers
+        lexical = lexical_words if lexical_words is not None else self.words
+        children = self.children()
+        
+        def parts(index):
+            # Hijos de index en la regla original: ('node', i) o ('word', k) para un terminal suelto
+            result = []
+            pending = children[index][::-1]
+            while pending:
+                child = pending.pop()
+                if symbols[child] in helpers and symbols[child] not in recursion_helpers:
+                    if children[child]:
+                        pending.extend(children[child][::-1])
+                    else:
+                        result.append(('word', starts[child]))
+                else:
+                    result.append(('node', child))
+            return result
+        
+        def derivation(index):
+            # (cadena unitaria, partes) de la regla de la CNF usada en index
+            if children[index]:
+                key = (symbols[index], tuple(symbols[child] for child in children[index]))
+                return chains.get(key, ()), parts(index)
+            return chains.get((symbols[index], (lexical[starts[index]],)), ()), []
+        
+        tree = ParseTree(self.words)
+        # Pila de operaciones en orden inverso: ('emit', (símbolo, inicio, fin)), ('node', i) o ('word', k)
+        stack = [('node', 0)] if symbols else []
+        while stack:
+            kind, value = stack.pop()
+            if kind == 'emit':
+                tree.add_node(*value)
+                continue
+            if kind == 'word':
+                tree.add_node(None, value, value)
+                continue
+            start, end = starts[value], ends[value]
+            chain, items = derivation(value)
+            ops = [('emit', (symbols[value], start, end))]
+            ops.extend(('emit', (symbol, start, end)) for symbol in chain)
+            last = items[-1][1] if items else None
+            if last is not None and items[-1][0] == 'node' and symbols[last] in recursion_helpers:
+                # Cada X0 aporta un β; el no terminal original se anida una vez por β
+                alpha = items[:-1]
+                betas = []
+                alpha_end = starts[last] - 1
+                while last is not None:
+                    helper_chain, helper_items = derivation(last)
+                    following = None
+                    if (helper_items and helper_items[-1][0] == 'node'
+                            and symbols[helper_items[-1][1]] in recursion_helpers):
+                        following = helper_items.pop()[1]
+                    beta_end = starts[following] - 1 if following is not None else ends[last]
+                    beta = [('emit', (symbol, starts[last], beta_end)) for symbol in helper_chain]
+                    if not helper_items and not helper_chain:
+                        beta.append(('word', starts[last]))
+                    beta.extend(helper_items)
+                    betas.append((beta_end, beta))
+                    last = following
+                symbol = chain[-1] if chain else symbols[value]
+                for beta_end, _ in reversed(betas[:-1]):
+                    ops.append(('emit', (symbol, start, beta_end)))
+                ops.append(('emit', (symbol, start, alpha_end)))
+                ops.extend(alpha)
+                for _, beta in betas:
+                    ops.extend(beta)
+            else:
+                ops.extend(items)
+            stack.extend(reversed(ops))
+        return tree
+    
+    @property
+    def symbol(self):
+        # Símbolo de la raíz
+        return self.symbols[0] if self.symbols else None
+    
+    def nodes(self):
+        # Recorre los nodos en preorden como (profundidad, símbolo, inicio, fin, hoja)
+        # Los hijos están dentro del fragmento del padre, así que la pila de fines basta
+        open_ends = []
+        for index, (symbol, start, end) in enumerate(zip(self.symbols, self.starts, self.ends)):
+            while open_ends and open_ends[-1] < start:
+                open_ends.pop()
+            leaf = self.is_leaf(index)
+            yield len(open_ends), symbol, start, end, leaf
+            if not leaf:
+                open_ends.append(end)
+    
+    def to_bracketed(self):
+        # Serializa con corchetes: (S (NP she) (VP ...)); los terminales sueltos van sin paréntesis
+        parts = []
+        open_ends = []
+        for index, (symbol, start, end) in enumerate(zip(self.symbols, self.starts, self.ends)):
+            while open_ends and open_ends[-1] < start:
+                open_ends.pop()
+                parts.append(")")
+            if parts:
+                parts.append(" ")
+            if not self.is_leaf(index):
+                parts.append(f"({symbol}")
+                open_ends.append(end)
+            elif symbol is None:
+                parts.append(self.words[start])
+            else:
+                parts.append(f"({symbol} {self.words[start]})")
+        parts.append(")" * len(open_ends))
+        return "".join(parts)
+    
+    def to_json(self, flat=False):
+        # Serializa a JSON: anidado como los árboles de dicts, o plano con los arreglos en preorden
+        if flat:
+            return json.dumps({
+                'words': self.words,
+                'symbols': self.symbols,
+                'starts': self.starts.tolist(),
+                'ends': self.ends.tolist()
+            }, ensure_ascii=False)
+        
+        # Los símbolos se repiten mucho: se codifican una sola vez
+        encoded = {}
+        for symbol in set(self.symbols):
+            encoded[symbol] = json.dumps(symbol, ensure_ascii=False)
+        
+        parts = []
+        open_ends = []
+        need_comma = False
+        for index, (symbol, start, end) in enumerate(zip(self.symbols, self.starts, self.ends)):
+            while open_ends and open_ends[-1] < start:
+                open_ends.pop()
+                parts.append("]}")
+                need_comma = True
+            if need_comma:
+                parts.append(", ")
+            name = encoded[symbol]
+            if not self.is_leaf(index):
+                parts.append(f'{{"symbol": {name}, "children": [')
+                open_ends.append(end)
+                need_comma = False
+            else:
+                word = json.dumps(self.words[start], ensure_ascii=False)
+                parts.append(f'{{"symbol": {name}, "word": {word}, "children": []}}')
+                need_comma = True
+        parts.append("]}" * len(open_ends))
+        return "".join(parts)
+    
+    def to_dict(self):
+        # Convierte al formato de dicts anidados de CYKParser.build_parse_tree, sin recursión
+        root = None
+        stack = []  # (fin, nodo)
+        for index, (symbol, start, end) in enumerate(zip(self.symbols, self.starts, self.ends)):
+            while stack and stack[-1][0] < start:
+                stack.pop()
+            leaf = self.is_leaf(index)
+            if leaf:
+                node = {'symbol': symbol, 'word': self.words[start], 'children': []}
+            else:
+                node = {'symbol': symbol, 'children': []}
+            if stack:
+                stack[-1][1]['children'].append(node)
+            else:
+                root = node
+            if not leaf:
+                stack.append((end, node))
+        return root
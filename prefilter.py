@@ -0,0 +1,143 @@
+class SentenceFilter:
+    """Filtros baratos que rechazan oraciones antes de llenar la tabla CYK (sin falsos rechazos)"""
+    
+    CHECKS = ('vocabulary', 'first_last', 'bigram')
+    
+    def __init__(self, cnf_grammar, bigrams=False):
+        # Solo usa condiciones necesarias de la aceptación: toda palabra tiene preterminal, la primera
+        # está en FIRST(S), la última en LAST(S) y, con bigrams=True, cada par de palabras vecinas
+        # puede quedar a ambos lados de la división de alguna regla A -> B C
+        self.grammar = cnf_grammar
+        self.bigrams = bigrams
+        self.build_masks()
+        self.checked = 0
+        self.rejected = {check: 0 for check in self.CHECKS}
+    
+    def for_grammar(self, cnf_grammar):
+        # Filtro con las mismas opciones para otra gramática; conserva los contadores acumulados
+        prefilter = SentenceFilter(cnf_grammar, bigrams=self.bigrams)
+        prefilter.merge_stats(self.checked, self.rejected)
+        return prefilter
+    
+    def build_masks(self):
+        # Máscaras de bits sobre los no terminales (mismo orden que CYKParser.symbols)
+        productions = self.grammar.productions
+        symbols = sorted(productions)
+        ids = {nt: i for i, nt in enumerate(symbols)}
+        self.start_bit = 1 << ids[self.grammar.start_symbol] if self.grammar.start_symbol in ids else 0
+        
+        # word_masks[palabra] = preterminales; left_parents[B] = A con A -> B C; right_parents[C] = A
+        self.word_masks = {}
+        left_parents = [0] * len(symbols)
+        right_parents = [0] * len(symbols)
+        # right_sides[B] = C con alguna regla A -> B C
+        self.right_sides = [0] * len(symbols)
+        for nt, prods in productions.items():
+            a_bit = 1 << ids[nt]
+            for prod in prods:
+                if len(prod) == 1:
+                    self.word_masks[prod[0]] = self.word_masks.get(prod[0], 0) | a_bit
+                elif len(prod) == 2 and prod[0] in ids and prod[1] in ids:
+                    left_parents[ids[prod[0]]] |= a_bit
+                    right_parents[ids[prod[1]]] |= a_bit
+                    self.right_sides[ids[prod[0]]] |= 1 << ids[prod[1]]
+        
+        # Cierres reflexivos y transitivos: left_ancestors[B] = no terminales que pueden empezar con B
+        self.left_ancestors = self.closure(left_parents)
+        self.right_ancestors = self.closure(right_parents)
+        # Máscaras por palabra: no terminales que pueden empezar (first) o terminar (last) con ella
+        self.first_masks = {}
+        self.last_masks = {}
+        # Por máscara de last: los C que pueden seguir a la palabra (se calcula al primer uso)
+        self.follow_cache = {}
+    
+    @staticmethod
+    def closure(parents):
+        # ancestors[B] = B más todos los que alcanzan B siguiendo parents (punto fijo)
+        ancestors = [parents[b] | (1 << b) for b in range(len(parents))]
+        changed = True
+        while changed:
+            changed = False
+            for b in range(len(ancestors)):
+                mask = ancestors[b]
+                extended = mask
+                rest = mask & ~(1 << b)
+                while rest:
+                    low = rest & -rest
+                    rest ^= low
+                    extended |= ancestors[low.bit_length() - 1]
+                if extended != mask:
+                    ancestors[b] = extended
+                    changed = True
+        return ancestors
+    
+    def spread(self, word, masks, ancestors):
+        # Unión de los ancestros de los preterminales de word, memorizada por palabra
+        mask = masks.get(word)
+        if mask is None:
+            mask = 0
+            rest = self.word_masks[word]
+            while rest:
+                low = rest & -rest
+                rest ^= low
+                mask |= ancestors[low.bit_length() - 1]
+            masks[word] = mask
+        return mask
+    
+    def follow_mask(self, last_mask):
+        # No terminales C que pueden empezar justo después de una palabra con esa máscara de last
+        follow = self.follow_cache.get(last_mask)
+        if follow is None:
+            follow = 0
+            rest = last_mask
+            while rest:
+                low = rest & -rest
+                rest ^= low
+                follow |= self.right_sides[low.bit_length() - 1]
+            self.follow_cache[last_mask] = follow
+        return follow
+    
+    def check(self, words):
+        # Devuelve None si la oración puede ser aceptada, o el nombre del filtro que la descarta
+        self.checked += 1
+        reason = self.find_rejection(words)
+        if reason is not None:
+            self.rejected[reason] += 1
+        return reason
+    
+    def find_rejection(self, words):
+        # Aplica los filtros de más barato a más caro
+        word_masks = self.word_masks
+        for word in words:
+            if word not in word_masks:
+                return 'vocabulary'
+        if len(words) == 1:
+            return None if word_masks[words[0]] & self.start_bit else 'first_last'
+        if not self.spread(words[0], self.first_masks, self.left_ancestors) & self.start_bit:
+            return 'first_last'
+        if not self.spread(words[-1], self.last_masks, self.right_ancestors) & self.start_bit:
+            return 'first_last'
+        if self.bigrams:
+            # Dos palabras vecinas quedan separadas por la división de su ancestro común más bajo
+            # A -> B C: la primera termina a B y la segunda empieza a C
+            for k in range(len(words) - 1):
+                last = self.spread(words[k], self.last_masks, self.right_ancestors)
+                if not self.follow_mask(last) & self.spread(words[k + 1], self.first_masks, self.left_ancestors):
+                    return 'bigram'
+        return None
+    
+    def merge_stats(self, checked, rejected):
+        # Suma lo revisado por otra copia del filtro (la de un proceso trabajador de parse_many)
+        self.checked += checked
+        for reason, count in rejected.items():
+            self.rejected[reason] += count
+    
+    def stats(self):
+        # Oraciones revisadas y descartadas por cada filtro (cada una es un análisis evitado)
+        avoided = sum(self.rejected.values())
+        return {
+            'checked': self.checked,
+            'avoided': avoided,
+            'rejected': dict(self.rejected),
+            'avoided_rate': avoided / self.checked if self.checked else 0.0,
+        }
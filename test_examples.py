@@ -1,6 +1,29 @@
-from main import load_english_grammar, test_sentences
+import asyncio
+import contextlib
+import io
+import json
+import os
+import pickle
+import random
+import sys
+import tempfile
+import traceback
+from main import load_english_grammar, test_sentences, parse_corpus, ENGLISH_GRAMMAR_TEXT
+from grammar_cache import GrammarCache
+from incremental_cyk import IncrementalCYKParser
+from parse_forest import ParseForest
+from grammar import Grammar
 from grammar_simplifier import GrammarSimplifier
 from cyk_algorithm import CYKParser
+from earley_parser import EarleyParser
+from lexicon import Lexicon
+from prefilter import SentenceFilter
+from parse_server import ParseServer, http_request
+from compiled_grammar import compile_grammar, CompiledGrammar
+from differential import DifferentialHarness, rule_set, tree_error
+from metrics import MetricsCollector
+from benchmark import generate_synthetic_grammar, long_english_sentence
+from benchmark_suite import build_sentences
 
 def run_comprehensive_tests():
     """Ejecuta pruebas exhaustivas del sistema"""
@@ -61,6 +84,747 @@ def run_comprehensive_tests():
     
     return accuracy >= 90  # Retorna True si la precisión es >= 90%
 
+def build_test_parser():
+    # Parser CYK sobre la gramática del proyecto, sin imprimir el diagnóstico
+    with contextlib.redirect_stdout(io.StringIO()):
+        cnf_grammar = GrammarSimplifier(load_english_grammar()).simplify()
+    return CYKParser(cnf_grammar)
+
+def test_rule_indexes():
+    # Los índices de reglas reflejan la gramática CNF
+    parser = build_test_parser()
+    assert {'V', 'VI'} <= parser.terminal_index['eats']
+    assert 'NP' in parser.binary_index[('Det', 'N')]
+    assert 'S' in parser.binary_index[('NP', 'VP')]
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert parser.parse("she eats a cake with a fork")[0]
+        assert not parser.parse("with fork a cake")[0]
+
+def test_bitset_engine_matches_sets():
+    # El modo compacto acepta y rechaza exactamente lo mismo que la tabla de conjuntos
+    parser = build_test_parser()
+    compact = CYKParser(parser.grammar, engine='bitset')
+    valid, invalid = test_sentences()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for sentence in valid + invalid + ["she eats cake with a fork", "a cuts meat"]:
+            expected = parser.parse(sentence)
+            result = compact.parse(sentence)
+            assert result[0] == expected[0]
+            if result[0]:
+                assert result[2]['symbol'] == parser.grammar.start_symbol
+                assert len(result[2]['children']) == 2
+
+def test_recognize_and_backpointer_modes():
+    # recognize() y los modos de retropunteros coinciden con el parse completo
+    parser = build_test_parser()
+    variants = [CYKParser(parser.grammar, backpointers=mode) for mode in CYKParser.BACKPOINTER_MODES]
+    variants.append(CYKParser(parser.grammar, engine='bitset'))
+    valid, invalid = test_sentences()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for sentence in valid + invalid + ["she eats with", "she", "drinks beer she", "she eats pizza"]:
+            expected = parser.parse(sentence)[0]
+            for variant in variants:
+                assert variant.recognize(sentence) == expected
+                result = variant.parse(sentence)
+                assert result[0] == expected
+                assert (result[2] is not None) == expected
+    first = variants[1]
+    with contextlib.redirect_stdout(io.StringIO()):
+        first.parse("she eats a cake with a fork")
+    assert all(len(derivs) == 1 for row in first.parse_table for cell in row for derivs in cell.values())
+
+def test_parse_many_preserves_order():
+    # parse_many en varios procesos devuelve lo mismo y en el mismo orden que el bucle secuencial
+    parser = build_test_parser()
+    valid, invalid = test_sentences()
+    sentences = (valid + invalid) * 5
+    with contextlib.redirect_stdout(io.StringIO()):
+        expected = [parser.parse(sentence) for sentence in sentences]
+        results = list(parser.parse_many(iter(sentences), workers=2, chunksize=3))
+        recognized = list(parser.parse_many(sentences, workers=2, recognize_only=True))
+    assert [r[0] for r in results] == [e[0] for e in expected] == recognized
+    assert all((r[2] is not None) == r[0] for r in results)
+
+def test_parse_corpus_writes_jsonl():
+    # El modo CLI escribe una línea JSON por oración no vacía, sin imprimir desde el parser
+    parser = build_test_parser()
+    lines = io.StringIO("she eats a cake\n\n  with fork a cake  \nshe cooks\n")
+    out = io.StringIO()
+    printed = io.StringIO()
+    with contextlib.redirect_stdout(printed):
+        total, accepted = parse_corpus(parser, lines, out, with_tree=True)
+    records = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert (total, accepted) == (3, 2)
+    assert printed.getvalue() == ""
+    assert [r['line'] for r in records] == [1, 3, 4]
+    assert [r['accepted'] for r in records] == [True, False, True]
+    assert records[0]['tree'].startswith("(S (NP she)")
+    assert records[1]['tree'] is None
+
+def test_grammar_cache_roundtrip():
+    # La segunda carga sale de la caché y analiza igual que la conversión completa
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = GrammarCache(cache_dir)
+        with contextlib.redirect_stdout(io.StringIO()):
+            cold = cache.get_parser(ENGLISH_GRAMMAR_TEXT)
+            warm = cache.get_parser(ENGLISH_GRAMMAR_TEXT)
+            other = cache.get_parser(ENGLISH_GRAMMAR_TEXT + "\nN -> pizza")
+        assert (cache.hits, cache.misses) == (1, 2)
+        assert warm.binary_index == cold.binary_index
+        assert warm.grammar.productions == cold.grammar.productions
+        with contextlib.redirect_stdout(io.StringIO()):
+            assert warm.parse("she eats a cake with a fork")[0]
+            assert not warm.parse("she eats pizza")[0]
+            assert other.parse("she eats pizza")[0]
+
+def test_result_cache_lru():
+    # La caché LRU cuenta aciertos, expulsa la entrada más antigua y devuelve copias
+    parser = build_test_parser()
+    metrics = MetricsCollector()
+    cached = CYKParser(parser.grammar, cache_size=2, metrics=metrics)
+    with contextlib.redirect_stdout(io.StringIO()):
+        first = cached.parse("she eats a cake")
+        first[2]['symbol'] = 'ROTO'
+        again = cached.parse("She  eats a CAKE")
+        assert again[0] and again[2]['symbol'] == 'S'
+        assert cached.recognize("she eats a cake")
+        cached.parse("he drinks")
+        cached.parse("the cat eats")
+        cached.parse("she eats a cake")
+    stats = cached.cache_stats()
+    assert (stats['hits'], stats['misses'], stats['evictions'], stats['size']) == (2, 4, 2, 2)
+    # Los aciertos de parse y de recognize quedan en las métricas; recognize no escribe en la caché
+    assert metrics.counters['cache_hits'] == 2 and metrics.counters['sentences'] == 5
+    cached.recognize("she drinks beer")
+    assert cached.cache_stats()['size'] == 2 and "she drinks beer".split() not in map(list, cached.result_cache)
+    
+    # La tasa de aciertos cuenta las búsquedas de parse y de recognize, acertadas o no
+    mixed = CYKParser(parser.grammar, cache_size=8)
+    mixed.parse("she eats a cake")
+    for sentence in ["she eats a cake", "he drinks", "he drinks", "the cat eats"]:
+        mixed.recognize(sentence)
+    stats = mixed.cache_stats()
+    assert (stats['hits'], stats['misses'], stats['hit_rate']) == (1, 4, 0.2)
+    
+    # Reemplazar la gramática invalida la caché
+    cached.grammar = parser.grammar
+    assert cached.cache_stats()['size'] == 0
+
+def test_incremental_parser():
+    # push/pop coinciden con el análisis completo y detectan prefijos sin continuación
+    parser = build_test_parser()
+    incremental = IncrementalCYKParser(parser.grammar)
+    viable = []
+    for word in "she eats a cake with a fork".split():
+        incremental.push(word)
+        viable.append(incremental.is_viable_prefix())
+        assert incremental.is_accepted() == parser.recognize(" ".join(incremental.words))
+    assert all(viable)
+    assert incremental.is_accepted()
+    assert incremental.pop() == "fork"
+    assert not incremental.is_accepted() and incremental.is_viable_prefix()
+    incremental.push("knife")
+    assert incremental.is_accepted()
+    
+    incremental.reset()
+    incremental.push("with")
+    assert not incremental.is_viable_prefix()
+    incremental.reset()
+    for word in "the cat the".split():
+        incremental.push(word)
+    assert not incremental.is_viable_prefix()
+
+def test_parse_forest_counts_and_enumerates():
+    # Con S -> S S | a el número de árboles es el número de Catalan
+    grammar = Grammar()
+    grammar.load_from_text("S -> S S\nS -> a")
+    with contextlib.redirect_stdout(io.StringIO()):
+        parser = CYKParser(GrammarSimplifier(grammar).simplify())
+    catalan = [1, 1, 2, 5, 14, 42, 132]
+    for n in range(1, 8):
+        forest = ParseForest(parser, " ".join(["a"] * n))
+        trees = {parser.bracketed_tree(tree) for tree in forest.trees()}
+        assert forest.count() == len(trees) == catalan[n - 1]
+    
+    # El conteo exacto crece exponencialmente pero el bosque se mantiene polinomial
+    forest = ParseForest(parser, " ".join(["a"] * 40))
+    assert forest.count() == 680425371729975800390
+    assert forest.size()[0] == 40 * 41 // 2
+    assert len(list(forest.trees(limit=5))) == 5
+    assert forest.tree_at(forest.count() - 1)['symbol'] == 'S'
+    
+    english = build_test_parser()
+    assert ParseForest(english, "she eats a cake with a fork").count() == 1
+    assert ParseForest(english, "with fork a cake").count() == 0
+    
+    # Las cadenas largas de PP se desarman con una pila, no con recursión
+    sentence = " ".join(["she eats a cake"] + ["with a fork"] * 40)
+    forest = ParseForest(english, sentence)
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(len(traceback.extract_stack()) + 30)
+    try:
+        for index in (0, forest.count() - 1):
+            assert english.bracketed_tree(forest.tree_at(index)).count("(P with)") == 40
+    finally:
+        sys.setrecursionlimit(limit)
+
+def test_compact_tree_without_recursion():
+    # El árbol compacto se construye y serializa sin recursión y coincide con los dicts
+    parser = build_test_parser()
+    accepted, _, tree = parser.parse_compact("she eats a cake with a fork")
+    assert accepted and tree.symbol == 'S'
+    assert json.loads(tree.to_json()) == tree.to_dict() == parser.parse("she eats a cake with a fork")[2]
+    assert json.loads(tree.to_json(flat=True))['symbols'] == tree.symbols
+    assert tree.to_bracketed() == parser.bracketed_tree(tree.to_dict())
+    
+    # El árbol colapsado es una derivación de la gramática original: VP -> VP PP anidado, PP y las
+    # cadenas unitarias que la CNF se había saltado (NP -> N -> fork, VP -> VI -> cooks)
+    collapsed = parser.parse_compact("she eats a cake with a fork", collapse_helpers=True)[2]
+    assert not set(collapsed.symbols) & parser.grammar.helper_symbols
+    assert collapsed.to_bracketed() == ("(S (NP she) (VP (VP (V eats) (NP (Det a) (N cake))) "
+                                        "(PP (P with) (NP (Det a) (N fork)))))")
+    collapsed = parser.parse_compact("fork cooks in the oven with a knife", collapse_helpers=True)[2]
+    assert collapsed.to_bracketed() == ("(S (NP (N fork)) (VP (VP (VP (VI cooks)) (PP (P in) (NP (Det the) "
+                                        "(N oven)))) (PP (P with) (NP (Det a) (N knife)))))")
+    assert json.loads(collapsed.to_json()) == collapsed.to_dict()
+    assert collapsed.to_dict()['children'][0] == {'symbol': 'NP', 'children': [
+        {'symbol': 'N', 'word': 'fork', 'children': []}]}
+    rules = rule_set(load_english_grammar())
+    valid, _ = test_sentences()
+    for sentence in valid + [long_english_sentence(20)]:
+        tree = parser.parse_compact(sentence, collapse_helpers=True)[2]
+        assert tree_error(tree.to_dict(), rules, 'S', sentence.split()) is None, sentence
+    
+    # Un árbol más profundo que el límite de recursión
+    sentence = " ".join(["she eats a cake"] + ["with a fork"] * 40)
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(len(traceback.extract_stack()) + 30)
+    try:
+        for engine in CYKParser.ENGINES:
+            deep = CYKParser(parser.grammar, engine=engine)
+            accepted, _, tree = deep.parse(sentence)
+            assert accepted
+            assert deep.bracketed_tree(tree).count("(P with)") == 40
+            collapsed = deep.parse_compact(sentence, collapse_helpers=True)[2]
+            assert collapsed.to_bracketed().count("(PP (P with)") == collapsed.symbols.count('VP') - 1 == 40
+    finally:
+        sys.setrecursionlimit(limit)
+
+def test_metrics_collector():
+    # El colector recibe tiempos por paso y por fase, tamaños de gramática y contadores de la tabla
+    events = []
+    metrics = MetricsCollector(callback=lambda kind, name, value: events.append((kind, name)))
+    cnf_grammar = GrammarSimplifier(load_english_grammar(), metrics=metrics).simplify()
+    sizes = [event for event in metrics.summary()['events'] if event['name'] == 'grammar_size']
+    assert [event['step'] for event in sizes][-1] == 'convert_to_cnf'
+    assert sizes[-1]['after'] == cnf_grammar.size()
+    
+    counts = []
+    for engine in CYKParser.ENGINES:
+        metrics.reset()
+        parser = CYKParser(cnf_grammar, engine=engine, metrics=metrics)
+        assert parser.parse("she eats a cake with a fork")[0]
+        summary = metrics.summary()
+        for phase in ('lexical', 'chart_fill', 'tree_build', 'parse'):
+            assert summary['timings'][phase]['calls'] == 1
+        counters = summary['counters']
+        assert counters['cells'] == 7 * 8 // 2
+        assert 0 < counters['cells_filled'] <= counters['chart_occupancy']
+        assert counters['rule_probes'] > 0
+        counts.append((counters['cells_filled'], counters['chart_occupancy']))
+    # Ambos motores llenan las mismas celdas con los mismos no terminales
+    assert counts[0] == counts[1]
+    assert ('time', 'chart_fill') in events
+    
+    # Sin colector el resultado es el mismo
+    assert CYKParser(cnf_grammar).parse("she eats a cake with a fork")[0]
+
+def test_benchmark_sentence_generators():
+    # Las oraciones muestreadas tienen el largo pedido y son aceptadas; las casi aceptadas no
+    text = generate_synthetic_grammar(num_nonterminals=30, num_rules=300, vocab_size=60, seed=1,
+                                      cnf=False, ambiguity=0.3)
+    grammar = Grammar()
+    grammar.load_from_text(text)
+    parser = CYKParser(GrammarSimplifier(grammar).simplify(), engine='bitset')
+    sentences = build_sentences(parser, [3, 8], 5, random.Random(0))
+    for length in (3, 8):
+        assert len(sentences[length]['accepted']) == 5
+        for sentence in sentences[length]['accepted']:
+            assert len(sentence.split()) == length
+            assert parser.recognize(sentence)
+        for sentence in sentences[length]['rejected']:
+            assert len(sentence.split()) == length
+            assert not parser.recognize(sentence)
+    # Mismas semillas, mismas gramáticas
+    assert generate_synthetic_grammar(num_rules=300, seed=1, ambiguity=0.3) == \
+        generate_synthetic_grammar(num_rules=300, seed=1, ambiguity=0.3)
+
+def test_numpy_engine_matches_bitset():
+    # El motor numpy es opcional: si está instalado, llena las mismas celdas y da los mismos árboles
+    try:
+        import numpy
+    except ImportError:
+        return
+    parser = build_test_parser()
+    bitset = CYKParser(parser.grammar, engine='bitset')
+    vectorized = CYKParser(parser.grammar, engine='numpy')
+    valid, invalid = test_sentences()
+    for sentence in valid + invalid + ["she eats cake with a fork", "she eats pizza", "she"]:
+        expected = bitset.parse_compact(sentence)
+        result = vectorized.parse_compact(sentence)
+        assert result[0] == expected[0] == parser.parse(sentence)[0]
+        assert result[2] == expected[2]
+        assert vectorized.recognize(sentence) == expected[0]
+        n = len(sentence.split())
+        bitset.build_chart(sentence)
+        vectorized.build_chart(sentence)
+        for i in range(n):
+            for j in range(i, n):
+                assert vectorized.get_cell(i, j) == bitset.get_cell(i, j)
+
+def test_long_input_matrix_fill():
+    # Por encima del umbral la tabla se llena por bloques de matrices (requiere numpy) con el mismo resultado
+    try:
+        import numpy
+    except ImportError:
+        return
+    parser = build_test_parser()
+    bitset = CYKParser(parser.grammar, engine='bitset', long_input_threshold=None)
+    blocks = CYKParser(parser.grammar, long_input_threshold=5)
+    # Hojas pequeñas para que la recursión y los productos de bloques se ejerciten
+    blocks.MATRIX_LEAF_SIZE = 6
+    valid, invalid = test_sentences()
+    long_sentence = long_english_sentence(40)
+    for sentence in valid + invalid + [long_sentence, "the " + long_sentence, long_sentence + " cake"]:
+        expected = bitset.parse_compact(sentence)
+        result = blocks.parse_compact(sentence)
+        assert result[0] == expected[0]
+        assert result[2] == expected[2]
+        n = len(sentence.split())
+        bitset.build_chart(sentence)
+        blocks.build_chart(sentence)
+        assert blocks.chart_engine == ('numpy' if n > 5 else 'sets')
+        for i in range(n):
+            for j in range(i, n):
+                assert blocks.get_cell(i, j) == bitset.get_cell(i, j)
+
+def shared_memory_mappings(_):
+    # Bloques de SharedMemory (psm_*) mapeados en el proceso actual (Linux); sem.* son los del pool
+    with open('/proc/self/maps') as maps:
+        return [line.split()[-2] for line in maps if '/dev/shm/psm_' in line]
+
+def test_parallel_chart_fill():
+    # Llenado de una oración repartiendo cada antidiagonal entre procesos: mismas celdas y mismos árboles
+    parser = build_test_parser()
+    bitset = CYKParser(parser.grammar, engine='bitset', long_input_threshold=None)
+    parallel = CYKParser(parser.grammar, long_input_threshold=None, fill_workers=2)
+    # Umbrales bajos para que también las oraciones cortas pasen por los procesos
+    parallel.PARALLEL_MIN_LENGTH = 3
+    parallel.parallel_filler().MIN_PARALLEL_WORK = 0
+    try:
+        valid, invalid = test_sentences()
+        long_sentence = long_english_sentence(30)
+        for sentence in valid + invalid + [long_sentence, "the " + long_sentence]:
+            expected = bitset.parse_compact(sentence)
+            result = parallel.parse_compact(sentence)
+            assert result[0] == expected[0]
+            assert result[2] == expected[2]
+            assert parallel.recognize(sentence) == expected[0]
+            n = len(sentence.split())
+            bitset.build_chart(sentence)
+            parallel.build_chart(sentence)
+            assert parallel.chart_engine == ('bitset' if n >= 3 else 'sets')
+            for i in range(n):
+                for j in range(i, n):
+                    assert parallel.get_cell(i, j) == bitset.get_cell(i, j)
+        # Entre oraciones ningún proceso conserva mapeado el bloque compartido (ya borrado por el padre)
+        if os.path.exists('/proc/self/maps'):
+            assert parallel.parallel_filler().pool.map(shared_memory_mappings, range(8)) == [[]] * 8
+    finally:
+        parallel.close()
+
+WEIGHTED_GRAMMAR_TEXT = """S -> NP VP [1.0]
+VP -> VP PP [0.3] | V NP [0.5] | cooks [0.1] | eats [0.1]
+PP -> P NP [1.0]
+NP -> Det N [0.4] | NP PP [0.2] | she [0.2] | he [0.2]
+V -> eats [0.6] | cuts [0.4]
+P -> with [1.0]
+N -> cake [0.5] | fork [0.5]
+Det -> a [0.5] | the [0.5]"""
+
+def derivation_probability(grammar, node):
+    # Producto de los pesos de las reglas de un árbol en forma de dicts anidados
+    if not node['children']:
+        return grammar.rule_weight(node['symbol'], [node['word']])
+    probability = grammar.rule_weight(node['symbol'], [child['symbol'] for child in node['children']])
+    for child in node['children']:
+        probability *= derivation_probability(grammar, child)
+    return probability
+
+def test_weighted_grammar_viterbi():
+    # Los pesos [p] sobreviven a la conversión a CNF y parse_viterbi devuelve el árbol más probable
+    grammar = Grammar()
+    grammar.load_from_text(WEIGHTED_GRAMMAR_TEXT)
+    assert grammar.rule_weight('VP', ['V', 'NP']) == 0.5
+    assert grammar.rule_weight('S', ['NP', 'VP']) == 1.0
+    with contextlib.redirect_stdout(io.StringIO()):
+        cnf_grammar = GrammarSimplifier(grammar).simplify()
+    # Las reglas largas dejan el peso en la primera parte y las auxiliares valen 1
+    for nt, prods in cnf_grammar.productions.items():
+        for prod in prods:
+            if nt in cnf_grammar.helper_symbols and (nt, tuple(prod)) not in cnf_grammar.weights:
+                assert cnf_grammar.rule_weight(nt, prod) == 1.0
+    
+    parser = CYKParser(cnf_grammar)
+    accepted, _, tree, probability = parser.parse_viterbi("she eats a cake with a fork")
+    assert accepted
+    # she eats [a cake] [with a fork] (0.2 · 0.5 · 0.6 · 0.1 · 0.3 · 0.1) le gana a [a cake with a fork]
+    assert abs(probability - 0.00018) < 1e-12
+    assert abs(derivation_probability(cnf_grammar, tree.to_dict()) - probability) < 1e-12
+    # Colapsado a la gramática original (VP -> VP PP, PP) conserva la probabilidad
+    collapsed = parser.parse_viterbi("she eats a cake with a fork", collapse_helpers=True)[2]
+    assert abs(derivation_probability(grammar, collapsed.to_dict()) - probability) < 1e-12
+    assert abs(parser.parse_viterbi("she eats")[3] - 0.2 * 0.1) < 1e-12
+    accepted, _, tree, probability = parser.parse_viterbi("eats she")
+    assert not accepted and tree is None and probability == 0.0
+    
+    # El mejor árbol coincide con el máximo sobre todos los árboles del bosque
+    for sentence in ["he cuts the cake with a fork with a fork", "she eats a cake with the fork"]:
+        forest = ParseForest(parser, sentence)
+        best = max(derivation_probability(cnf_grammar, tree) for tree in forest.trees())
+        assert abs(parser.parse_viterbi(sentence)[3] - best) < 1e-12
+    
+    # La poda por celda reduce las entradas de la tabla
+    metrics = MetricsCollector()
+    parser.metrics = metrics
+    sentence = "he cuts the cake with a fork with a fork with the cake"
+    parser.parse_viterbi(sentence)
+    full = metrics.counters['chart_entries']
+    assert parser.parse_viterbi(sentence, beam=1)[0]
+    assert metrics.counters['chart_entries'] - full < full
+    
+    # Una regla heredada por una cadena unitaria vale lo que el mejor camino: max(0.1, 0.5 · 0.5)
+    unit_grammar = Grammar()
+    unit_grammar.load_from_text("S -> A B [1]\nA -> C [0.5] | x [0.1]\nC -> x [0.5]\nB -> y [1]")
+    with contextlib.redirect_stdout(io.StringIO()):
+        unit_cnf = GrammarSimplifier(unit_grammar).simplify()
+    assert unit_cnf.rule_weight('A', ['x']) == 0.25
+    
+    for bad in ["S -> a [0]", "S -> a [1.5]", "S -> a [x]"]:
+        try:
+            Grammar().load_from_text(bad)
+        except ValueError:
+            continue
+        assert False, bad
+
+def test_earley_matches_cyk():
+    # Earley sobre la gramática original acepta lo mismo que CYK sobre la CNF y arma árboles válidos
+    def check_tree(grammar, node, words):
+        # Cada nodo interno es una regla de la gramática original; devuelve las palabras que cubre
+        if not node['children']:
+            assert node['symbol'] is None or [node['word']] in grammar.productions[node['symbol']]
+            return [node['word']]
+        rhs = [child['symbol'] if child['symbol'] is not None else child['word'] for child in node['children']]
+        assert rhs in grammar.productions[node['symbol']]
+        covered = []
+        for child in node['children']:
+            covered += check_tree(grammar, child, words)
+        return covered
+    
+    recursive = Grammar()
+    # Recursión por la izquierda, ciclo unitario y reglas mixtas de terminales y no terminales
+    recursive.load_from_text("S -> A | S plus A | open S close\nA -> B | A x | y\nB -> A | z")
+    sentences = {recursive: ["y", "z x x", "y plus z x", "open y plus z close plus y", "plus y", "y x plus", "open y"]}
+    english = load_english_grammar()
+    valid, invalid = test_sentences()
+    sentences[english] = valid + invalid
+    for grammar, cases in sentences.items():
+        with contextlib.redirect_stdout(io.StringIO()):
+            cyk = CYKParser(GrammarSimplifier(grammar).simplify())
+        earley = EarleyParser(grammar)
+        for sentence in cases:
+            accepted, _, tree = earley.parse(sentence)
+            assert accepted == cyk.recognize(sentence), sentence
+            if accepted:
+                assert tree['symbol'] == grammar.start_symbol
+                assert check_tree(grammar, tree, sentence.split()) == sentence.split()
+            else:
+                assert tree is None
+    assert EarleyParser(english).parse("") == (False, 0, None)
+
+def test_lexicon_tokenizer_and_fallback():
+    # El léxico separa signos, une terminales de varias palabras y resuelve las palabras desconocidas
+    grammar = Grammar()
+    grammar.load_from_text(ENGLISH_GRAMMAR_TEXT + "\nN -> ice_cream | <unk>")
+    cnf_grammar = GrammarSimplifier(grammar).simplify()
+    lexicon = Lexicon(cnf_grammar)
+    assert lexicon.tokenize("She eats ICE  cream") == ['she', 'eats', 'ice_cream']
+    assert lexicon.tokenize("she eats ice") == ['she', 'eats', 'ice']
+    assert lexicon.preterminals('cake') == {'N', 'NP'}
+    assert lexicon.preterminals('zebra') == frozenset()
+    assert lexicon.lexical_words(['a', 'zebra']) is None
+    
+    metrics = MetricsCollector()
+    strict = CYKParser(cnf_grammar, lexicon=lexicon, metrics=metrics)
+    accepted, _, tree = strict.parse("she eats ice cream")
+    assert accepted and tree['children'][1]['children'][1]['word'] == 'ice_cream'
+    assert not strict.parse("she eats a zebra")[0] and not strict.recognize("she eats a zebra")
+    assert metrics.counters['lexicon_rejections'] == 2 and 'chart_fill' in metrics.timings
+    
+    # Con clase de respaldo la palabra desconocida se analiza como <unk> y el árbol conserva la original
+    fallback = CYKParser(cnf_grammar, engine='bitset', lexicon=Lexicon(cnf_grammar, unknown='<unk>'))
+    accepted, _, tree = fallback.parse("she eats a zebra")
+    assert accepted and tree['children'][1]['children'][1]['children'][1]['word'] == 'zebra'
+    assert not fallback.parse("zebra a eats she")[0]
+    assert list(fallback.parse_many(["she eats a zebra", "she zebra"], workers=2, recognize_only=True)) == [True, False]
+    try:
+        Lexicon(cnf_grammar, unknown='<oov>')
+        assert False
+    except ValueError:
+        pass
+    
+    # Los signos de la gramática se separan aunque vayan pegados a las palabras
+    arithmetic = Grammar()
+    arithmetic.load_from_text("E -> E + T | T\nT -> T * F | F\nF -> ( E ) | x | y")
+    arithmetic_cnf = GrammarSimplifier(arithmetic).simplify()
+    parser = CYKParser(arithmetic_cnf, lexicon=Lexicon(arithmetic_cnf))
+    assert parser.lexicon.tokenize("(x+y)*x") == ['(', 'x', '+', 'y', ')', '*', 'x']
+    assert parser.parse("(x+y)*x")[0] and parser.parse_viterbi("x * (y)")[0]
+    assert not parser.parse("(x+)*x")[0] and not parser.parse("x-y")[0]
+
+def test_prefilter_rejects_only_what_cyk_rejects():
+    # Los filtros previos descartan oraciones inválidas sin llenar la tabla y nunca una aceptada
+    cnf_grammar = build_test_parser().grammar
+    prefilter = SentenceFilter(cnf_grammar, bigrams=True)
+    assert prefilter.check("with fork a cake".split()) == 'first_last'
+    assert prefilter.check("cat the drinks beer".split()) == 'bigram'
+    assert prefilter.check("she eats a zebra".split()) == 'vocabulary'
+    assert prefilter.check("she eats a cake".split()) is None
+    
+    rng = random.Random(0)
+    grammars = [cnf_grammar]
+    for seed in range(4):
+        grammar = Grammar()
+        grammar.load_from_text(generate_synthetic_grammar(num_nonterminals=8, num_rules=30, vocab_size=6,
+                                                          seed=seed, cnf=seed % 2 == 0))
+        grammars.append(GrammarSimplifier(grammar).simplify())
+    for grammar in grammars:
+        plain = CYKParser(grammar)
+        metrics = MetricsCollector()
+        filtered = CYKParser(grammar, prefilter=SentenceFilter(grammar, bigrams=True), metrics=metrics)
+        vocabulary = sorted({prod[0] for prods in grammar.productions.values() for prod in prods if len(prod) == 1})
+        for _ in range(500):
+            sentence = " ".join(rng.choice(vocabulary) for _ in range(rng.randint(1, 6)))
+            assert filtered.parse(sentence)[0] == plain.recognize(sentence), sentence
+        stats = filtered.prefilter.stats()
+        assert stats['checked'] == 500 and stats['avoided'] == metrics.counters.get('prefilter_rejections', 0)
+        assert stats['avoided'] > 0
+
+def test_parse_server_batches_requests():
+    # El servidor responde por HTTP en localhost con los mismos resultados que parse, en lotes
+    parser = build_test_parser()
+    cnf_grammar = parser.grammar
+    valid, invalid = test_sentences()
+    sentences = (valid + invalid) * 5
+    
+    async def scenario():
+        server = ParseServer(cnf_grammar, max_length=20)
+        await server.start()
+        try:
+            responses = await asyncio.gather(*(http_request('127.0.0.1', server.port, 'POST', '/parse',
+                                                            {'sentence': sentence}) for sentence in sentences))
+            for sentence, (status, result) in zip(sentences, responses):
+                accepted, _, tree = parser.parse(sentence)
+                assert status == 200 and result['accepted'] == accepted and result['tree'] == tree
+            assert (await http_request('127.0.0.1', server.port, 'POST', '/parse',
+                                       {'sentence': long_english_sentence(30)}))[0] == 413
+            assert (await http_request('127.0.0.1', server.port, 'POST', '/parse', {'text': 'x'}))[0] == 400
+            assert (await http_request('127.0.0.1', server.port, 'GET', '/parse'))[0] == 405
+            status, stats = await http_request('127.0.0.1', server.port, 'GET', '/stats')
+            assert status == 200 and stats['completed'] == len(sentences) and stats['too_long'] == 1
+            assert stats['batches'] < len(sentences) and stats['queue_depth'] == 0
+            assert 0 < stats['latency_ms']['p50'] <= stats['latency_ms']['p99'] <= stats['latency_ms']['max']
+        finally:
+            await server.close()
+        
+        # Un análisis más lento que el tiempo máximo responde 504
+        server = ParseServer(cnf_grammar, max_length=500, timeout=0.001)
+        await server.start()
+        try:
+            status, _ = await http_request('127.0.0.1', server.port, 'POST', '/parse',
+                                           {'sentence': long_english_sentence(150)})
+            assert status == 504 and server.stats()['timeouts'] == 1
+        finally:
+            await server.close()
+    
+    asyncio.run(scenario())
+
+def test_compiled_grammar():
+    # El artefacto compilado se abre con mmap y analiza igual que la gramática CNF original
+    cnf_grammar = build_test_parser().grammar
+    valid, invalid = test_sentences()
+    with tempfile.TemporaryDirectory() as directory:
+        path = compile_grammar(cnf_grammar, os.path.join(directory, 'english.cykg'))
+        compiled = CompiledGrammar(path)
+        assert compiled.size() == cnf_grammar.size()
+        rules = lambda grammar: {(nt, tuple(prod)) for nt, prods in grammar.productions.items() for prod in prods}
+        assert rules(compiled.to_grammar()) == rules(cnf_grammar)
+        assert len(pickle.dumps(compiled)) < 200
+        assert compiled.unit_chains == cnf_grammar.unit_chains
+        assert compiled.left_recursion_helpers == cnf_grammar.left_recursion_helpers
+        for engine in ('sets', 'bitset'):
+            original = CYKParser(cnf_grammar, engine=engine)
+            mapped = CYKParser(compiled, engine=engine)
+            for sentence in valid + invalid:
+                assert mapped.parse(sentence)[::2] == original.parse(sentence)[::2], (engine, sentence)
+        
+        # Los procesos reciben solo la ruta y abren el mismo archivo
+        mapped = CYKParser(compiled)
+        try:
+            results = list(mapped.parse_many(valid + invalid, workers=2, chunksize=2))
+        finally:
+            mapped.close()
+        expected = [CYKParser(cnf_grammar).parse(sentence)[::2] for sentence in valid + invalid]
+        assert [result[::2] for result in results] == expected
+        
+        with open(path, 'r+b') as artifact:
+            artifact.write(b'XXXX')
+        try:
+            CompiledGrammar(path)
+            assert False, "se esperaba ValueError por el número mágico"
+        except ValueError:
+            pass
+        
+        broken = Grammar()
+        broken.load_from_text("S -> A B C\nA -> a\nB -> b\nC -> c")
+        try:
+            compile_grammar(broken, os.path.join(directory, 'broken.cykg'))
+            assert False, "se esperaba ValueError por una regla fuera de CNF"
+        except ValueError:
+            pass
+
+def test_chart_arena_reuses_cells():
+    # Con arena la tabla es siempre la misma, crece al doble y analiza igual que una tabla nueva
+    cnf_grammar = build_test_parser().grammar
+    valid, invalid = test_sentences()
+    sentences = [long_english_sentence(12)] + valid + invalid + ["she eats", long_english_sentence(30)] + valid
+    for backpointers in CYKParser.BACKPOINTER_MODES:
+        fresh = CYKParser(cnf_grammar, backpointers=backpointers)
+        reused = CYKParser(cnf_grammar, backpointers=backpointers, arena_size=4)
+        arena = reused.arena
+        table = arena.table
+        for sentence in sentences:
+            assert reused.parse(sentence)[::2] == fresh.parse(sentence)[::2], sentence
+            assert reused.recognize(sentence) == fresh.recognize(sentence)
+            n = len(sentence.split())
+            assert all(reused.get_cell(i, j) == fresh.get_cell(i, j) for i in range(n) for j in range(i, n))
+        assert reused.table is table and table[1][0] is None
+        # 4 -> 12 palabras (más del doble) -> 28 palabras (más del doble de 12)
+        assert arena.capacity == len(long_english_sentence(30).split()) == 28 and arena.grows == 2
+        assert arena.acquires == 2 * len(sentences)
+    try:
+        CYKParser(cnf_grammar, arena_size=-1)
+        assert False, "se esperaba ValueError"
+    except ValueError:
+        pass
+
+def test_differential_harness():
+    # Los motores coinciden con la referencia y la fuerza bruta; una falla inyectada se detecta y se reduce
+    harness = DifferentialHarness(seed=0, brute_force_length=4, sentences_per_grammar=10)
+    report = harness.run(5)
+    assert report['grammars'] == 5 and report['sentences'] > 100
+    assert report['failures'] == [], report['failures']
+    assert report['throughput']['sets'] > 0 and report['throughput']['earley'] > 0
+    
+    def truncated(case):
+        # Motor con una falla: rechaza toda oración de tres palabras o más
+        parser = CYKParser(case['cnf'])
+        return lambda sentence: (len(sentence.split()) < 3 and parser.recognize(sentence), [])
+    
+    harness = DifferentialHarness(seed=1, engines=['sets'], extra_engines={'truncated': truncated})
+    report = harness.run(20)
+    assert report['failures']
+    for failure in report['failures']:
+        assert (failure['check'], failure['engine']) == ('accept', 'truncated')
+        assert 3 <= len(failure['sentence'].split()) <= len(failure['original_sentence'].split())
+        assert len(failure['grammar'].split("\n")) <= len(failure['original_grammar'].split("\n"))
+
+def test_print_table_with_numpy_chart():
+    # print_table funciona con la tabla como arreglo de numpy: motor 'numpy' y entradas largas
+    try:
+        import numpy
+    except ImportError:
+        return
+    parser = build_test_parser()
+    sets = CYKParser(parser.grammar, engine='sets')
+    for engine, sentence in [('numpy', "she eats a cake"), ('sets', long_english_sentence(12))]:
+        numpy_parser = CYKParser(parser.grammar, engine=engine, long_input_threshold=5)
+        with contextlib.redirect_stdout(io.StringIO()):
+            assert numpy_parser.parse(sentence)[0]
+            sets.parse(sentence)
+        assert numpy_parser.chart_engine == 'numpy'
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            numpy_parser.print_table()
+        expected = io.StringIO()
+        with contextlib.redirect_stdout(expected):
+            sets.print_table()
+        assert output.getvalue() == expected.getvalue()
+    
+    # Sin tabla (oración vacía) se informa en lugar de fallar
+    empty = CYKParser(parser.grammar, engine='numpy')
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        empty.print_table()
+    assert "No hay tabla" in output.getvalue()
+
+def test_parse_many_merges_worker_stats():
+    # Con varios procesos, caché, prefiltro y métricas de los trabajadores se suman al parser que llama
+    parser = build_test_parser()
+    valid, invalid = test_sentences()
+    sentences = (valid + invalid) * 4
+    for workers in (1, 2):
+        metrics = MetricsCollector()
+        pooled = CYKParser(parser.grammar, cache_size=64, metrics=metrics,
+                           prefilter=SentenceFilter(parser.grammar))
+        with contextlib.redirect_stdout(io.StringIO()):
+            list(pooled.parse_many(sentences, workers=workers, chunksize=len(sentences) // 2))
+        cache = pooled.cache_stats()
+        prefilter = pooled.prefilter.stats()
+        assert prefilter['checked'] == len(sentences) and prefilter['avoided'] > 0
+        assert cache['hits'] > 0 and cache['hits'] + cache['misses'] + prefilter['avoided'] == len(sentences)
+        assert metrics.counters['prefilter_rejections'] == prefilter['avoided']
+        assert metrics.summary()['timings']['parse']['calls'] == cache['misses']
+        assert metrics.counters['sentences'] == len(sentences)
+        assert metrics.counters['cache_hits'] == cache['hits']
+def test_grammar_swap_rebuilds_prefilter_and_lexicon():
+    # Al reemplazar la gramática, léxico y filtros previos pasan a ser los de la nueva
+    parser = build_test_parser()
+    grammar = Grammar()
+    grammar.load_from_text(ENGLISH_GRAMMAR_TEXT + "\nN -> pizza")
+    extended = GrammarSimplifier(grammar).simplify()
+    swapped = CYKParser(parser.grammar, lexicon=Lexicon(parser.grammar),
+                        prefilter=SentenceFilter(parser.grammar, bigrams=True))
+    assert not swapped.parse("she eats pizza")[0]
+    swapped.grammar = extended
+    assert swapped.parse("she eats pizza")[0] and swapped.recognize("the pizza eats")
+    # El primer intento lo descartó el léxico, antes del filtro
+    assert swapped.prefilter.bigrams and swapped.prefilter.stats()['checked'] == 2
+    assert swapped.lexicon.preterminals('pizza') == {'N', 'NP'}
+    
+    # Una clase de respaldo que la nueva gramática no tiene deja el parser como estaba
+    fallback = Grammar()
+    fallback.load_from_text(ENGLISH_GRAMMAR_TEXT + "\nN -> <unk>")
+    fallback_cnf = GrammarSimplifier(fallback).simplify()
+    strict = CYKParser(fallback_cnf, lexicon=Lexicon(fallback_cnf, unknown='<unk>'))
+    try:
+        strict.grammar = extended
+        assert False
+    except ValueError:
+        pass
+    assert strict.grammar is fallback_cnf and strict.parse("she eats a zebra")[0]
+
+
 if __name__ == "__main__":
     success = run_comprehensive_tests()
-    print(f"\nPruebas {'EXITOSAS' if success else 'FALLIDAS'}")
\ No newline at end of file
+    print(f"\nPruebas {'EXITOSAS' if success else 'FALLIDAS'}")